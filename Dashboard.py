@@ -1,9 +1,27 @@
 import streamlit as st
 import seaborn as sns
 import pandas as pd
-import matplotlib.pyplot as plt
+import numpy as np
 from datetime import date
+from functools import partial
 import os
+import time
+
+import accesos
+import agregados
+import almacen
+import compartido
+import consultas
+import dependencias
+import exportacion
+import filtros
+import graficos
+import jerarquia
+import movimientos
+import perfil
+import procesamiento
+import riesgo
+import segundo_plano
 
 # Configurar página
 st.set_page_config(
@@ -12,54 +30,363 @@ st.set_page_config(
     layout="wide"
 )
 
+# Cronómetro del rerun: cada sección numerada cierra su etapa (ver perfil.py)
+st.session_state.setdefault("reruns", 0)
+st.session_state["reruns"] += 1
+cronometro = perfil.iniciar(
+    sesion=st.session_state.setdefault("id_sesion", os.urandom(4).hex()),
+    rerun=st.session_state["reruns"]
+)
+
 # -------------------------------
 # 1. Cargar datos desde CSV
 # -------------------------------
 st.title("📊 Dashboard People Analytics - ROSTADINA EIRL")
 
-# Cargar datos
+# Exports de activos: un archivo, una carpeta o un patrón (p. ej. uno por país);
+# se puede cambiar con la variable ACTIVOS_EXPORTS
+VARIABLE_EXPORTS = "ACTIVOS_EXPORTS"
+FUENTE_DATOS = os.environ.get(VARIABLE_EXPORTS, "activos_feb_24.csv")
+DIRECTORIO_ALMACEN = almacen.DIRECTORIO_ALMACEN
+RUTA_BASE_SQL = consultas.RUTA_BASE
+DIRECTORIO_COMPARTIDO = compartido.DIRECTORIO_COMPARTIDO
+
+MOTOR_PANDAS = "pandas"
+MOTOR_SQL = "sql"
+
+COLUMNAS_DASHBOARD = procesamiento.COLUMNAS_DASHBOARD
+
+@st.cache_data(show_spinner=False)
+def calcular_hash_archivo(ruta, mtime_ns, tamano):
+    """Hash del contenido; solo se recalcula si cambian mtime o tamaño"""
+    return procesamiento.hash_archivo(ruta)
+
+# Los datasets abiertos se olvidan por antigüedad: así se libera el mapeo de los
+# archivos que ya se eliminaron (p. ej. los de días anteriores)
+TTL_DATOS = "1d"
+
+@st.cache_resource(
+    show_spinner="Cargando y procesando datos...", max_entries=compartido.MAX_PUBLICACIONES, ttl=TTL_DATOS
+)
+def cargar_datos(rutas, hashes_contenido, hoy, columnas, referencia):
+    """
+    Dataset procesado compartido (solo lectura) entre reruns, sesiones y procesos.
+
+    Se publica una vez en un archivo Arrow mapeado en memoria; cada proceso
+    lo abre sin copiarlo y todas sus sesiones reciben el mismo DataFrame.
+    """
+    ruta = compartido.ruta_publicacion(
+        rutas, hashes_contenido, hoy, columnas, referencia, directorio=DIRECTORIO_COMPARTIDO
+    )
+    if not os.path.exists(ruta):
+        df, info = almacen.procesar_periodos(rutas, hoy, columnas, referencia)
+        compartido.publicar(df, info, ruta)
+    return compartido.abrir(ruta)
+
+@st.cache_resource(show_spinner=False, max_entries=32, ttl=TTL_DATOS)
+def datos_sesion(rutas, hashes_contenido, hoy, columnas, referencia, acceso):
+    """
+    Filas que ve la sesión según su acceso (ver accesos.py).
+
+    El dataset compartido está ordenado por unidad y país: se toman los
+    rangos de filas de las unidades permitidas (con uno solo, sin copiar).
+    """
+    df, info = cargar_datos(rutas, hashes_contenido, hoy, columnas, referencia)
+    if acceso is None:
+        return df, info
+    return accesos.recortar(df, accesos.rangos_permitidos(info["particiones"], acceso)), info
+
+@st.cache_resource(show_spinner="Preparando base SQL...")
+def obtener_base_sql(rutas, hashes_contenido, hoy, columnas, referencia):
+    """
+    Tabla DuckDB con el dataset procesado, compartida por todas las sesiones.
+
+    Si la tabla ya existe en el archivo (otro proceso o un reinicio) no se
+    vuelve a procesar; el DataFrame solo existe mientras se escribe.
+    """
+    con = consultas.conectar(RUTA_BASE_SQL)
+    tabla = consultas.nombre_tabla(rutas, hashes_contenido, hoy, columnas, referencia)
+    info = consultas.leer_info(con, tabla)
+    if info is None:
+        df, info = almacen.procesar_periodos(rutas, hoy, columnas, referencia)
+        consultas.guardar(con, tabla, df, info)
+    return con, tabla, info
+
+@st.cache_resource(show_spinner=False)
+def conexion_sql():
+    """Conexión para consultar si la tabla del dataset ya existe"""
+    return consultas.conectar(RUTA_BASE_SQL)
+
+def carga_disponible(motor, clave):
+    """Indica si el dataset de la clave (tabla SQL o archivo publicado) está listo"""
+    if motor == MOTOR_SQL:
+        return consultas.leer_info(conexion_sql().cursor(), clave) is not None
+    return os.path.exists(clave)
+
+# Cada cuánto se consulta el avance de una carga de fondo
+INTERVALO_AVANCE = 0.5
+
+@st.fragment(run_every=INTERVALO_AVANCE)
+def mostrar_carga(tarea):
+    """Avance de la carga de fondo; al terminar se vuelve a ejecutar toda la página"""
+    etapas, segundos, error = segundo_plano.estado(tarea)
+    if error is not None:
+        # No se relanza sola: se reintenta en la próxima interacción
+        st.error(f"❌ Error al cargar los datos: {error}")
+    elif segundos is not None:
+        st.rerun()
+    else:
+        with st.status("⏳ Cargando datos en segundo plano...", expanded=True):
+            mostrar_avance(st.empty(), etapas, segundos)
+
+def publicar_datos(rutas, hoy, columnas, referencia, ruta, avance):
+    """Carga en frío para el motor pandas (corre en un hilo de fondo)"""
+    df, info = almacen.procesar_periodos(rutas, hoy, columnas, referencia, avance=avance)
+    avance("Publicando datos compartidos")
+    compartido.publicar(df, info, ruta)
+    return ruta
+
+def guardar_datos_sql(con, tabla, rutas, hoy, columnas, referencia, avance):
+    """Carga en frío para el motor SQL (corre en un hilo de fondo)"""
+    df, info = almacen.procesar_periodos(rutas, hoy, columnas, referencia, avance=avance)
+    avance("Guardando en la base SQL")
+    consultas.guardar(con, tabla, df, info)
+    return tabla
+
+def mostrar_avance(marcador, etapas, segundos):
+    """Etapas de la carga de fondo: ✅ las terminadas y ⏳ la actual"""
+    lineas = []
+    for i, (etapa, inicio) in enumerate(etapas):
+        fin = etapas[i + 1][1] if i + 1 < len(etapas) else segundos
+        lineas.append(f"⏳ {etapa}..." if fin is None else f"✅ {etapa} ({fin - inicio:.2f} s)")
+    marcador.markdown("\n\n".join(lineas))
+
+@st.cache_data(show_spinner=False)
+def resumen_indicadores(rutas, hashes_contenido, hoy, referencia):
+    """Indicadores principales desde el resumen de cada partición (sin leer los datos)"""
+    return almacen.resumen_periodos(rutas, hoy, referencia)
+
+def mostrar_indicadores(resumen):
+    """Headcount, % mujeres y edad promedio de los periodos elegidos (sin filtros)"""
+    col1, col2, col3 = st.columns(3)
+    col1.metric("👥 Headcount", f"{resumen['headcount']:,}")
+    con_genero = resumen["mujeres"] + resumen["hombres"]
+    col2.metric("👩 % Mujeres", f"{resumen['mujeres'] * 100 / con_genero:.1f} %" if con_genero else "—")
+    col3.metric("🎂 Edad promedio",
+                f"{resumen['edad_promedio']:.1f}" if resumen["edad_promedio"] is not None else "—")
+    st.caption("Indicadores de los periodos elegidos, sin filtros")
+
+@st.cache_data(show_spinner="Calculando movimientos...")
+def calcular_movimientos(rutas, hashes_contenido, acceso):
+    """Movimientos por periodo y tipo; la clave anónima se lee solo aquí (no llega a las vistas)"""
+    columnas = [movimientos.COLUMNA_PERIODO, procesamiento.COLUMNA_CLAVE, *movimientos.CAMBIOS]
+    historial = almacen.leer_periodos(rutas, columnas, filtros=accesos.filtros_parquet(acceso))
+    return movimientos.resumen(movimientos.movimientos_periodos(historial))
+
+@st.cache_data(show_spinner=False)
+def cargar_muestra(ruta, hash_contenido, acceso, n=10):
+    """Primeras filas para la vista previa (solo de las unidades permitidas, sin clave ni origen)"""
+    if acceso is None:
+        df_muestra = procesamiento.leer_muestra(ruta, n)
+    else:
+        df_muestra = almacen.leer_periodos([ruta], filtros=accesos.filtros_parquet(acceso)).head(n)
+    df_muestra, _ = procesamiento.eliminar_columnas_sensibles(df_muestra)
+    return procesamiento.eliminar_columnas_internas(df_muestra)
+
+def usuario_sesion():
+    """
+    Usuario de la sesión: login de Streamlit o encabezado del proxy de confianza.
+
+    El encabezado solo se lee si se configuró ACTIVOS_ENCABEZADO_USUARIO y
+    ACTIVOS_USUARIO solo vale en desarrollo (ACTIVOS_DESARROLLO=1).
+    """
+    if st.user.get("is_logged_in"):
+        return st.user.get("email")
+    encabezado = os.environ.get(accesos.VARIABLE_ENCABEZADO)
+    if encabezado:
+        return st.context.headers.get(encabezado)
+    if os.environ.get(accesos.VARIABLE_DESARROLLO) == "1":
+        return os.environ.get(accesos.VARIABLE_USUARIO)
+    return None
+
+# Acceso por filas: cada responsable ve solo su unidad de negocio / país (ver accesos.py)
+usuario = usuario_sesion()
+mapa_accesos = accesos.cargar_accesos()
+try:
+    acceso = accesos.permiso(mapa_accesos, usuario)
+except (PermissionError, ValueError) as e:
+    st.error(f"🔒 {e}")
+    st.stop()
+if acceso is not None:
+    st.sidebar.caption(f"🔐 {usuario or 'Anónimo'}: {accesos.describir(acceso)}")
+
+# Fecha a la que se calculan edad y antigüedad
+opciones_referencia = {
+    "Hoy": procesamiento.REFERENCIA_HOY,
+    "Periodo del snapshot": procesamiento.REFERENCIA_PERIODO,
+}
+referencia_calculo = opciones_referencia[st.sidebar.radio(
+    "📅 Calcular edad y antigüedad a la fecha de:",
+    list(opciones_referencia),
+    horizontal=True
+)]
+
+# Motor de consultas: DataFrame en memoria por sesión o base DuckDB compartida (opcional)
+motor_datos = MOTOR_PANDAS
+if consultas.disponible():
+    motores_datos = {"En memoria (pandas)": MOTOR_PANDAS, "Base SQL (DuckDB)": MOTOR_SQL}
+    motor_datos = motores_datos[st.sidebar.radio(
+        "🗄️ Motor de consultas",
+        list(motores_datos),
+        horizontal=True
+    )]
+
+# Cargar datos desde el almacén de snapshots (un Parquet por periodo).
+# Solo se ingieren los exports nuevos o modificados (en paralelo); el resto no se lee.
 try:
-    ACTIVOS_FEB_24 = pd.read_csv("activos_feb_24.csv")
+    rutas_exports = almacen.expandir_exports(FUENTE_DATOS)
+    for archivo, resultado in almacen.sincronizar(rutas_exports, DIRECTORIO_ALMACEN).items():
+        nombre_archivo = os.path.basename(archivo)
+        if resultado["error"]:
+            continue
+        st.sidebar.info(f"📥 {nombre_archivo}: {resultado['filas']} registros en {resultado['segundos']:.2f} s")
+        for periodo, filas, estado in resultado["periodos"]:
+            if estado != "existente":
+                st.sidebar.caption(f"  • periodo {periodo or '—'} {estado} ({filas} registros)")
+    # Los exports omitidos se avisan en cada rerun hasta que se corrijan
+    for archivo, motivo in almacen.exports_con_error(DIRECTORIO_ALMACEN, rutas_exports).items():
+        st.sidebar.warning(f"⚠️ {archivo} omitido: {motivo}")
+
+    periodos_disponibles = almacen.listar_periodos(DIRECTORIO_ALMACEN)
+    if not periodos_disponibles:
+        raise FileNotFoundError(FUENTE_DATOS)
+
+    # Periodo único o rango (por defecto, todos los periodos)
+    if len(periodos_disponibles) > 1:
+        periodo_desde, periodo_hasta = st.sidebar.select_slider(
+            "🗓️ Periodos",
+            options=periodos_disponibles,
+            value=(periodos_disponibles[0], periodos_disponibles[-1])
+        )
+    else:
+        periodo_desde = periodo_hasta = periodos_disponibles[0]
+
+    rutas_datos = tuple(
+        procesamiento.huella_archivo(ruta)[0]
+        for ruta in almacen.rutas_periodos(DIRECTORIO_ALMACEN, periodo_desde, periodo_hasta)
+    )
+    hashes_datos = tuple(calcular_hash_archivo(*procesamiento.huella_archivo(ruta)) for ruta in rutas_datos)
+    inicio_carga = time.time()
+    t0 = time.perf_counter()
+
+    # Indicadores principales primero: salen del resumen guardado en cada partición,
+    # que es de toda la empresa (con acceso restringido no se muestran)
+    if acceso is None:
+        indicadores_previos = resumen_indicadores(rutas_datos, hashes_datos, date.today(), referencia_calculo)
+        if indicadores_previos:
+            mostrar_indicadores(indicadores_previos)
+
+    # Carga en frío en un hilo de fondo, sin esperarla: se muestra su avance y, al
+    # terminar, la página se vuelve a ejecutar. Si el script se vuelve a ejecutar antes,
+    # la carga sigue (no se reinicia). Si una carga anterior terminó pero su tabla o
+    # archivo ya no está, se vuelve a lanzar
+    argumentos_carga = (rutas_datos, date.today(), COLUMNAS_DASHBOARD, referencia_calculo)
+    if motor_datos == MOTOR_SQL:
+        clave_carga = consultas.nombre_tabla(rutas_datos, hashes_datos, *argumentos_carga[1:])
+        funcion_carga = partial(guardar_datos_sql, conexion_sql().cursor(), clave_carga, *argumentos_carga)
+    else:
+        clave_carga = compartido.ruta_publicacion(
+            rutas_datos, hashes_datos, *argumentos_carga[1:], directorio=DIRECTORIO_COMPARTIDO
+        )
+        funcion_carga = partial(publicar_datos, *argumentos_carga, clave_carga)
+    vigente = partial(carga_disponible, motor_datos, clave_carga)
+    if not vigente():
+        mostrar_carga(segundo_plano.iniciar(clave_carga, funcion_carga, vigente=vigente))
+        # Mientras tanto, el resto de la página usa los datos anteriores de la sesión;
+        # sin ellos solo quedan los indicadores principales
+        previa = st.session_state.get("carga_previa")
+        if (previa is None or previa["motor"] != motor_datos or previa["hoy"] != date.today()
+                or previa["acceso"] != acceso or not carga_disponible(motor_datos, previa["clave"])):
+            st.stop()
+        clave_carga, rutas_datos = previa["clave"], previa["rutas"]
+        hashes_datos, referencia_calculo = previa["hashes"], previa["referencia"]
+        st.info("🕒 Mostrando los datos anteriores mientras se cargan los de la nueva selección")
+
+    if motor_datos == MOTOR_SQL:
+        base_sql, tabla_sql, info_carga = obtener_base_sql(
+            rutas_datos, hashes_datos, date.today(), COLUMNAS_DASHBOARD, referencia_calculo
+        )
+        # La base conserva solo las versiones más recientes: si otra sesión eliminó
+        # esta tabla, se olvida la entrada en caché y se vuelve a crear
+        if consultas.leer_info(base_sql.cursor(), tabla_sql) is None:
+            obtener_base_sql.clear()
+            base_sql, tabla_sql, info_carga = obtener_base_sql(
+                rutas_datos, hashes_datos, date.today(), COLUMNAS_DASHBOARD, referencia_calculo
+            )
+        # Un cursor por rerun: la conexión compartida no es segura entre hilos
+        con_sql = base_sql.cursor()
+        # Con acceso restringido todas las consultas van a la vista de sus unidades
+        # (se crea si no existe; desaparece con su tabla)
+        if acceso is not None:
+            tabla_sql = consultas.crear_vista(con_sql, tabla_sql, acceso)
+        total_registros = consultas.total(con_sql, tabla_sql)
+        columnas_datos = consultas.columnas(con_sql, tabla_sql)
+    else:
+        df_processed, info_carga = datos_sesion(
+            rutas_datos, hashes_datos, date.today(), COLUMNAS_DASHBOARD, referencia_calculo, acceso
+        )
+        total_registros = len(df_processed)
+        columnas_datos = list(df_processed.columns)
+    t_carga = time.perf_counter() - t0
+    st.session_state["carga_previa"] = {
+        "motor": motor_datos, "clave": clave_carga, "hoy": date.today(), "acceso": acceso,
+        "rutas": rutas_datos, "hashes": hashes_datos, "referencia": referencia_calculo,
+    }
     st.sidebar.success(f"✅ Datos cargados correctamente")
-    st.sidebar.info(f"📊 Total de registros: {len(ACTIVOS_FEB_24)}")
+    st.sidebar.info(f"📊 Total de registros: {total_registros}")
+    if info_carga["creado"] >= inicio_carga:
+        st.sidebar.caption(f"⏱️ Carga en frío: {t_carga:.3f} s")
+    else:
+        st.sidebar.caption(f"⏱️ Carga desde caché: {t_carga:.3f} s (en frío: {info_carga['t_frio']:.3f} s)")
     
 except FileNotFoundError:
-    st.error("❌ Archivo 'activos_feb_24.csv' no encontrado")
+    st.error(f"❌ Archivo '{FUENTE_DATOS}' no encontrado")
     st.stop()
 except Exception as e:
     st.error(f"❌ Error al cargar el archivo: {str(e)}")
     st.stop()
 
+columnas_originales = info_carga["columnas_originales"]
+
 # Mostrar vista previa de los datos
 with st.expander("🔍 Ver estructura de datos completos", expanded=True):
     col1, col2 = st.columns(2)
     with col1:
         st.write("**Primeras 10 filas:**")
-        # Crear copia para mostrar sin columna sensible
-        df_mostrar = ACTIVOS_FEB_24.copy()
-        # Definir posibles nombres de columna sensible
-        columnas_sensibles = [
-            'DOCUMENTO IDENTIDAD / CEDULA / RUT',
-            'DOCUMENTO IDENTIDAD',
-            'CEDULA',
-            'RUT',
-            'DNI',
-            'IDENTIFICACION'
-        ]
-        # Eliminar columna sensible si existe
-        for col in columnas_sensibles:
-            if col in df_mostrar.columns:
-                df_mostrar = df_mostrar.drop(columns=[col])
+        # Las columnas sensibles ya se eliminaron al cargar
+        for col in procesamiento.COLUMNAS_SENSIBLES:
+            if col in columnas_originales:
                 st.info(f"⚠️ Columna sensible '{col}' oculta por seguridad")
                 break
-        
-        st.dataframe(df_mostrar.head(10))
+        st.dataframe(cargar_muestra(rutas_datos[-1], hashes_datos[-1], acceso))
     with col2:
         st.write("**Información del dataset:**")
-        st.write(f"- Total registros: {len(ACTIVOS_FEB_24)}")
-        st.write(f"- Total columnas: {len(ACTIVOS_FEB_24.columns)}")
+        st.write(f"- Total registros: {total_registros}")
+        st.write(f"- Total columnas: {len(columnas_originales)}")
+        # Los registros por archivo son de todas las unidades
+        origenes = info_carga.get("origenes", {}) if acceso is None else {}
+        if len(origenes) > 1:
+            st.write(f"- Archivos de origen: {len(origenes)}")
+            for origen, filas in origenes.items():
+                st.write(f"  - {origen}: {filas} registros")
+        if motor_datos == MOTOR_SQL:
+            st.write(f"- Base SQL en disco: {os.path.getsize(RUTA_BASE_SQL) / 1e6:.2f} MB "
+                     f"(en pandas: {info_carga['memoria_sin_compactar']:.2f} MB sin compactar)")
+        else:
+            st.write(f"- Datos compartidos (archivo mapeado): {procesamiento.memoria_mb(df_processed):.2f} MB "
+                     f"(sin compactar: {info_carga['memoria_sin_compactar']:.2f} MB)")
         st.write("**Columnas disponibles:**")
-        for col in ACTIVOS_FEB_24.columns:
+        for col in columnas_originales:
             # Marcar columna sensible
             es_sensible = any(sensible.lower() in col.lower() for sensible in ['documento', 'cedula', 'rut', 'dni', 'identidad'])
             if es_sensible:
@@ -67,144 +394,85 @@ with st.expander("🔍 Ver estructura de datos completos", expanded=True):
             else:
                 st.write(f"- {col}")
 
+perfil.cerrar_etapa(cronometro, "1 Carga", filas_salida=total_registros)
+cronometro["contexto"]["motor"] = motor_datos
+
 # -------------------------------
 # 2. Procesamiento de datos
 # -------------------------------
-# Hacer una copia para no modificar el original
-df_processed = ACTIVOS_FEB_24.copy()
-
-# Eliminar columna sensible del dataframe procesado
-columnas_sensibles = [
-    'DOCUMENTO IDENTIDAD / CEDULA / RUT',
-    'DOCUMENTO IDENTIDAD',
-    'CEDULA',
-    'RUT',
-    'DNI',
-    'IDENTIFICACION'
-]
-
-for col in columnas_sensibles:
-    if col in df_processed.columns:
-        df_processed = df_processed.drop(columns=[col])
+# El procesamiento (fechas, edad, rangos) se hace en cargar_datos y queda en caché;
+# aquí solo se muestran sus mensajes
+for col in procesamiento.COLUMNAS_SENSIBLES:
+    if col in columnas_originales:
         st.sidebar.warning(f"🔒 Columna '{col}' eliminada por seguridad")
 
-# Lista para almacenar columnas procesadas
-columnas_procesadas = []
-
-# FUNCIÓN MEJORADA: Procesar fechas de manera flexible
-def procesar_fecha_flexible(df, posibles_nombres, nombre_salida):
-    """Intenta procesar fechas con diferentes nombres posibles"""
-    for nombre_col in posibles_nombres:
-        if nombre_col in df.columns:
-            try:
-                # Intentar diferentes formatos
-                df[nombre_salida] = pd.to_datetime(
-                    df[nombre_col], 
-                    dayfirst=True,  # Importante para formato latino
-                    errors='coerce'
-                )
-                
-                # Verificar si se convirtieron algunas fechas
-                if df[nombre_salida].notna().any():
-                    columnas_procesadas.append((nombre_col, nombre_salida))
-                    return True
-            except:
-                continue
-    return False
-
-# Procesar fecha de nacimiento (probando diferentes nombres posibles)
-fecha_nac_posibles = [
-    'FECHA DE NACIMIENTO (DD/MM/YYYY)',
-    'FECHA_NACIMIENTO',
-    'FECHA NACIMIENTO',
-    'NACIMIENTO',
-    'FECHA_NAC'
-]
-
-fecha_nac_procesada = procesar_fecha_flexible(
-    df_processed, 
-    fecha_nac_posibles, 
-    "FECHA_NAC"
-)
-
-# Procesar fecha de ingreso (probando diferentes nombres posibles)
-fecha_ing_posibles = [
-    'FECHA DE INGRESO (DD/MM/YYYY)',
-    'FECHA_INGRESO',
-    'FECHA INGRESO',
-    'INGRESO',
-    'FECHA_ING'
-]
-
-fecha_ing_procesada = procesar_fecha_flexible(
-    df_processed, 
-    fecha_ing_posibles, 
-    "FECHA_INGRESO"
-)
-
 # Mostrar qué columnas se procesaron
+columnas_procesadas = info_carga["columnas_procesadas"]
 if columnas_procesadas:
     st.sidebar.info("📅 Columnas de fecha procesadas:")
-    for orig, nueva in columnas_procesadas:
-        st.sidebar.write(f"  • {orig} → {nueva}")
-
-# Calcular edad si tenemos fecha de nacimiento
-if fecha_nac_procesada:
-    try:
-        hoy = date.today()
-        df_processed["EDAD"] = df_processed["FECHA_NAC"].apply(
-            lambda x: hoy.year - x.year - ((hoy.month, hoy.day) < (x.month, x.day)) 
-            if pd.notnull(x) else None
-        )
-        df_processed["EDAD"] = pd.to_numeric(df_processed["EDAD"], errors="coerce")
-        
-        # Clasificación por grupos etarios (solo si hay edades válidas)
-        if df_processed["EDAD"].notna().any():
-            df_processed["RANGO_EDAD"] = pd.cut(
-                df_processed["EDAD"],
-                bins=[18, 25, 35, 45, 55, 65, 100],
-                labels=["18-25", "26-35", "36-45", "46-55", "56-65", "65+"],
-                right=True,
-                include_lowest=True
-            )
-            st.sidebar.success("✅ Edad y rangos calculados")
-    except Exception as e:
-        st.sidebar.warning(f"⚠️ Error calculando edad: {str(e)}")
-
-# Procesar año y mes de ingreso
-if fecha_ing_procesada:
-    try:
-        df_processed["AÑO_INGRESO"] = df_processed["FECHA_INGRESO"].dt.year
-        df_processed["MES_NUM"] = df_processed["FECHA_INGRESO"].dt.month
-        meses_es = {
-            1:"Enero", 2:"Febrero", 3:"Marzo", 4:"Abril", 5:"Mayo", 6:"Junio",
-            7:"Julio", 8:"Agosto", 9:"Septiembre", 10:"Octubre", 11:"Noviembre", 12:"Diciembre"
-        }
-        df_processed["MES_INGRESO"] = df_processed["MES_NUM"].map(meses_es)
-        st.sidebar.success("✅ Fechas de ingreso procesadas")
-    except Exception as e:
-        st.sidebar.warning(f"⚠️ Error procesando fechas de ingreso: {str(e)}")
+    for orig, nueva, formato, sin_convertir in columnas_procesadas:
+        st.sidebar.write(f"  • {orig} → {nueva} (formato {formato})")
+        if sin_convertir:
+            st.sidebar.warning(f"⚠️ {sin_convertir} valores de '{orig}' no se pudieron convertir a fecha")
+
+for nivel, mensaje in info_carga["mensajes"]:
+    getattr(st.sidebar, nivel)(mensaje)
+
+perfil.cerrar_etapa(cronometro, "2 Procesamiento", total_registros, total_registros)
 
 # -------------------------------
 # 3. CONFIGURAR FILTROS (VERSIÓN SIMPLIFICADA)
 # -------------------------------
 st.sidebar.header("🎛️ Filtros")
 
-# NOTA IMPORTANTE: Usaremos df_processed directamente
-df_filtrado = df_processed.copy()
+# NOTA IMPORTANTE: Usaremos df_processed directamente (sin copias)
+
+# Columnas con más opciones que esto usan búsqueda en vez de la lista completa
+UMBRAL_FILTRO_BUSQUEDA = 50
+MAX_RESULTADOS_BUSQUEDA = 50
+
+def crear_filtro_busqueda(columna_nombre, label, indice):
+    """
+    Filtro para columnas con muchas opciones (ej. puestos).
+
+    Selección vacía = todos (no filtra); las opciones del widget son solo las
+    seleccionadas más los resultados de la búsqueda (o los más frecuentes).
+    """
+    entrada = indice[columna_nombre]
+    clave = f"filtro_{columna_nombre}"
+    seleccionados = st.session_state.get(clave, [])
+
+    texto = st.sidebar.text_input(
+        f"🔎 Buscar {label.lower()}",
+        key=f"buscar_{columna_nombre}",
+        placeholder="Escribe parte del nombre"
+    )
+    resultados = filtros.buscar_opciones(entrada, texto, MAX_RESULTADOS_BUSQUEDA)
+    ya_incluidos = set(seleccionados)
+    opciones = list(seleccionados) + [o for o in resultados if o not in ya_incluidos]
+
+    seleccion = st.sidebar.multiselect(
+        f"{label} ({len(entrada['opciones'])} opciones, vacío = todos)",
+        options=opciones,
+        key=clave,
+        help="Sin búsqueda se sugieren los de mayor cantidad de personas"
+    )
+    if texto.strip() and not resultados:
+        st.sidebar.caption(f"Sin coincidencias para '{texto.strip()}'")
+    return seleccion
 
 # FUNCIÓN MEJORADA PARA CREAR FILTROS
-def crear_filtro_seguro(columna_nombre, label, df, default_all=True):
+def crear_filtro_seguro(columna_nombre, label, indice, default_all=True):
     """Crea un filtro que no elimina datos si está vacío"""
-    if columna_nombre in df.columns:
-        # Obtener valores únicos y limpiar
-        valores = df[columna_nombre].dropna().unique()
-        valores = [v for v in valores if str(v).strip() != '']
+    if columna_nombre in indice:
+        # Opciones ya limpias y ordenadas en el índice
+        opciones = indice[columna_nombre]["opciones"]
+
+        if len(opciones) > UMBRAL_FILTRO_BUSQUEDA:
+            # Vacío = todos: no se agrega a filtros_aplicados
+            return crear_filtro_busqueda(columna_nombre, label, indice)
         
-        if len(valores) > 0:
-            # Convertir a string y ordenar
-            opciones = sorted([str(v).strip() for v in valores], key=lambda x: str(x))
-            
+        if len(opciones) > 0:
             if default_all:
                 seleccion = st.sidebar.multiselect(
                     f"{label} ({len(opciones)} opciones)",
@@ -230,7 +498,10 @@ nombres_amigables = {
     "RANGO_EDAD": "Rango de Edad",
     "AÑO_INGRESO": "Año de Ingreso",
     "MES_INGRESO": "Mes de Ingreso",
-    "EDAD": "Edad"
+    "EDAD": "Edad",
+    "RANGO_ANTIGUEDAD": "Rango de Antigüedad",
+    "gerencia": "Gerencia",
+    "area": "Área"
 }
 
 # Crear filtros para las columnas comunes
@@ -247,9 +518,33 @@ columnas_para_filtros = [
     "MES_INGRESO"
 ]
 
+# Dimensiones del cubo de gráficos: los filtros más las que solo se grafican
+columnas_cubo = columnas_para_filtros + ["RANGO_ANTIGUEDAD", "MES_NAC", "periodo"]
+
+@st.cache_resource(show_spinner=False)
+def obtener_indice_y_cubo(rutas, hashes_contenido, hoy, columnas, referencia, acceso, columnas_indice):
+    """Índice de filtros y cubo de headcount; uno por dataset y acceso, compartidos (solo lectura)"""
+    df, _ = datos_sesion(rutas, hashes_contenido, hoy, columnas, referencia, acceso)
+    indice = filtros.construir_indice(df, columnas_indice)
+    return indice, agregados.construir_cubo(indice, columnas_indice)
+
+@st.cache_resource(show_spinner=False)
+def obtener_indice_sql(_base, tabla, columnas_indice):
+    """Opciones de los filtros desde la base SQL (sin códigos por fila)"""
+    return consultas.construir_indice(_base.cursor(), tabla, columnas_indice)
+
+if motor_datos == MOTOR_SQL:
+    indice_filtros = obtener_indice_sql(base_sql, tabla_sql, tuple(columnas_cubo))
+    cubo_headcount = None
+else:
+    indice_filtros, cubo_headcount = obtener_indice_y_cubo(
+        rutas_datos, hashes_datos, date.today(), COLUMNAS_DASHBOARD, referencia_calculo, acceso,
+        tuple(columnas_cubo)
+    )
+
 for columna in columnas_para_filtros:
     label = nombres_amigables.get(columna, columna)
-    valores_filtro = crear_filtro_seguro(columna, label, df_processed)
+    valores_filtro = crear_filtro_seguro(columna, label, indice_filtros)
     if valores_filtro:
         filtros_aplicados[columna] = valores_filtro
 
@@ -259,46 +554,79 @@ for columna in columnas_para_filtros:
 st.sidebar.header("📊 Estadísticas")
 
 # Mostrar estadísticas ANTES de filtrar
-st.sidebar.write(f"**Total registros:** {len(df_processed)}")
+st.sidebar.write(f"**Total registros:** {total_registros}")
+if motor_datos == MOTOR_SQL:
+    st.sidebar.caption("🗄️ Filtros y conteos resueltos en SQL (DuckDB)")
+else:
+    st.sidebar.caption(f"🧊 Cubo de gráficos: {len(cubo_headcount)} celdas")
 
-# Aplicar filtros de manera INCREMENTAL
-df_temp = df_processed.copy()
+# Etapas que dependen de los filtros: se guardan en la sesión con la clave de
+# sus entradas y solo se recalculan si esta cambia (ver dependencias.py)
+memo_etapas = st.session_state.setdefault("memo_etapas", dependencias.nuevo_memo())
+dependencias.iniciar_rerun(memo_etapas)
+firma_base = (motor_datos, hashes_datos, date.today().isoformat(), referencia_calculo, acceso)
+firma_seleccion = filtros.firma_filtros(indice_filtros, filtros_aplicados)
 
-for columna, valores in filtros_aplicados.items():
-    if columna in df_temp.columns and valores:
-        try:
-            # Convertir a string para comparación
-            mask = df_temp[columna].astype(str).str.strip().isin([str(v).strip() for v in valores])
-            registros_antes = len(df_temp)
-            df_temp = df_temp[mask]
-            registros_despues = len(df_temp)
-            
-            if registros_despues < registros_antes:
-                st.sidebar.info(f"Filtro '{nombres_amigables.get(columna, columna)}': {registros_despues} registros")
-        except Exception as e:
-            st.sidebar.warning(f"Error en filtro {columna}: {str(e)}")
+def mascara_guardada(columna, entrada, valores):
+    """Máscara de un filtro; se recalcula solo si cambia la selección de esa columna"""
+    return dependencias.calcular(
+        memo_etapas, ("mascara", columna), (firma_base, filtros.seleccion_columna(entrada, valores)),
+        filtros.mascara_columna, entrada, valores, max_entradas=dependencias.MAX_ENTRADAS_FILAS
+    )
 
-# Asignar el resultado filtrado
-df_filtrado = df_temp
+def seleccionar_posiciones(indice, filtros_sel):
+    """Posiciones de las filas filtradas (None = todas) y registros tras cada filtro"""
+    mascara, conteos = filtros.seleccionar_filas(indice, filtros_sel, mascara_guardada)
+    return (None if mascara is None else np.flatnonzero(mascara)), conteos
+
+# Aplicar filtros: OR dentro de cada columna, AND entre columnas
+# (las columnas con todas las opciones seleccionadas no se evalúan).
+# En memoria se usa el índice; en SQL se traducen a un WHERE.
+try:
+    if motor_datos == MOTOR_SQL:
+        condiciones_sql = consultas.condiciones(indice_filtros, filtros_aplicados)
+        registros_filtrados, conteos_filtros = dependencias.calcular(
+            memo_etapas, "seleccion", (firma_base, firma_seleccion),
+            consultas.contar_filtros, con_sql, tabla_sql, condiciones_sql
+        )
+    else:
+        filas_filtradas, conteos_filtros = dependencias.calcular(
+            memo_etapas, "seleccion", (firma_base, firma_seleccion),
+            seleccionar_posiciones, indice_filtros, filtros_aplicados,
+            max_entradas=dependencias.MAX_ENTRADAS_FILAS
+        )
+except Exception as e:
+    st.sidebar.warning(f"Error aplicando filtros: {str(e)}")
+    filas_filtradas, conteos_filtros, condiciones_sql = None, [], []
+    registros_filtrados = total_registros
+
+for columna, registros_despues in conteos_filtros:
+    st.sidebar.info(f"Filtro '{nombres_amigables.get(columna, columna)}': {registros_despues} registros")
+
+# El resultado filtrado son posiciones de filas (None = todas); no se arma otro DataFrame
+if motor_datos == MOTOR_PANDAS:
+    registros_filtrados = total_registros if filas_filtradas is None else len(filas_filtradas)
 
 # Mostrar estadísticas DESPUÉS de filtrar
-st.sidebar.write(f"**Registros filtrados:** {len(df_filtrado)}")
+st.sidebar.write(f"**Registros filtrados:** {registros_filtrados}")
 
-if len(df_filtrado) == 0:
+if registros_filtrados == 0:
     st.sidebar.error("⚠️ ¡Cuidado! Los filtros eliminaron todos los registros")
     st.sidebar.info("💡 Sugerencia: Selecciona menos opciones en los filtros")
-elif len(df_filtrado) < len(df_processed):
-    st.sidebar.success(f"✅ Filtrado aplicado: {len(df_filtrado)} de {len(df_processed)} registros")
+elif registros_filtrados < total_registros:
+    st.sidebar.success(f"✅ Filtrado aplicado: {registros_filtrados} de {total_registros} registros")
 else:
     st.sidebar.info("ℹ️ Mostrando todos los registros disponibles")
 
+perfil.cerrar_etapa(cronometro, "3-4 Filtros", total_registros, registros_filtrados)
+
 # -------------------------------
 # 5. MOSTRAR GRÁFICOS (VERSIÓN ROBUSTA)
 # -------------------------------
 st.header("📈 Visualizaciones de Datos - ROSTADINA EIRL")
 
 # Verificar si hay datos filtrados
-if df_filtrado.empty:
+if registros_filtrados == 0:
     st.warning("""
     ⚠️ **No hay datos visibles después de aplicar los filtros.**
     
@@ -312,9 +640,12 @@ if df_filtrado.empty:
     """)
     
     # Mostrar qué columnas tienen datos
+    if motor_datos == MOTOR_SQL:
+        no_nulos_columnas = consultas.no_nulos(con_sql, tabla_sql)
+    else:
+        no_nulos_columnas = df_processed.notna().sum()
     columnas_con_datos = []
-    for col in df_processed.columns:
-        no_nulos = df_processed[col].notna().sum()
+    for col, no_nulos in no_nulos_columnas.items():
         if no_nulos > 0:
             columnas_con_datos.append((col, no_nulos))
     
@@ -326,348 +657,657 @@ if df_filtrado.empty:
     st.write("\n**Valores de ejemplo en columnas importantes:**")
     
     for col in columnas_importantes:
-        if col in df_processed.columns:
-            valores = df_processed[col].dropna().unique()[:5]
+        if col in columnas_datos:
+            if motor_datos == MOTOR_SQL:
+                valores = consultas.valores_ejemplo(con_sql, tabla_sql, col)
+            else:
+                valores = df_processed[col].dropna().unique()[:5]
             if len(valores) > 0:
                 st.write(f"- **{col}**: {', '.join([str(v) for v in valores])}")
     
     # Mostrar datos sin filtros como fallback
     st.info("📋 **Mostrando datos sin filtros para referencia:**")
-    st.dataframe(df_processed.head(20))
+    if motor_datos == MOTOR_SQL:
+        st.dataframe(consultas.consultar(con_sql, tabla_sql, [], limite=20))
+    else:
+        st.dataframe(df_processed.head(20))
     
     # Usar datos sin filtrar para gráficos
-    df_para_graficos = df_processed
+    graficos_sin_filtrar = True
+    firma_conteos = ""
+    registros_graficos = total_registros
+    if motor_datos == MOTOR_SQL:
+        condiciones_graficos = []
+    else:
+        filas_para_graficos = None
+        cubo_para_graficos = cubo_headcount
     st.warning("⚠️ Mostrando gráficos con datos SIN FILTRAR")
     
 else:
-    # Usar datos filtrados para gráficos
-    df_para_graficos = df_filtrado
-    st.success(f"✅ Mostrando gráficos con {len(df_filtrado)} registros filtrados")
+    # Usar datos filtrados para gráficos (los conteos salen del cubo o de SQL)
+    graficos_sin_filtrar = False
+    firma_conteos = firma_seleccion
+    registros_graficos = registros_filtrados
+    if motor_datos == MOTOR_SQL:
+        condiciones_graficos = condiciones_sql
+    else:
+        filas_para_graficos = filas_filtradas
+        cubo_para_graficos = dependencias.calcular(
+            memo_etapas, "cubo_filtrado", (firma_base, firma_seleccion),
+            agregados.filtrar_cubo, cubo_headcount, indice_filtros, filtros_aplicados
+        )
+    st.success(f"✅ Mostrando gráficos con {registros_filtrados} registros filtrados")
+
+def contar_columna(columna):
+    """
+    Conteo por valor de una columna con los datos de los gráficos (sin vacíos, de mayor a menor).
+
+    Se guarda por (datos, filtros, columna): la Serie es compartida y no debe modificarse.
+    """
+    if motor_datos == MOTOR_SQL:
+        return dependencias.calcular(
+            memo_etapas, "conteo", (firma_base, firma_conteos, columna),
+            consultas.contar, con_sql, tabla_sql, condiciones_graficos, columna
+        )
+    return dependencias.calcular(
+        memo_etapas, "conteo", (firma_base, firma_conteos, columna),
+        agregados.contar, cubo_para_graficos, indice_filtros, columna
+    )
+
+def filas_graficos(columnas=None, limite=None):
+    """Filas de los datos de los gráficos (solo las columnas y cantidad pedidas)"""
+    if motor_datos == MOTOR_SQL:
+        return consultas.consultar(con_sql, tabla_sql, condiciones_graficos, columnas, limite)
+    df = df_processed if columnas is None else df_processed[columnas]
+    if filas_para_graficos is None:
+        return df if limite is None else df.head(limite)
+    return df.take(filas_para_graficos if limite is None else filas_para_graficos[:limite])
 
 # -------------------------------
 # 6. CREAR GRÁFICOS (SIEMPRE)
 # -------------------------------
 # Crear gráficos incluso si hay pocos datos
 
+# Motor de gráficos: imagen de matplotlib o gráfico nativo del navegador (Vega-Lite)
+motores_graficos = {
+    "Imagen (matplotlib)": graficos.MOTOR_MATPLOTLIB,
+    "Nativo (Vega-Lite)": graficos.MOTOR_VEGA,
+}
+motor_graficos = motores_graficos[st.sidebar.radio(
+    "🖼️ Motor de gráficos",
+    list(motores_graficos)
+)]
+
+# Firma de los datos que se grafican: dataset + fecha de cálculo + acceso + filtros activos
+# (vacía cuando se grafica sin filtrar, incluido el caso en que los filtros no dejan datos)
+firma_graficos = (
+    hashes_datos,
+    date.today().isoformat(),
+    referencia_calculo,
+    acceso,
+    firma_conteos,
+)
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def renderizar_png(grafico, columna, tipo, top_n, firma, titulo, _conteo):
+    """PNG de un gráfico; se memoiza por (gráfico, columna, tipo, top_n, firma de filtros)"""
+    if grafico == "cumpleanos":
+        fig = graficos.figura_cumpleanos(_conteo, titulo)
+    elif grafico == "estructura":
+        fig = graficos.figura_sunburst(_conteo, titulo)
+    else:
+        fig = graficos.figura_conteo(_conteo, titulo, tipo)
+    return graficos.figura_a_png(fig)
+
+def mostrar_grafico(grafico):
+    """Muestra un gráfico creado con crear_grafico_seguro"""
+    if isinstance(grafico, dict):
+        st.vega_lite_chart(grafico, width="stretch")
+    else:
+        st.image(grafico, width="stretch")
+
 # FUNCIÓN MEJORADA PARA CREAR GRÁFICOS
-def crear_grafico_seguro(df, columna, titulo, tipo='bar', top_n=10):
-    """Crea un gráfico seguro incluso con pocos datos"""
-    if columna in df.columns:
+def crear_grafico_seguro(columna, titulo, tipo='bar', top_n=10):
+    """Crea un gráfico seguro incluso con pocos datos (conteos desde el cubo o SQL)"""
+    if columna in columnas_datos:
         try:
-            # Limpiar datos
-            datos_limpios = df[columna].dropna()
-            if datos_limpios.empty:
-                return None
-            
-            # Contar valores
-            conteo = datos_limpios.value_counts().head(top_n)
-            if conteo.empty:
+            # Contar valores (sin vacíos)
+            conteo_total = contar_columna(columna)
+            if conteo_total.empty:
                 return None
             
-            # Crear figura
-            fig, ax = plt.subplots(figsize=(10, 6))
+            conteo = conteo_total.head(top_n)
+            titulo_completo = f"{titulo} (Total: {conteo_total.sum()})"
             
-            if tipo == 'bar':
-                colors = plt.cm.Set3(range(len(conteo)))
-                bars = ax.bar(conteo.index.astype(str), conteo.values, color=colors)
-                ax.set_ylabel('Cantidad')
-                
-                # Agregar valores en barras
-                for bar, valor in zip(bars, conteo.values):
-                    height = bar.get_height()
-                    ax.text(bar.get_x() + bar.get_width()/2, height + 0.5,
-                           str(valor), ha='center', va='bottom')
-                
-                plt.xticks(rotation=45, ha='right')
-                
-            elif tipo == 'barh':
-                colors = plt.cm.Set2(range(len(conteo)))
-                bars = ax.barh(range(len(conteo)), conteo.values, color=colors)
-                ax.set_yticks(range(len(conteo)))
-                ax.set_yticklabels(conteo.index.astype(str))
-                ax.set_xlabel('Cantidad')
-                
-                # Agregar valores en barras
-                for i, valor in enumerate(conteo.values):
-                    ax.text(valor + 0.5, i, str(valor), va='center')
-            
-            elif tipo == 'pie':
-                colors = plt.cm.Pastel1(range(len(conteo)))
-                wedges, texts, autotexts = ax.pie(conteo.values, 
-                                                 labels=conteo.index.astype(str),
-                                                 colors=colors,
-                                                 autopct='%1.1f%%',
-                                                 startangle=90)
-                ax.axis('equal')
-            
-            ax.set_title(f"{titulo} (Total: {len(datos_limpios)})")
-            plt.tight_layout()
-            
-            return fig
+            if motor_graficos == graficos.MOTOR_VEGA:
+                return graficos.especificacion_vega(conteo, titulo_completo, tipo)
+            return renderizar_png(
+                titulo, columna, tipo, top_n, firma_graficos, titulo_completo, conteo
+            )
         
         except Exception as e:
             st.warning(f"No se pudo crear gráfico para '{columna}': {str(e)}")
             return None
     return None
 
-# Organizar gráficos en pestañas
-tab1, tab2, tab3 = st.tabs(["👥 Demografía", "🏢 Organización", "📅 Temporal"])
+@st.cache_resource(show_spinner="Armando la estructura organizacional...", max_entries=16)
+def obtener_cubo_estructura(rutas, hashes_contenido, hoy, columnas, referencia, acceso, dimensiones, _indice):
+    """Cubo de la estructura (niveles × dimensiones de los filtros); uno por dataset y acceso (solo lectura)"""
+    df, _ = datos_sesion(rutas, hashes_contenido, hoy, columnas, referencia, acceso)
+    return jerarquia.cubo_estructura(df, _indice, dimensiones)
+
+def arbol_filtrado(cubo, indice, filtros_sel):
+    """Árbol unidad → gerencia → área → puesto de las celdas del cubo que cumplen los filtros"""
+    return jerarquia.construir_arbol(jerarquia.hojas(cubo, indice, filtros_sel))
+
+@st.cache_resource(show_spinner="Armando la estructura organizacional...", max_entries=32)
+def obtener_arbol_sql(_base, tabla, firma, _condiciones):
+    """Árbol de la estructura desde la base SQL (un GROUP BY de los cuatro niveles)"""
+    return jerarquia.construir_arbol(consultas.hojas_jerarquia(
+        _base.cursor(), tabla, _condiciones, jerarquia.NIVELES,
+        jerarquia.COLUMNA_GENERO, jerarquia.COLUMNA_EDAD, jerarquia.SIN_DATO
+    ))
+
+@st.cache_data(show_spinner="Calculando salidas históricas...")
+def calcular_tasas_salida(rutas, hashes_contenido, acceso):
+    """Tasas de salida por área y puesto entre los periodos elegidos, solo de las unidades permitidas"""
+    columnas = [movimientos.COLUMNA_PERIODO, procesamiento.COLUMNA_CLAVE, *riesgo.COLUMNAS_EFECTO]
+    return riesgo.tasas_salida(almacen.leer_periodos(rutas, columnas, filtros=accesos.filtros_parquet(acceso)))
+
+@st.cache_resource(show_spinner="Calculando riesgo de rotación...", max_entries=16)
+def obtener_puntajes(rutas, hashes_contenido, hoy, columnas, referencia, acceso, modelo, version, fecha):
+    """Puntaje de riesgo de las filas de la sesión (una pasada); uno por dataset, acceso, versión de modelo y fecha"""
+    df, _ = datos_sesion(rutas, hashes_contenido, hoy, columnas, referencia, acceso)
+    tasas = calcular_tasas_salida(rutas, hashes_contenido, acceso)
+    return riesgo.puntuar(df, modelo, fecha, tasas)
+
+def puntuar_sql(modelo, fecha, columnas_sel):
+    """Filas filtradas desde SQL con su puntaje de riesgo"""
+    df_riesgo = consultas.consultar(con_sql, tabla_sql, condiciones_graficos, columnas_sel)
+    tasas = calcular_tasas_salida(rutas_datos, hashes_datos, acceso)
+    return df_riesgo, riesgo.puntuar(df_riesgo, modelo, fecha, tasas)
+
+# Organizar gráficos en pestañas; con on_change="rerun" solo se calcula la pestaña activa
+tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(
+    ["👥 Demografía", "🏢 Organización", "📅 Temporal", "📈 Tendencia", "🧭 Estructura", "⚠️ Riesgo"],
+    key="pestana_graficos",
+    on_change="rerun"
+)
 
 with tab1:
-    st.subheader("Análisis Demográfico")
+    if tab1.open:
+        st.subheader("Análisis Demográfico")
     
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        # Gráfico de género
-        fig_genero = crear_grafico_seguro(
-            df_para_graficos, 
-            "GENERO (F/M)", 
-            "Distribución por Género",
-            tipo='pie'
-        )
-        if fig_genero:
-            st.pyplot(fig_genero)
-        else:
-            st.info("No hay datos de género disponibles")
+        col1, col2 = st.columns(2)
     
-    with col2:
-        # Gráfico de rango de edad
-        if "RANGO_EDAD" in df_para_graficos.columns:
-            fig_edad = crear_grafico_seguro(
-                df_para_graficos,
-                "RANGO_EDAD",
-                "Distribución por Rango de Edad",
-                tipo='bar'
+        with col1:
+            # Gráfico de género
+            fig_genero = crear_grafico_seguro(
+                "GENERO (F/M)", 
+                "Distribución por Género",
+                tipo='pie'
             )
-            if fig_edad:
-                st.pyplot(fig_edad)
+            if fig_genero:
+                mostrar_grafico(fig_genero)
             else:
-                st.info("No hay datos de rango de edad")
-        else:
-            st.info("No se pudo calcular el rango de edad")
+                st.info("No hay datos de género disponibles")
+    
+        with col2:
+            # Gráfico de rango de edad
+            if "RANGO_EDAD" in columnas_datos:
+                fig_edad = crear_grafico_seguro(
+                    "RANGO_EDAD",
+                    "Distribución por Rango de Edad",
+                    tipo='bar'
+                )
+                if fig_edad:
+                    mostrar_grafico(fig_edad)
+                else:
+                    st.info("No hay datos de rango de edad")
+            else:
+                st.info("No se pudo calcular el rango de edad")
 
 with tab2:
-    st.subheader("Análisis Organizacional")
+    if tab2.open:
+        st.subheader("Análisis Organizacional")
     
-    col1, col2 = st.columns(2)
+        col1, col2 = st.columns(2)
     
-    with col1:
-        # Gráfico de unidades de negocio
-        fig_unidad = crear_grafico_seguro(
-            df_para_graficos,
-            "UNIDAD DE NEGOCIO",
-            "Distribución por Unidad de Negocio",
-            tipo='bar',
-            top_n=15
-        )
-        if fig_unidad:
-            st.pyplot(fig_unidad)
-        else:
-            st.info("No hay datos de unidades de negocio")
+        with col1:
+            # Gráfico de unidades de negocio
+            fig_unidad = crear_grafico_seguro(
+                "UNIDAD DE NEGOCIO",
+                "Distribución por Unidad de Negocio",
+                tipo='bar',
+                top_n=15
+            )
+            if fig_unidad:
+                mostrar_grafico(fig_unidad)
+            else:
+                st.info("No hay datos de unidades de negocio")
     
-    with col2:
-        # Gráfico de puestos
-        fig_puestos = crear_grafico_seguro(
-            df_para_graficos,
-            "POSICION / PUESTO / CARGO",
-            "Top 10 Puestos",
-            tipo='barh',
-            top_n=10
-        )
-        if fig_puestos:
-            st.pyplot(fig_puestos)
-        else:
-            st.info("No hay datos de puestos")
+        with col2:
+            # Gráfico de puestos
+            fig_puestos = crear_grafico_seguro(
+                "POSICION / PUESTO / CARGO",
+                "Top 10 Puestos",
+                tipo='barh',
+                top_n=10
+            )
+            if fig_puestos:
+                mostrar_grafico(fig_puestos)
+            else:
+                st.info("No hay datos de puestos")
 
 with tab3:
-    st.subheader("Análisis Temporal")
+    if tab3.open:
+        st.subheader("Análisis Temporal")
     
-    col1, col2 = st.columns(2)
+        col1, col2 = st.columns(2)
     
-    with col1:
-        # Gráfico de año de ingreso
-        if "AÑO_INGRESO" in df_para_graficos.columns:
-            fig_anio = crear_grafico_seguro(
-                df_para_graficos,
-                "AÑO_INGRESO",
-                "Ingresos por Año",
+        with col1:
+            # Gráfico de año de ingreso
+            if "AÑO_INGRESO" in columnas_datos:
+                fig_anio = crear_grafico_seguro(
+                    "AÑO_INGRESO",
+                    "Ingresos por Año",
+                    tipo='bar'
+                )
+                if fig_anio:
+                    mostrar_grafico(fig_anio)
+                else:
+                    st.info("No hay datos de año de ingreso")
+    
+        with col2:
+            # Gráfico de mes de ingreso
+            if "MES_INGRESO" in columnas_datos:
+                fig_mes = crear_grafico_seguro(
+                    "MES_INGRESO",
+                    "Ingresos por Mes",
+                    tipo='bar'
+                )
+                if fig_mes:
+                    mostrar_grafico(fig_mes)
+                else:
+                    st.info("No hay datos de mes de ingreso")
+    
+        # Gráfico de antigüedad
+        if "RANGO_ANTIGUEDAD" in columnas_datos:
+            fig_antiguedad = crear_grafico_seguro(
+                "RANGO_ANTIGUEDAD",
+                "Distribución por Antigüedad (años)",
                 tipo='bar'
             )
-            if fig_anio:
-                st.pyplot(fig_anio)
+            if fig_antiguedad:
+                mostrar_grafico(fig_antiguedad)
             else:
-                st.info("No hay datos de año de ingreso")
+                st.info("No hay datos de antigüedad")
     
-    with col2:
-        # Gráfico de mes de ingreso
-        if "MES_INGRESO" in df_para_graficos.columns:
-            fig_mes = crear_grafico_seguro(
-                df_para_graficos,
-                "MES_INGRESO",
-                "Ingresos por Mes",
-                tipo='bar'
-            )
-            if fig_mes:
-                st.pyplot(fig_mes)
+        # Gráfico de cumpleaños por mes
+        st.subheader("🎂 Cumpleaños por Mes")
+        if "MES_NAC" in columnas_datos:
+            try:
+                cumple_mes = contar_columna("MES_NAC")
+                cumple_mes = cumple_mes.set_axis(cumple_mes.index.astype(int)).sort_index()
+                if not cumple_mes.empty:
+                    cumple_mes.index = [procesamiento.MESES_ES.get(m, f"Mes {m}") for m in cumple_mes.index]
+                    titulo_cumple = f"Cumpleaños por Mes (Total: {cumple_mes.sum()})"
+                    if motor_graficos == graficos.MOTOR_VEGA:
+                        mostrar_grafico(graficos.especificacion_vega(cumple_mes, titulo_cumple, paleta='Pastel2'))
+                    else:
+                        mostrar_grafico(renderizar_png(
+                            "cumpleanos", "MES_NAC", "bar", 12, firma_graficos, titulo_cumple, cumple_mes
+                        ))
+            except:
+                st.info("No se pudieron procesar las fechas de cumpleaños")
+
+with tab4:
+    if tab4.open:
+        st.subheader("Headcount por Periodo")
+    
+        col1, col2 = st.columns(2)
+    
+        with col1:
+            # Periodos elegidos, con los filtros aplicados (desde el cubo)
+            tendencia = contar_columna("periodo").sort_index()
+            if len(tendencia) > 1:
+                titulo_tendencia = "Headcount por Periodo (filtros aplicados)"
+                if motor_graficos == graficos.MOTOR_VEGA:
+                    mostrar_grafico(graficos.especificacion_vega(tendencia, titulo_tendencia, tipo='line'))
+                else:
+                    mostrar_grafico(renderizar_png(
+                        "tendencia", "periodo", "line", len(tendencia), firma_graficos,
+                        titulo_tendencia, tendencia
+                    ))
             else:
-                st.info("No hay datos de mes de ingreso")
+                st.info("Elige un rango de periodos en el sidebar para ver la tendencia")
     
-    # Gráfico de cumpleaños por mes
-    st.subheader("🎂 Cumpleaños por Mes")
-    if "FECHA_NAC" in df_para_graficos.columns:
-        try:
-            cumple_mes = df_para_graficos["FECHA_NAC"].dt.month.value_counts().sort_index()
-            if not cumple_mes.empty:
-                fig, ax = plt.subplots(figsize=(12, 6))
-                
-                meses_es = {
-                    1:"Enero", 2:"Febrero", 3:"Marzo", 4:"Abril", 5:"Mayo", 6:"Junio",
-                    7:"Julio", 8:"Agosto", 9:"Septiembre", 10:"Octubre", 11:"Noviembre", 12:"Diciembre"
-                }
-                
-                meses_nombres = [meses_es.get(m, f"Mes {m}") for m in cumple_mes.index]
-                colores = plt.cm.Pastel2(range(len(cumple_mes)))
-                
-                bars = ax.bar(meses_nombres, cumple_mes.values, color=colores)
-                ax.set_title(f"Cumpleaños por Mes (Total: {len(df_para_graficos['FECHA_NAC'].dropna())})")
-                ax.set_xlabel('Mes')
-                ax.set_ylabel('Cantidad de Cumpleaños')
-                plt.xticks(rotation=45, ha='right')
-                
-                # Agregar valores
-                for bar, valor in zip(bars, cumple_mes.values):
-                    height = bar.get_height()
-                    ax.text(bar.get_x() + bar.get_width()/2, height + 0.5,
-                           str(valor), ha='center', va='bottom')
-                
-                st.pyplot(fig)
-        except:
-            st.info("No se pudieron procesar las fechas de cumpleaños")
+        with col2:
+            # Historial completo del almacén (sin filtros; sale de los metadatos Parquet)
+            historial = almacen.headcount_por_periodo(DIRECTORIO_ALMACEN, acceso)
+            if len(historial) > 1:
+                titulo_historial = "Headcount Total por Periodo (todo el historial)"
+                if motor_graficos == graficos.MOTOR_VEGA:
+                    mostrar_grafico(graficos.especificacion_vega(historial, titulo_historial, tipo='line'))
+                else:
+                    mostrar_grafico(renderizar_png(
+                        "historial", "periodo", "line", len(historial),
+                        (tuple(historial.index), tuple(historial.values)), titulo_historial, historial
+                    ))
+            else:
+                st.info("El almacén tiene un solo periodo")
+
+        # Movimientos entre periodos consecutivos (ingresos, salidas, traslados)
+        st.subheader("🔄 Movimientos entre Periodos")
+        if len(rutas_datos) > 1:
+            resumen_movimientos = calcular_movimientos(rutas_datos, hashes_datos, acceso)
+            if resumen_movimientos.empty:
+                st.info("No hay movimientos (los snapshots no tienen ID_EMPLEADO o no comparten personas)")
+            else:
+                st.caption("Calculado sobre los periodos elegidos, sin los filtros del sidebar")
+                st.dataframe(resumen_movimientos)
+                ultimo_periodo = resumen_movimientos.index[-1]
+                conteo_movimientos = resumen_movimientos.loc[ultimo_periodo]
+                conteo_movimientos = conteo_movimientos[conteo_movimientos > 0]
+                titulo_movimientos = f"Movimientos al periodo {ultimo_periodo} (Total: {conteo_movimientos.sum()})"
+                if motor_graficos == graficos.MOTOR_VEGA:
+                    mostrar_grafico(graficos.especificacion_vega(conteo_movimientos, titulo_movimientos))
+                else:
+                    mostrar_grafico(renderizar_png(
+                        "movimientos", "tipo", "bar", len(conteo_movimientos), firma_graficos,
+                        titulo_movimientos, conteo_movimientos
+                    ))
+        else:
+            st.info("Elige al menos dos periodos para ver los movimientos")
+
+with tab5:
+    if tab5.open:
+        st.subheader("Estructura Organizacional")
+        if motor_datos == MOTOR_SQL:
+            arbol = obtener_arbol_sql(base_sql, tabla_sql, firma_conteos, condiciones_graficos)
+        else:
+            # El cubo se arma una vez por dataset; cada combinación de filtros solo suma sus celdas
+            cubo_estructura = obtener_cubo_estructura(
+                rutas_datos, hashes_datos, date.today(), COLUMNAS_DASHBOARD, referencia_calculo, acceso,
+                tuple(columnas_para_filtros), indice_filtros
+            )
+            arbol = dependencias.calcular(
+                memo_etapas, "arbol", (firma_base, firma_conteos),
+                arbol_filtrado, cubo_estructura, indice_filtros, {} if graficos_sin_filtrar else filtros_aplicados
+            )
+
+        # Navegación: cada nivel ofrece los hijos del nodo elegido (consulta directa al árbol)
+        ruta_estructura = jerarquia.RAIZ
+        columnas_nivel = st.columns(max(len(arbol["niveles"]), 1))
+        for columna_nivel, nivel in zip(columnas_nivel, arbol["niveles"]):
+            opciones_nivel = [hijo[-1] for hijo in jerarquia.hijos(arbol, ruta_estructura)]
+            if not opciones_nivel:
+                break
+            eleccion = columna_nivel.selectbox(
+                nombres_amigables.get(nivel, nivel),
+                ["(todas)"] + opciones_nivel,
+                key=f"estructura_{nivel}"
+            )
+            if eleccion == "(todas)":
+                break
+            ruta_estructura = ruta_estructura + (eleccion,)
+
+        nodo = arbol["nodos"][ruta_estructura]
+        nombre_nodo = " › ".join(ruta_estructura) or "Toda la organización"
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Headcount", nodo["headcount"])
+        col2.metric("% Mujeres", f"{nodo['mujeres'] * 100 / nodo['headcount']:.1f} %" if nodo["headcount"] else "—")
+        col3.metric("Edad promedio", f"{nodo['edad_promedio']:.1f}" if nodo["edad_promedio"] is not None else "—")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            anillos_nodo = jerarquia.anillos(arbol, ruta_estructura)
+            if anillos_nodo.empty:
+                st.info("Este nivel no tiene subniveles")
+            else:
+                titulo_estructura = f"{nombre_nodo} (Total: {nodo['headcount']})"
+                if motor_graficos == graficos.MOTOR_VEGA:
+                    mostrar_grafico(graficos.especificacion_sunburst(anillos_nodo, titulo_estructura))
+                else:
+                    mostrar_grafico(renderizar_png(
+                        "estructura", nombre_nodo, "sunburst", len(anillos_nodo), firma_graficos,
+                        titulo_estructura, anillos_nodo
+                    ))
+        with col2:
+            st.write(f"**{nombre_nodo}**")
+            st.dataframe(jerarquia.tabla_hijos(arbol, ruta_estructura), hide_index=True)
+
+with tab6:
+    if tab6.open:
+        st.subheader("Riesgo de Rotación")
+
+        col1, col2, col3 = st.columns(3)
+        modelo_riesgo = col1.selectbox(
+            "Modelo", list(riesgo.MODELOS), key="riesgo_modelo",
+            format_func=lambda nombre: f"{nombre} (v{riesgo.MODELOS[nombre]['version']})"
+        )
+        # Fecha de cálculo: hoy por defecto; otra fecha permite simular "qué pasaría si"
+        fecha_riesgo = col2.date_input("Calcular a la fecha", value=date.today(), key="riesgo_fecha")
+        columnas_grupo = [col for col in ["pais", "UNIDAD DE NEGOCIO", "gerencia", "area",
+                                          "POSICION / PUESTO / CARGO"] if col in columnas_datos]
+        columna_grupo = col3.selectbox(
+            "Agrupar por", columnas_grupo, key="riesgo_grupo",
+            format_func=lambda col: nombres_amigables.get(col, col)
+        )
+        st.caption(riesgo.MODELOS[modelo_riesgo]["descripcion"])
+        version_riesgo = riesgo.MODELOS[modelo_riesgo]["version"]
+
+        columnas_top = [col for col in ["UNIDAD DE NEGOCIO", "pais", "gerencia", "area",
+                                        "POSICION / PUESTO / CARGO", "EDAD", "antiguedad_anios"]
+                        if col in columnas_datos]
+        if motor_datos == MOTOR_SQL:
+            columnas_riesgo = list(dict.fromkeys(
+                [col for col in riesgo.COLUMNAS_MODELO if col in columnas_datos] + columnas_top
+            ))
+            df_riesgo, puntajes = dependencias.calcular(
+                memo_etapas, "riesgo", (firma_base, firma_conteos, modelo_riesgo, version_riesgo, fecha_riesgo),
+                puntuar_sql, modelo_riesgo, fecha_riesgo, columnas_riesgo,
+                max_entradas=dependencias.MAX_ENTRADAS_FILAS
+            )
+            grupos_riesgo = df_riesgo[columna_grupo] if columna_grupo else None
+            filas_top = riesgo.top_riesgo(puntajes)
+            top = df_riesgo[columnas_top].iloc[filas_top]
+        else:
+            puntajes = obtener_puntajes(
+                rutas_datos, hashes_datos, date.today(), COLUMNAS_DASHBOARD, referencia_calculo, acceso,
+                modelo_riesgo, version_riesgo, fecha_riesgo
+            )
+            if filas_para_graficos is not None:
+                puntajes = puntajes[filas_para_graficos]
+            grupos_riesgo = filas_graficos([columna_grupo])[columna_grupo] if columna_grupo else None
+            filas_top = riesgo.top_riesgo(puntajes)
+            posiciones_top = filas_top if filas_para_graficos is None else filas_para_graficos[filas_top]
+            top = df_processed[columnas_top].take(posiciones_top)
+
+        if len(puntajes) == 0 or np.isnan(puntajes).all():
+            st.info("No hay datos para calcular el riesgo (faltan fechas de ingreso o no hay registros)")
+        else:
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Riesgo promedio", f"{np.nanmean(puntajes):.3f}")
+            col2.metric("Mediana", f"{np.nanmedian(puntajes):.3f}")
+            col3.metric("Riesgo ≥ 0.5", int(np.sum(puntajes >= 0.5)))
+
+            firma_riesgo = (*firma_graficos, modelo_riesgo, version_riesgo, fecha_riesgo.isoformat())
+            col1, col2 = st.columns(2)
+            with col1:
+                distribucion_riesgo = riesgo.distribucion(puntajes)
+                titulo_riesgo = f"Distribución del Riesgo (Total: {distribucion_riesgo.sum()})"
+                if motor_graficos == graficos.MOTOR_VEGA:
+                    mostrar_grafico(graficos.especificacion_vega(distribucion_riesgo, titulo_riesgo))
+                else:
+                    mostrar_grafico(renderizar_png(
+                        "riesgo", "riesgo", "bar", len(distribucion_riesgo), firma_riesgo,
+                        titulo_riesgo, distribucion_riesgo
+                    ))
+            with col2:
+                if grupos_riesgo is not None:
+                    # En porcentaje, para que las etiquetas de las barras se lean igual que los conteos
+                    promedio_grupo = (riesgo.promedio_por_grupo(puntajes, grupos_riesgo).head(15) * 100).round(1)
+                    titulo_grupo = f"Riesgo Promedio (%) por {nombres_amigables.get(columna_grupo, columna_grupo)}"
+                    if motor_graficos == graficos.MOTOR_VEGA:
+                        mostrar_grafico(graficos.especificacion_vega(promedio_grupo, titulo_grupo, tipo='barh'))
+                    else:
+                        mostrar_grafico(renderizar_png(
+                            "riesgo_grupo", columna_grupo, "barh", 15, firma_riesgo,
+                            titulo_grupo, promedio_grupo
+                        ))
+
+            st.write(f"**Top {len(top)} con mayor riesgo**")
+            top = top.reset_index(drop=True)
+            top.insert(0, "riesgo", np.round(puntajes[filas_top], 3))
+            st.dataframe(top, hide_index=True)
+
+perfil.cerrar_etapa(cronometro, "5-6 Gráficos", registros_graficos, registros_graficos)
 
 # -------------------------------
 # 7. MOSTRAR DATOS FILTRADOS (VERSIÓN SEGURA)
 # -------------------------------
-with st.expander("📋 Ver datos procesados", expanded=False):
-    st.write(f"**Total de registros mostrados:** {len(df_para_graficos)}")
+# El expander solo calcula su contenido (vistas y descarga) cuando está abierto
+expander_datos = st.expander("📋 Ver datos procesados", expanded=False, key="ver_datos", on_change="rerun")
+with expander_datos:
+    if expander_datos.open:
+        st.write(f"**Total de registros mostrados:** {registros_graficos}")
     
-    # Selector para ver diferentes vistas
-    vista = st.radio(
-        "Seleccionar vista:",
-        ["Vista general", "Ver todas las columnas", "Estadísticas básicas"],
-        horizontal=True
-    )
+        # Selector para ver diferentes vistas
+        vista = st.radio(
+            "Seleccionar vista:",
+            ["Vista general", "Ver todas las columnas", "Estadísticas básicas"],
+            horizontal=True
+        )
     
-    if vista == "Vista general":
-        # Mostrar columnas principales (excluyendo sensibles)
-        columnas_principales = []
-        columnas_excluir = [
-            'DOCUMENTO IDENTIDAD / CEDULA / RUT',
-            'DOCUMENTO IDENTIDAD',
-            'CEDULA',
-            'RUT',
-            'DNI',
-            'IDENTIFICACION'
-        ]
+        if vista == "Vista general":
+            # Mostrar columnas principales (excluyendo sensibles)
+            columnas_principales = []
+            columnas_excluir = [
+                'DOCUMENTO IDENTIDAD / CEDULA / RUT',
+                'DOCUMENTO IDENTIDAD',
+                'CEDULA',
+                'RUT',
+                'DNI',
+                'IDENTIFICACION'
+            ]
         
-        for col in ["UNIDAD DE NEGOCIO", "GENERO (F/M)", "POSICION / PUESTO / CARGO", 
-                   "pais", "EDAD", "RANGO_EDAD", "AÑO_INGRESO"]:
-            if col in df_para_graficos.columns and col not in columnas_excluir:
-                columnas_principales.append(col)
+            for col in ["UNIDAD DE NEGOCIO", "GENERO (F/M)", "POSICION / PUESTO / CARGO", 
+                       "pais", "EDAD", "RANGO_EDAD", "AÑO_INGRESO", "antiguedad_anios"]:
+                if col in columnas_datos and col not in columnas_excluir:
+                    columnas_principales.append(col)
         
-        if columnas_principales:
-            st.dataframe(df_para_graficos[columnas_principales].head(50))
-        else:
-            st.dataframe(df_para_graficos.head(50))
+            if columnas_principales:
+                st.dataframe(filas_graficos(columnas_principales, 50))
+            else:
+                st.dataframe(filas_graficos(limite=50))
     
-    elif vista == "Ver todas las columnas":
-        # Crear copia para mostrar sin columna sensible
-        df_mostrar_todas = df_para_graficos.copy()
+        elif vista == "Ver todas las columnas":
+            # Solo las filas que se muestran (drop no modifica el original)
+            df_mostrar_todas = filas_graficos(limite=30)
         
-        # Lista de posibles nombres de columnas sensibles
-        columnas_sensibles = [
-            'DOCUMENTO IDENTIDAD / CEDULA / RUT',
-            'DOCUMENTO IDENTIDAD',
-            'CEDULA',
-            'RUT',
-            'DNI',
-            'IDENTIFICACION',
-            'DOCUMENTO',
-            'IDENTIDAD'
-        ]
+            # Lista de posibles nombres de columnas sensibles
+            columnas_sensibles = [
+                'DOCUMENTO IDENTIDAD / CEDULA / RUT',
+                'DOCUMENTO IDENTIDAD',
+                'CEDULA',
+                'RUT',
+                'DNI',
+                'IDENTIFICACION',
+                'DOCUMENTO',
+                'IDENTIDAD'
+            ]
         
-        # Verificar si hay alguna columna sensible
-        columnas_encontradas = []
-        for col_sensible in columnas_sensibles:
-            for col_df in df_mostrar_todas.columns:
-                if col_sensible.lower() in str(col_df).lower():
-                    columnas_encontradas.append(col_df)
+            # Verificar si hay alguna columna sensible
+            columnas_encontradas = []
+            for col_sensible in columnas_sensibles:
+                for col_df in df_mostrar_todas.columns:
+                    if col_sensible.lower() in str(col_df).lower():
+                        columnas_encontradas.append(col_df)
         
-        # Eliminar columnas sensibles
-        if columnas_encontradas:
-            df_mostrar_todas = df_mostrar_todas.drop(columns=columnas_encontradas)
-            st.warning(f"🔒 **PROTECCIÓN DE DATOS:** Se han ocultado {len(columnas_encontradas)} columnas sensibles")
-            for col in columnas_encontradas:
-                st.info(f"⚠️ Columna '{col}' oculta por seguridad")
+            # Eliminar columnas sensibles
+            if columnas_encontradas:
+                df_mostrar_todas = df_mostrar_todas.drop(columns=columnas_encontradas)
+                st.warning(f"🔒 **PROTECCIÓN DE DATOS:** Se han ocultado {len(columnas_encontradas)} columnas sensibles")
+                for col in columnas_encontradas:
+                    st.info(f"⚠️ Columna '{col}' oculta por seguridad")
         
-        st.dataframe(df_mostrar_todas.head(30))
+            st.dataframe(df_mostrar_todas)
     
-    else:  # Estadísticas básicas
-        col1, col2 = st.columns(2)
-        with col1:
-            st.write("**Conteos por categoría:**")
-            columnas_estadisticas = ["UNIDAD DE NEGOCIO", "GENERO (F/M)", "pais"]
-            for columna in columnas_estadisticas:
-                if columna in df_para_graficos.columns:
-                    conteo = df_para_graficos[columna].value_counts().head(10)
-                    st.write(f"**{columna}:**")
-                    for valor, cantidad in conteo.items():
-                        st.write(f"  {valor}: {cantidad}")
+        else:  # Estadísticas básicas
+            col1, col2 = st.columns(2)
+            with col1:
+                st.write("**Conteos por categoría:**")
+                columnas_estadisticas = ["UNIDAD DE NEGOCIO", "GENERO (F/M)", "pais"]
+                for columna in columnas_estadisticas:
+                    if columna in columnas_datos:
+                        conteo = contar_columna(columna).head(10)
+                        st.write(f"**{columna}:**")
+                        for valor, cantidad in conteo.items():
+                            st.write(f"  {valor}: {cantidad}")
         
-        with col2:
-            st.write("**Estadísticas numéricas:**")
-            if "EDAD" in df_para_graficos.columns:
-                st.write(f"**Edad (datos anonimizados):**")
-                st.write(f"  Mínima: {df_para_graficos['EDAD'].min():.0f}")
-                st.write(f"  Máxima: {df_para_graficos['EDAD'].max():.0f}")
-                st.write(f"  Promedio: {df_para_graficos['EDAD'].mean():.1f}")
-                st.write(f"  Mediana: {df_para_graficos['EDAD'].median():.1f}")
-    
-    # Botón para descargar (sin datos sensibles)
-    st.markdown("---")
-    st.write("**📥 Descargar datos (sin información sensible):**")
-    
-    # Crear dataframe seguro para descarga
-    df_descargar = df_para_graficos.copy()
+            with col2:
+                st.write("**Estadísticas numéricas:**")
+                if "EDAD" in columnas_datos:
+                    if motor_datos == MOTOR_SQL:
+                        edad = consultas.resumen_numerico(con_sql, tabla_sql, condiciones_graficos, "EDAD")
+                    else:
+                        edad = filas_graficos(["EDAD"])["EDAD"].agg(["min", "max", "mean", "median"])
+                    st.write(f"**Edad (datos anonimizados):**")
+                    st.write(f"  Mínima: {edad['min']:.0f}")
+                    st.write(f"  Máxima: {edad['max']:.0f}")
+                    st.write(f"  Promedio: {edad['mean']:.1f}")
+                    st.write(f"  Mediana: {edad['median']:.1f}")
     
-    # Eliminar columnas sensibles antes de descargar
-    columnas_sensibles_descarga = [
-        'DOCUMENTO IDENTIDAD / CEDULA / RUT',
-        'DOCUMENTO IDENTIDAD',
-        'CEDULA',
-        'RUT',
-        'DNI',
-        'IDENTIFICACION'
-    ]
+        # Botón para descargar (sin datos sensibles)
+        st.markdown("---")
+        st.write("**📥 Descargar datos (sin información sensible):**")
     
-    columnas_eliminadas = []
-    for col in columnas_sensibles_descarga:
-        for col_df in df_descargar.columns:
-            if col.lower() in str(col_df).lower():
-                df_descargar = df_descargar.drop(columns=[col_df])
-                columnas_eliminadas.append(col_df)
-    
-    if columnas_eliminadas:
-        st.info(f"✅ Para descarga: Se han eliminado {len(columnas_eliminadas)} columnas sensibles")
-    
-    csv = df_descargar.to_csv(index=False).encode('utf-8')
-    st.download_button(
-        label="Descargar datos como CSV (seguro)",
-        data=csv,
-        file_name="datos_rostadina_seguro.csv",
-        mime="text/csv",
-        help="Archivo CSV sin información sensible como documentos de identidad"
-    )
+        # El archivo se genera al hacer clic (por bloques y sin columnas sensibles),
+        # no en cada rerun
+        nombres_formatos = {
+            exportacion.FORMATO_CSV: "CSV (.csv)",
+            exportacion.FORMATO_CSV_GZ: "CSV comprimido (.csv.gz)",
+            exportacion.FORMATO_PARQUET: "Parquet",
+            exportacion.FORMATO_EXCEL: "Excel (.xlsx)",
+        }
+        formato_descarga = st.radio(
+            "Formato:",
+            exportacion.formatos_disponibles(),
+            format_func=nombres_formatos.get,
+            horizontal=True
+        )
+
+        _, columnas_eliminadas = exportacion.columnas_exportables(columnas_datos)
+        if columnas_eliminadas:
+            st.info(f"✅ Para descarga: Se han eliminado {len(columnas_eliminadas)} columnas sensibles")
+
+        if motor_datos == MOTOR_SQL:
+            # Se ejecuta en otro hilo al hacer clic: cursor propio y filtros fijados ahora.
+            # El resultado se recorre por lotes, sin pasar por un DataFrame completo
+            def generar_descarga(formato, condiciones=condiciones_graficos):
+                vacio, lotes = consultas.lotes(base_sql.cursor(), tabla_sql, condiciones,
+                                               exportacion.FILAS_POR_BLOQUE)
+                return exportacion.generar_lotes(lotes, vacio, formato)
+        else:
+            generar_descarga = partial(exportacion.generar, df_processed, filas=filas_para_graficos)
+
+        if formato_descarga == exportacion.FORMATO_EXCEL and registros_graficos > exportacion.MAX_FILAS_EXCEL:
+            st.warning(f"⚠️ Excel admite hasta {exportacion.MAX_FILAS_EXCEL} filas; usa CSV o Parquet")
+        else:
+            st.download_button(
+                label=f"Descargar datos como {nombres_formatos[formato_descarga]} (seguro)",
+                data=partial(generar_descarga, formato_descarga),
+                file_name=f"datos_rostadina_seguro.{formato_descarga}",
+                mime=exportacion.MIME_FORMATOS[formato_descarga],
+                help="Archivo sin información sensible como documentos de identidad"
+            )
+
+# La descarga se genera al hacer clic, fuera de este rerun: no entra en la etapa
+perfil.cerrar_etapa(
+    cronometro, "7 Datos y exportación", registros_graficos,
+    registros_graficos if expander_datos.open else None
+)
 
 # -------------------------------
 # 8. PIE DE PÁGINA
@@ -679,4 +1319,21 @@ st.markdown("*Datos actualizados: Febrero 2024*")
 st.caption("""
 🔒 **Protección de datos activada:** La información sensible como documentos de identidad ha sido ocultada para proteger la privacidad.
 """)
-st.caption("Desarrollado con Streamlit | © 2025 ROSTADINA EIRL. Todos los derechos reservados.")
\ No newline at end of file
+st.caption("Desarrollado con Streamlit | © 2025 ROSTADINA EIRL. Todos los derechos reservados.")
+
+# Registro del rerun y panel de perfil (solo administradores)
+cronometro["contexto"]["recalculos"] = dependencias.resumen(memo_etapas)
+perfil.registrar(cronometro)
+if perfil.modo_admin(accesos.es_administrador(mapa_accesos, usuario)):
+    with st.sidebar.expander("⏱️ Perfil de ejecución", expanded=False):
+        st.write(f"**Este rerun** (#{cronometro['contexto']['rerun']}):")
+        st.dataframe(perfil.tabla_etapas(cronometro))
+        st.write("**Etapas de filtros y conteos** (recalculadas / reutilizadas):")
+        for etapa, (recalculadas, reutilizadas) in cronometro["contexto"]["recalculos"].items():
+            st.write(f"  • {etapa}: {recalculadas} / {reutilizadas}")
+        resumen_perfil = perfil.resumen_log(ultimas=1000)
+        if not resumen_perfil.empty:
+            st.write("**Latencia por etapa (últimos 1000 reruns, s):**")
+            st.dataframe(resumen_perfil.round(4))
+        if not perfil.registro_activo():
+            st.caption(f"Los reruns no se registran; se activa con {perfil.VARIABLE_PERFIL}=1")
@@ -0,0 +1,166 @@
+"""
+Acceso por filas: cada responsable de RR.HH. ve solo su unidad de negocio / país.
+
+El archivo de accesos (accesos.json) asigna un rol a cada usuario y a cada
+rol los valores permitidos de las columnas de partición:
+
+    {
+      "roles": {
+        "corporativo": "*",
+        "rrhh_caribe": {"UNIDAD DE NEGOCIO": ["CARIBE"]},
+        "rrhh_haiti": {"UNIDAD DE NEGOCIO": ["CARIBE"], "pais": ["HAITI"]}
+      },
+      "usuarios": {"ana@rostadina.com": "rrhh_caribe"},
+      "predeterminado": null,
+      "administradores": ["ti@rostadina.com"]
+    }
+
+Una columna que el rol no menciona no restringe; "*" ve todo. Los valores
+se escriben como quedan tras la canonización (ver canonico.py). Los usuarios
+sin entrada reciben el rol "predeterminado" (si no hay, no tienen acceso).
+Sin archivo no hay control de acceso; accesos.ejemplo.json sirve de base.
+Los "administradores" ven además el panel de perfil (ver perfil.py).
+
+El usuario de la sesión sale del login de Streamlit; detrás de un proxy de
+autenticación, del encabezado indicado en ACTIVOS_ENCABEZADO_USUARIO.
+
+Las filas se ordenan por unidad y país al ingerir y al publicar el dataset:
+cada combinación ocupa un rango contiguo de filas (y sus propios row groups
+en el Parquet), así la sesión de un responsable recibe solo los rangos de
+sus unidades, sin filtrar fila por fila.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import canonico
+import filtros
+
+RUTA_ACCESOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "accesos.json")
+# Encabezado con el usuario que pone el proxy de autenticación (solo si se configura:
+# sin proxy, cualquier cliente podría enviarlo)
+VARIABLE_ENCABEZADO = "ACTIVOS_ENCABEZADO_USUARIO"
+# Usuario fijo para desarrollo local: vale para todas las sesiones del servidor,
+# así que solo se usa con ACTIVOS_DESARROLLO=1
+VARIABLE_USUARIO = "ACTIVOS_USUARIO"
+VARIABLE_DESARROLLO = "ACTIVOS_DESARROLLO"
+COLUMNAS_PARTICION = ["UNIDAD DE NEGOCIO", "pais"]
+TODO = "*"
+
+
+def cargar_accesos(ruta=RUTA_ACCESOS):
+    """Mapa de accesos; None si no hay archivo (todos ven todo)"""
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, encoding='utf-8') as f:
+        datos = json.load(f)
+    return {
+        "roles": datos.get("roles", {}),
+        "usuarios": {usuario.strip().lower(): rol for usuario, rol in datos.get("usuarios", {}).items()},
+        "predeterminado": datos.get("predeterminado"),
+        "administradores": {usuario.strip().lower() for usuario in datos.get("administradores", [])},
+    }
+
+
+def es_administrador(accesos, usuario):
+    """Indica si el usuario figura como administrador en el archivo de accesos"""
+    return accesos is not None and bool(usuario) and usuario.strip().lower() in accesos["administradores"]
+
+
+def permiso(accesos, usuario, mapeo=None):
+    """
+    Filas que puede ver el usuario.
+
+    Devuelve None si ve todo o ((columna, (valores...)), ...) ordenado (sirve
+    de clave de caché). Los valores se llevan a su forma canónica, igual que
+    en la ingesta. Lanza PermissionError si el usuario no tiene rol.
+    """
+    if accesos is None:
+        return None
+    rol = accesos["usuarios"].get((usuario or "").strip().lower(), accesos["predeterminado"])
+    if rol is None:
+        raise PermissionError(f"El usuario '{usuario or 'anónimo'}' no tiene acceso a los datos")
+    if rol not in accesos["roles"]:
+        raise PermissionError(f"El rol '{rol}' no está definido en el archivo de accesos")
+    permitidos = accesos["roles"][rol]
+    if permitidos == TODO:
+        return None
+    mapeo = canonico.cargar_mapeo() if mapeo is None else mapeo
+    resultado = []
+    for columna, valores in sorted(permitidos.items()):
+        if columna not in COLUMNAS_PARTICION:
+            raise ValueError(f"El rol '{rol}' restringe '{columna}', que no es columna de partición")
+        resultado.append((columna, tuple(sorted({canonico.valor_canonico(v, columna, mapeo) for v in valores}))))
+    return tuple(resultado)
+
+
+def describir(acceso):
+    """Texto corto del acceso para el sidebar"""
+    if acceso is None:
+        return "todas las unidades"
+    return "; ".join(f"{columna}: {', '.join(valores) or '—'}" for columna, valores in acceso)
+
+
+def particionar(df):
+    """
+    Ordena df por las columnas de partición (orden estable).
+
+    Devuelve (df, particiones); cada partición es {"valores": {columna: valor},
+    "inicio", "fin"} con su rango de filas ('' = vacío). Si df ya estaba
+    ordenado no se copia.
+    """
+    columnas = [col for col in COLUMNAS_PARTICION if col in df.columns]
+    if not columnas or df.empty:
+        return df, []
+    indexadas = [filtros.indexar_columna(df[col]) for col in columnas]
+    codigos = np.vstack([cod for _, cod in indexadas])
+    orden = np.lexsort(codigos[::-1])
+    if np.any(np.diff(orden) != 1):
+        df = df.iloc[orden].reset_index(drop=True)
+        codigos = codigos[:, orden]
+
+    cortes = np.flatnonzero(np.any(np.diff(codigos, axis=1) != 0, axis=0)) + 1
+    inicios = np.concatenate([[0], cortes])
+    fines = np.concatenate([cortes, [len(df)]])
+    particiones = []
+    for inicio, fin in zip(inicios, fines):
+        valores = {
+            col: (opciones[cod] if cod >= 0 else '')
+            for col, (opciones, _), cod in zip(columnas, indexadas, codigos[:, inicio])
+        }
+        particiones.append({"valores": valores, "inicio": int(inicio), "fin": int(fin)})
+    return df, particiones
+
+
+def rangos_permitidos(particiones, acceso):
+    """Rangos (inicio, fin) de las particiones que permite el acceso; los contiguos se unen"""
+    rangos = []
+    for particion in particiones:
+        if acceso is not None and not all(
+            particion["valores"].get(columna, '') in valores for columna, valores in acceso
+        ):
+            continue
+        if rangos and rangos[-1][1] == particion["inicio"]:
+            rangos[-1] = (rangos[-1][0], particion["fin"])
+        else:
+            rangos.append((particion["inicio"], particion["fin"]))
+    return rangos
+
+
+def recortar(df, rangos):
+    """Filas de los rangos; con un solo rango es una vista (sin copiar)"""
+    if not rangos:
+        return df.iloc[0:0]
+    if len(rangos) == 1:
+        inicio, fin = rangos[0]
+        return df.iloc[inicio:fin].reset_index(drop=True)
+    return pd.concat([df.iloc[inicio:fin] for inicio, fin in rangos], ignore_index=True)
+
+
+def filtros_parquet(acceso):
+    """Filtros de pyarrow para leer solo las filas permitidas (None = todas)"""
+    if acceso is None:
+        return None
+    return [(columna, "in", list(valores)) for columna, valores in acceso]
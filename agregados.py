@@ -0,0 +1,61 @@
+"""
+Cubo de headcount pre-agregado para los gráficos.
+
+El cubo se construye una vez por carga a partir de los códigos del índice
+de filtros: una fila por combinación de dimensiones presente en los datos,
+con la cantidad de personas. Los conteos de cada gráfico se obtienen
+sumando las celdas que cumplen los filtros, sin recorrer los registros.
+"""
+import numpy as np
+import pandas as pd
+
+import filtros
+
+COLUMNA_CONTEO = "conteo"
+
+
+def construir_cubo(indice, dimensiones):
+    """Headcount agrupado por todas las dimensiones indexadas"""
+    dimensiones = [dim for dim in dimensiones if dim in indice]
+    codigos = pd.DataFrame({dim: indice[dim]["codigos"] for dim in dimensiones})
+    if codigos.empty:
+        return pd.DataFrame({COLUMNA_CONTEO: pd.Series(dtype="int64")})
+    return (
+        codigos.groupby(dimensiones, sort=False)
+        .size()
+        .reset_index(name=COLUMNA_CONTEO)
+    )
+
+
+def filtrar_cubo(cubo, indice, filtros_aplicados):
+    """Celdas del cubo que cumplen los filtros (misma lógica que filtros.seleccionar_filas)"""
+    mascara = None
+    for columna, valores in filtros_aplicados.items():
+        if columna not in cubo.columns or columna not in indice or not valores:
+            continue
+        entrada = dict(indice[columna], codigos=cubo[columna].to_numpy())
+        mascara_col = filtros.mascara_columna(entrada, valores)
+        if mascara_col is None:
+            continue
+        mascara = mascara_col if mascara is None else mascara & mascara_col
+    return cubo if mascara is None else cubo[mascara]
+
+
+def contar(cubo, indice, columna):
+    """
+    Conteo por valor de una dimensión (equivalente a value_counts sin vacíos).
+
+    Devuelve una Serie ordenada de mayor a menor, sin valores en cero.
+    """
+    if columna not in cubo.columns or columna not in indice:
+        return pd.Series(dtype="int64")
+    opciones = indice[columna]["opciones"]
+    codigos = cubo[columna].to_numpy()
+    validos = codigos >= 0
+    conteo = np.bincount(
+        codigos[validos],
+        weights=cubo[COLUMNA_CONTEO].to_numpy()[validos],
+        minlength=len(opciones)
+    ).astype("int64")
+    serie = pd.Series(conteo, index=pd.Index(opciones, name=columna), name="count")
+    return serie[serie > 0].sort_values(ascending=False, kind="stable")
@@ -0,0 +1,576 @@
+"""
+Almacén de snapshots mensuales particionado por periodo.
+
+Cada periodo del export se guarda en su propia partición Parquet:
+
+    snapshots/periodo=2024-01-01/activos.parquet
+    snapshots/periodo=2024-02-01/activos.parquet
+
+Al ingerir un export solo se escriben los periodos que faltan (o los que
+vienen del mismo archivo si este cambió); el historial no se reprocesa.
+Un registro con la huella (mtime, tamaño) de cada archivo ingerido evita
+volver a leer exports que no cambiaron. Los exports se identifican por su
+ruta relativa a la carpeta del almacén (ver clave_export): dos archivos con
+el mismo nombre en carpetas distintas son exports distintos.
+
+Un periodo puede venir de varios exports (uno por país o razón social):
+ingresar_lote los prepara en paralelo, valida que tengan el mismo esquema
+y escribe cada periodo con las filas de todos ellos. La columna `origen`
+indica el export (su clave) de cada fila.
+
+Dentro de cada partición las filas van ordenadas por unidad de negocio y
+país, con un row group por combinación (ver accesos.py).
+"""
+import glob
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import accesos
+import canonico
+import procesamiento
+
+DIRECTORIO_ALMACEN = "snapshots"
+PREFIJO_PARTICION = "periodo="
+NOMBRE_PARTICION = "activos.parquet"
+NOMBRE_REGISTRO = "_ingestas.json"
+COLUMNA_PERIODO = "periodo"
+COLUMNA_ORIGEN = "origen"
+EXTENSION_EXPORT = ".csv"
+
+# Las sesiones del dashboard (hilos de un mismo proceso) sincronizan de a una
+_bloqueo_sincronizar = threading.Lock()
+
+
+def ruta_particion(directorio, periodo):
+    """Ruta del Parquet de un periodo ('AAAA-MM-DD')"""
+    return os.path.join(directorio, f"{PREFIJO_PARTICION}{periodo}", NOMBRE_PARTICION)
+
+
+def listar_periodos(directorio=DIRECTORIO_ALMACEN):
+    """Periodos con partición en el almacén, de más antiguo a más reciente"""
+    if not os.path.isdir(directorio):
+        return []
+    periodos = []
+    for nombre in os.listdir(directorio):
+        if nombre.startswith(PREFIJO_PARTICION):
+            periodo = nombre[len(PREFIJO_PARTICION):]
+            if os.path.exists(ruta_particion(directorio, periodo)):
+                periodos.append(periodo)
+    return sorted(periodos)
+
+
+def rutas_periodos(directorio=DIRECTORIO_ALMACEN, desde=None, hasta=None):
+    """Rutas de las particiones entre `desde` y `hasta` (incluidos)"""
+    return [
+        ruta_particion(directorio, periodo)
+        for periodo in listar_periodos(directorio)
+        if (desde is None or periodo >= desde) and (hasta is None or periodo <= hasta)
+    ]
+
+
+def expandir_exports(fuente):
+    """
+    Exports de una fuente: un archivo, una carpeta (sus .csv) o un patrón
+    glob ('exports/activos_*.csv'). Si nada coincide se devuelve la fuente
+    tal cual (para informar el archivo que falta).
+    """
+    if os.path.isdir(fuente):
+        return sorted(
+            os.path.join(fuente, nombre) for nombre in os.listdir(fuente)
+            if nombre.lower().endswith(EXTENSION_EXPORT)
+        )
+    return sorted(glob.glob(fuente)) or [fuente]
+
+
+def clave_export(ruta_csv, directorio=DIRECTORIO_ALMACEN):
+    """Clave de un export en el registro y en `origen`: su ruta relativa al almacén, con '/'"""
+    return os.path.relpath(os.path.abspath(ruta_csv), os.path.abspath(directorio)).replace(os.sep, "/")
+
+
+def _ruta_export(clave, directorio):
+    """Ruta del export de una clave del registro"""
+    return os.path.join(directorio, *clave.split("/"))
+
+
+def normalizar_periodos(serie):
+    """Periodo de cada fila como texto 'AAAA-MM-DD' (None si no se reconoce)"""
+    fechas, _, _ = procesamiento.parsear_fecha(serie)
+    return fechas.dt.strftime("%Y-%m-%d").where(fechas.notna(), None)
+
+
+def _leer_registro(directorio):
+    ruta = os.path.join(directorio, NOMBRE_REGISTRO)
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _guardar_registro(directorio, registro):
+    ruta = os.path.join(directorio, NOMBRE_REGISTRO)
+    temporal = procesamiento.ruta_temporal(ruta)
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(registro, f, ensure_ascii=False, indent=2)
+    os.replace(temporal, ruta)
+
+
+def particion_vigente(ruta, ruta_csv, directorio=DIRECTORIO_ALMACEN):
+    """
+    Indica si la partición no necesita reescribirse a partir de `ruta_csv`.
+
+    Se reescribe si no existe, si es de otra versión del formato o del mapeo
+    de canonización, o si salió
+    de este mismo archivo y el archivo es más nuevo.
+    """
+    if not os.path.exists(ruta):
+        return False
+    metadatos = procesamiento.leer_metadatos(ruta)
+    if not procesamiento.snapshot_vigente(metadatos):
+        return False
+    if clave_export(ruta_csv, directorio) in metadatos.get('origenes', []):
+        return os.path.getmtime(ruta) >= os.path.getmtime(ruta_csv)
+    return True
+
+
+def _escribir_particion(particion, metadatos, periodo, ruta):
+    """Escribe un periodo ordenado por unidad y país, con un row group por combinación"""
+    particion, particiones = accesos.particionar(particion)
+    metadatos = dict(
+        metadatos, periodo=periodo, resumen=procesamiento.resumen_snapshot(particion), particiones=particiones
+    )
+    grupos = [(p["inicio"], p["fin"]) for p in particiones]
+    return procesamiento.escribir_snapshot(particion, metadatos, ruta, grupos=grupos)
+
+
+def _registrar_export(registro, directorio, ruta_csv, version_canonizacion, resultado, error=None):
+    _, mtime_ns, tamano = procesamiento.huella_archivo(ruta_csv)
+    registro[clave_export(ruta_csv, directorio)] = {
+        'mtime_ns': mtime_ns,
+        'tamano': tamano,
+        'version': procesamiento.VERSION_SNAPSHOT,
+        'version_canonizacion': version_canonizacion,
+        'periodos': sorted(p for p, _, estado in resultado if p is not None),
+        # Los exports omitidos se registran igual: no se reintentan hasta que cambien
+        'error': error,
+    }
+
+
+def exports_con_error(directorio=DIRECTORIO_ALMACEN, rutas_csv=None):
+    """{archivo: motivo} de los exports omitidos en la última ingesta (solo de `rutas_csv` si se indica)"""
+    claves = None if rutas_csv is None else {clave_export(ruta, directorio) for ruta in rutas_csv}
+    return {
+        archivo: datos['error'] for archivo, datos in _leer_registro(directorio).items()
+        if datos.get('error') and (claves is None or archivo in claves)
+    }
+
+
+def _columna_origen(origen, filas):
+    """Columna categórica con la clave del export en todas las filas"""
+    return pd.Categorical.from_codes(np.zeros(filas, dtype=np.int8), categories=[origen])
+
+
+def preparar_export(ruta_csv, origen):
+    """
+    Lee y prepara un export completo (fechas, clave anónima, canonización).
+
+    Se ejecuta en un proceso del pool de ingresar_lote; devuelve un dict con
+    el DataFrame, el periodo de cada fila, los metadatos y el tiempo.
+    """
+    inicio = time.perf_counter()
+    df_original = procesamiento.leer_activos(ruta_csv)
+    if COLUMNA_PERIODO not in df_original.columns:
+        raise ValueError(f"falta la columna '{COLUMNA_PERIODO}'")
+    periodos = normalizar_periodos(df_original[COLUMNA_PERIODO]).to_numpy()
+    df, metadatos = procesamiento.preparar_snapshot(df_original)
+    df[COLUMNA_ORIGEN] = _columna_origen(origen, len(df))
+    return {
+        "ruta": ruta_csv,
+        "df": df,
+        "periodos": periodos,
+        "metadatos": metadatos,
+        "segundos": time.perf_counter() - inicio,
+    }
+
+
+def _familia(dtype):
+    """Tipo lógico de una columna para comparar esquemas"""
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "fecha"
+    if pd.api.types.is_numeric_dtype(dtype) and not isinstance(dtype, pd.CategoricalDtype):
+        return "número"
+    return "texto"
+
+
+def validar_esquemas(preparados):
+    """
+    Compara el esquema de cada export con el más frecuente del lote.
+
+    Devuelve {ruta: motivo} de los que no coinciden (columnas que faltan,
+    que sobran o con otro tipo).
+    """
+    esquemas = {
+        p["ruta"]: {col: _familia(tipo) for col, tipo in p["df"].dtypes.items()}
+        for p in preparados
+    }
+    frecuencias = Counter(frozenset(esquema.items()) for esquema in esquemas.values())
+    referencia = dict(frecuencias.most_common(1)[0][0]) if frecuencias else {}
+    errores = {}
+    for ruta, esquema in esquemas.items():
+        motivos = []
+        faltan = [col for col in referencia if col not in esquema]
+        sobran = [col for col in esquema if col not in referencia]
+        tipos = [f"{col} ({esquema[col]} en vez de {referencia[col]})"
+                 for col in esquema if col in referencia and esquema[col] != referencia[col]]
+        if faltan:
+            motivos.append("faltan " + ", ".join(faltan))
+        if sobran:
+            motivos.append("sobran " + ", ".join(sobran))
+        if tipos:
+            motivos.append("tipos distintos: " + ", ".join(tipos))
+        if motivos:
+            errores[ruta] = "; ".join(motivos)
+    return errores
+
+
+def _unir(partes):
+    """Concatena las partes (mismas columnas); las categóricas se unen sin pasar a texto"""
+    datos = {}
+    for col in partes[0].columns:
+        series = [parte[col] for parte in partes]
+        if all(isinstance(serie.dtype, pd.CategoricalDtype) for serie in series):
+            datos[col] = union_categoricals(series, sort_categories=True)
+        else:
+            datos[col] = pd.concat(series, ignore_index=True)
+    return pd.DataFrame(datos)
+
+
+def _unir_metadatos(lista, origenes):
+    """Metadatos de una partición armada con varios exports"""
+    columnas_originales, fechas, canonizacion = [], {}, {}
+    for metadatos in lista:
+        for col in metadatos['columnas_originales']:
+            if col not in columnas_originales:
+                columnas_originales.append(col)
+        for col, (formato, sin_convertir) in metadatos['fechas'].items():
+            formatos, total = fechas.get(col, ([], 0))
+            if formato not in formatos:
+                formatos.append(formato)
+            fechas[col] = (formatos, total + sin_convertir)
+        for col, cambios in metadatos.get('canonizacion', {}).items():
+            canonizacion.setdefault(col, {}).update(cambios)
+    return dict(
+        lista[0],
+        columnas_originales=columnas_originales,
+        fechas={col: [" / ".join(formatos), total] for col, (formatos, total) in fechas.items()},
+        canonizacion=canonizacion,
+        origenes=origenes,
+    )
+
+
+def ingresar_lote(rutas_csv, directorio=DIRECTORIO_ALMACEN, reemplazar=False, procesos=None, solo_periodos=None):
+    """
+    Agrega al almacén un lote de exports (p. ej. uno por país), en paralelo.
+
+    Cada export se prepara en un proceso del pool; los que no tienen el
+    esquema del resto del lote se omiten. Cada periodo se escribe con las
+    filas de todos los exports que lo traen; si una persona aparece en más
+    de uno se conserva la fila del archivo más reciente. Solo se reescriben
+    los periodos que cambiaron (todos con `reemplazar`). Con `solo_periodos`
+    los demás periodos no se tocan (se informan como existentes): el lote
+    debe traer todos los exports de los periodos indicados.
+
+    Devuelve {ruta: {"filas", "segundos", "periodos": [(periodo, filas,
+    estado)], "error"}} en el orden del lote.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    version_canonizacion = canonico.cargar_mapeo()['version']
+    # Del más antiguo al más reciente: en las personas repetidas gana el último
+    rutas_csv = sorted(rutas_csv, key=os.path.getmtime)
+    informe = {ruta: {"filas": 0, "segundos": None, "periodos": [], "error": None} for ruta in rutas_csv}
+
+    preparados = []
+    procesos = min(procesos or os.cpu_count() or 1, len(rutas_csv))
+    if procesos <= 1:
+        for ruta in rutas_csv:
+            try:
+                preparados.append(preparar_export(ruta, clave_export(ruta, directorio)))
+            except Exception as e:
+                informe[ruta]["error"] = str(e)
+    else:
+        # spawn y no fork: el dashboard ingiere desde un servidor con hilos, y un
+        # proceso hijo creado con fork heredaría bloqueos tomados por otros hilos
+        with ProcessPoolExecutor(procesos, mp_context=multiprocessing.get_context("spawn")) as pool:
+            tareas = {
+                pool.submit(preparar_export, ruta, clave_export(ruta, directorio)): ruta for ruta in rutas_csv
+            }
+            for tarea in as_completed(tareas):
+                try:
+                    preparados.append(tarea.result())
+                except Exception as e:
+                    informe[tareas[tarea]]["error"] = str(e)
+    preparados.sort(key=lambda p: rutas_csv.index(p["ruta"]))
+
+    for ruta, motivo in validar_esquemas(preparados).items():
+        informe[ruta]["error"] = f"esquema distinto: {motivo}"
+    preparados = [p for p in preparados if informe[p["ruta"]]["error"] is None]
+    for p in preparados:
+        informe[p["ruta"]]["filas"] = len(p["df"])
+        informe[p["ruta"]]["segundos"] = p["segundos"]
+        sin_periodo = int(pd.isna(p["periodos"]).sum())
+        if sin_periodo:
+            informe[p["ruta"]]["periodos"].append((None, sin_periodo, "sin periodo (omitidas)"))
+
+    periodos = sorted({periodo for p in preparados for periodo in p["periodos"] if periodo is not None})
+    for periodo in periodos:
+        ruta = ruta_particion(directorio, periodo)
+        fuentes = [p for p in preparados if (p["periodos"] == periodo).any()]
+        existia = os.path.exists(ruta)
+        vigente = (
+            solo_periodos is not None and periodo not in solo_periodos
+        ) or (
+            not reemplazar and existia
+            and sorted(procesamiento.leer_metadatos(ruta).get('origenes', []))
+            == sorted(clave_export(p["ruta"], directorio) for p in fuentes)
+            and all(particion_vigente(ruta, p["ruta"], directorio) for p in fuentes)
+        )
+        if vigente:
+            for p in fuentes:
+                informe[p["ruta"]]["periodos"].append((periodo, int((p["periodos"] == periodo).sum()), "existente"))
+            continue
+
+        particion = _unir([p["df"][p["periodos"] == periodo] for p in fuentes])
+        repetidas = 0
+        if procesamiento.COLUMNA_CLAVE in particion.columns:
+            claves = particion[procesamiento.COLUMNA_CLAVE]
+            duplicadas = (claves.notna() & claves.duplicated(keep='last')).to_numpy()
+            repetidas = int(duplicadas.sum())
+            particion = particion[~duplicadas].reset_index(drop=True)
+        metadatos = _unir_metadatos(
+            [p["metadatos"] for p in fuentes], [clave_export(p["ruta"], directorio) for p in fuentes]
+        )
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        _escribir_particion(particion, metadatos, periodo, ruta)
+        estado = "actualizada" if existia else "nueva"
+        if repetidas:
+            estado += f", {repetidas} personas repetidas entre archivos"
+        for p in fuentes:
+            informe[p["ruta"]]["periodos"].append((periodo, int((p["periodos"] == periodo).sum()), estado))
+
+    registro = _leer_registro(directorio)
+    for ruta, datos in informe.items():
+        _registrar_export(registro, directorio, ruta, version_canonizacion, datos["periodos"], datos["error"])
+    _guardar_registro(directorio, registro)
+    return informe
+
+
+def _periodos_export(ruta_csv):
+    """Periodos de un export leyendo solo esa columna (vacío si no la tiene)"""
+    if COLUMNA_PERIODO not in procesamiento.leer_columnas(ruta_csv):
+        return set()
+    periodos = normalizar_periodos(pd.read_csv(ruta_csv, usecols=[COLUMNA_PERIODO], dtype=str)[COLUMNA_PERIODO])
+    return set(periodos.dropna())
+
+
+def sincronizar(rutas_csv, directorio=DIRECTORIO_ALMACEN, procesos=None):
+    """
+    Ingiere los exports nuevos o modificados (según el registro).
+
+    Si ninguno cambió desde la última ingesta (con la misma versión del
+    formato y del mapeo de canonización) no se lee nada. Si no, se ingieren
+    los que cambiaron junto con los demás exports de sus periodos (un
+    periodo puede venir de varios archivos), y solo se reescriben esos
+    periodos. Devuelve el informe de ingresar_lote, o {} si no hubo cambios.
+    Las llamadas de distintos hilos se hacen de a una.
+    """
+    with _bloqueo_sincronizar:
+        return _sincronizar(rutas_csv, directorio, procesos)
+
+
+def _sincronizar(rutas_csv, directorio, procesos):
+    registro = _leer_registro(directorio)
+    # Los exports borrados salen del registro (sus particiones quedan como historial)
+    borrados = [clave for clave in registro if not os.path.exists(_ruta_export(clave, directorio))]
+    if borrados:
+        for clave in borrados:
+            del registro[clave]
+        _guardar_registro(directorio, registro)
+
+    version_canonizacion = canonico.cargar_mapeo()['version']
+    existentes = [ruta for ruta in rutas_csv if os.path.exists(ruta)]
+    claves = {ruta: clave_export(ruta, directorio) for ruta in existentes}
+    cambiados = []
+    for ruta_csv in existentes:
+        _, mtime_ns, tamano = procesamiento.huella_archivo(ruta_csv)
+        previo = registro.get(claves[ruta_csv], {})
+        if not (previo.get('mtime_ns') == mtime_ns and previo.get('tamano') == tamano
+                and previo.get('version') == procesamiento.VERSION_SNAPSHOT
+                and previo.get('version_canonizacion') == version_canonizacion):
+            cambiados.append(ruta_csv)
+    if not cambiados:
+        return {}
+
+    # Periodos afectados: los que traía cada export cambiado y los que trae ahora
+    afectados = set()
+    for ruta_csv in cambiados:
+        afectados.update(registro.get(claves[ruta_csv], {}).get('periodos', []))
+        afectados.update(_periodos_export(ruta_csv))
+    acompanantes = [
+        ruta_csv for ruta_csv in existentes
+        if ruta_csv not in cambiados
+        and afectados & set(registro.get(claves[ruta_csv], {}).get('periodos', []))
+    ]
+    return ingresar_lote(cambiados + acompanantes, directorio, procesos=procesos, solo_periodos=afectados)
+
+
+def leer_periodos(rutas, columnas=None, filtros=None):
+    """
+    Lee y une las particiones indicadas.
+
+    Si se indica `columnas`, solo se leen las que existan en cada partición;
+    las que falten en alguna quedan vacías en sus filas. `filtros` (formato
+    de pyarrow) lee solo los row groups y filas que coinciden; una partición
+    sin alguna columna del filtro no aporta filas.
+    """
+    tablas = []
+    for ruta in rutas:
+        disponibles = pq.read_schema(ruta).names
+        seleccion = None if columnas is None else [col for col in columnas if col in disponibles]
+        if filtros and any(col not in disponibles for col, _, _ in filtros):
+            tablas.append(pq.read_table(ruta, columns=seleccion).slice(0, 0))
+            continue
+        tablas.append(pq.read_table(ruta, columns=seleccion, filters=filtros or None))
+    if not tablas:
+        return pd.DataFrame()
+    return pa.concat_tables(tablas, promote_options="default").to_pandas()
+
+
+def metadatos_periodos(rutas):
+    """
+    Une los metadatos de ingesta de varias particiones.
+
+    Las columnas originales se juntan en orden de aparición; de cada fecha se
+    informan los formatos detectados y el total de valores sin convertir.
+    """
+    columnas_originales, fechas = [], {}
+    for ruta in rutas:
+        metadatos = procesamiento.leer_metadatos(ruta)
+        for col in metadatos.get('columnas_originales', pq.read_schema(ruta).names):
+            if col not in columnas_originales:
+                columnas_originales.append(col)
+        for col, (formato, sin_convertir) in metadatos.get('fechas', {}).items():
+            formatos, total = fechas.get(col, ([], 0))
+            if formato not in formatos:
+                formatos.append(formato)
+            fechas[col] = (formatos, total + sin_convertir)
+    return {
+        'columnas_originales': columnas_originales,
+        'fechas': {col: (" / ".join(formatos), total) for col, (formatos, total) in fechas.items()},
+    }
+
+
+def headcount_por_periodo(directorio=DIRECTORIO_ALMACEN, acceso=None):
+    """
+    Personas por periodo a partir de los metadatos Parquet (sin leer datos).
+
+    Con `acceso` (ver accesos.permiso) se suman solo los rangos de las
+    unidades permitidas que se guardaron al ingerir.
+    """
+    conteos = {}
+    for periodo in listar_periodos(directorio):
+        ruta = ruta_particion(directorio, periodo)
+        if acceso is None:
+            conteos[periodo] = pq.ParquetFile(ruta).metadata.num_rows
+        else:
+            particiones = procesamiento.leer_metadatos(ruta).get('particiones', [])
+            conteos[periodo] = sum(fin - inicio for inicio, fin in accesos.rangos_permitidos(particiones, acceso))
+    return pd.Series(conteos, name="conteo", dtype="int64")
+
+
+def resumen_periodos(rutas, hoy, referencia):
+    """
+    Indicadores principales de los periodos elegidos (sin filtros) a partir
+    del resumen guardado en cada partición, sin leer los datos.
+
+    Devuelve {"headcount", "mujeres", "hombres", "edad_promedio"} o None si
+    alguna partición no tiene resumen.
+    """
+    total = {"headcount": 0, "mujeres": 0, "hombres": 0, "edad_promedio": None}
+    suma_edad = con_edad = 0
+    for ruta in rutas:
+        metadatos = procesamiento.leer_metadatos(ruta)
+        resumen = metadatos.get("resumen")
+        if resumen is None:
+            return None
+        if referencia == procesamiento.REFERENCIA_PERIODO:
+            fecha = pd.Timestamp(metadatos.get("periodo") or hoy)
+        else:
+            fecha = procesamiento.obtener_fecha_referencia(pd.DataFrame(), referencia, hoy)
+        # Edad cumplida: año de referencia - año de nacimiento, menos 1 si no cumplió aún
+        mes_dia = fecha.month * 100 + fecha.day
+        no_cumplen = sum(n for md, n in resumen["mes_dia_nac"].items() if int(md) > mes_dia)
+        suma_edad += resumen["nacimientos"] * fecha.year - resumen["suma_anios_nac"] - no_cumplen
+        con_edad += resumen["nacimientos"]
+        total["headcount"] += resumen["headcount"]
+        for valor, n in resumen["genero"].items():
+            if valor.upper() == "F":
+                total["mujeres"] += n
+            elif valor.upper() == "M":
+                total["hombres"] += n
+    if con_edad:
+        total["edad_promedio"] = suma_edad / con_edad
+    return total
+
+
+def procesar_periodos(rutas, hoy, columnas, referencia, avance=None):
+    """
+    Lee y procesa los periodos elegidos como lo hace el dashboard.
+
+    `avance(etapa)` se llama al empezar cada etapa (para mostrar el progreso).
+    Devuelve (df_processed, info) con el diagnóstico de la carga.
+    """
+    avance = avance or (lambda etapa: None)
+    inicio = time.perf_counter()
+    avance("Leyendo snapshots")
+    df_original = leer_periodos(rutas, list(columnas))
+    avance("Procesando fechas, edad y antigüedad")
+    df_processed, columnas_procesadas, mensajes = procesamiento.procesar_activos(
+        df_original, hoy, referencia
+    )
+    avance("Compactando tipos")
+    memoria_sin_compactar = procesamiento.memoria_mb(df_processed)
+    df_processed = procesamiento.compactar_tipos(df_processed)
+    # Una unidad de negocio / país por rango de filas: cada sesión recibe solo los suyos
+    avance("Ordenando por unidad de negocio")
+    df_processed, particiones = accesos.particionar(df_processed)
+    metadatos = metadatos_periodos(rutas)
+    # Si las fechas se convirtieron en la ingesta, informar el diagnóstico de entonces
+    fechas_ingesta = metadatos.get("fechas", {})
+    columnas_procesadas = [
+        (orig, nueva, *fechas_ingesta.get(orig, (formato, sin_convertir)))
+        for orig, nueva, formato, sin_convertir in columnas_procesadas
+    ]
+    info = {
+        "columnas_originales": metadatos["columnas_originales"],
+        "columnas_procesadas": columnas_procesadas,
+        "mensajes": mensajes,
+        "memoria_sin_compactar": memoria_sin_compactar,
+        # Registros por archivo de origen
+        "origenes": {
+            str(origen): int(filas) for origen, filas in df_processed[COLUMNA_ORIGEN].value_counts().items()
+        } if COLUMNA_ORIGEN in df_processed.columns else {},
+        "particiones": particiones,
+        "t_frio": time.perf_counter() - inicio,
+        "creado": time.time(),
+    }
+    return df_processed, info
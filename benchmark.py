@@ -0,0 +1,249 @@
+"""
+Benchmark del pipeline del dashboard sobre exports sintéticos.
+
+Para cada tamaño se genera (o reutiliza) un export con sintetico.py y se
+miden las etapas que recorre el dashboard: carga, fechas, edad,
+procesamiento, índice de filtros, filtrado, conteos de cada gráfico y
+exportación. Los resultados se guardan en JSON para comparar commits.
+
+Uso:
+    python benchmark.py --filas 10000 100000 --salida benchmark.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import agregados
+import consultas
+import exportacion
+import filtros
+import procesamiento
+import sintetico
+
+try:
+    import resource
+except ImportError:  # no existe en Windows
+    resource = None
+
+TAMANOS = [10_000, 100_000, 1_000_000, 10_000_000]
+DIRECTORIO_DATOS = "benchmark_datos"
+
+COLUMNAS_FILTROS = [
+    "UNIDAD DE NEGOCIO",
+    "GENERO (F/M)",
+    "POSICION / PUESTO / CARGO",
+    "pais",
+    "RANGO_EDAD",
+    "AÑO_INGRESO",
+    "MES_INGRESO",
+]
+
+# Columnas de los gráficos del dashboard (crear_grafico_seguro y cumpleaños/tendencia)
+COLUMNAS_GRAFICOS = [
+    "GENERO (F/M)",
+    "RANGO_EDAD",
+    "UNIDAD DE NEGOCIO",
+    "POSICION / PUESTO / CARGO",
+    "AÑO_INGRESO",
+    "MES_INGRESO",
+    "RANGO_ANTIGUEDAD",
+    "MES_NAC",
+    "periodo",
+]
+
+FORMATOS_EXPORTACION = [exportacion.FORMATO_CSV, exportacion.FORMATO_CSV_GZ, exportacion.FORMATO_PARQUET]
+
+
+def medir(tiempos, nombre, funcion, *args, repeticiones=1, **kwargs):
+    """Ejecuta funcion, guarda el mejor tiempo (s) en tiempos[nombre] y devuelve el resultado"""
+    mejor = None
+    for _ in range(max(repeticiones, 1)):
+        inicio = time.perf_counter()
+        resultado = funcion(*args, **kwargs)
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    tiempos[nombre] = round(mejor, 6)
+    return resultado
+
+
+def memoria_pico_mb():
+    """Memoria residente máxima del proceso (None si no se puede medir)"""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB; macOS, bytes
+    return round(pico / (1e6 if sys.platform == "darwin" else 1e3), 1)
+
+
+def commit_actual():
+    """Commit de git del árbol (None fuera de un repositorio)"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def entorno():
+    return {
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "pyarrow": pa.__version__,
+        "duckdb": consultas.duckdb.__version__ if consultas.disponible() else None,
+    }
+
+
+def preparar_datos(filas, periodos, semilla, directorio=DIRECTORIO_DATOS):
+    """Ruta del export sintético (se genera solo si no existe)"""
+    os.makedirs(directorio, exist_ok=True)
+    ruta = os.path.join(directorio, f"activos_{filas}_{periodos}p_{semilla}.csv")
+    if not os.path.exists(ruta):
+        sintetico.generar(filas, ruta, periodos, semilla)
+    return ruta
+
+
+def _filtros_ejemplo(indice):
+    """Filtro típico: las dos unidades más grandes y un género"""
+    filtros_aplicados = {}
+    if "UNIDAD DE NEGOCIO" in indice:
+        filtros_aplicados["UNIDAD DE NEGOCIO"] = filtros.sugerencias(indice["UNIDAD DE NEGOCIO"], 2)
+    if "GENERO (F/M)" in indice:
+        filtros_aplicados["GENERO (F/M)"] = filtros.sugerencias(indice["GENERO (F/M)"], 1)
+    return filtros_aplicados
+
+
+def filas_filtradas(indice, filtros_aplicados):
+    """Posiciones de las filas que cumplen los filtros (None = todas), como en el dashboard"""
+    mascara, _ = filtros.seleccionar_filas(indice, filtros_aplicados)
+    return None if mascara is None else np.flatnonzero(mascara)
+
+
+def medir_tamano(ruta_csv, hoy, repeticiones=1):
+    """Tiempos (s) de cada etapa sobre un export"""
+    tiempos = {}
+    df_original = medir(tiempos, "carga_csv", procesamiento.leer_activos, ruta_csv)
+
+    ruta_parquet = procesamiento.ruta_columnar(ruta_csv)
+    medir(tiempos, "conversion_parquet", procesamiento.convertir_a_columnar, ruta_csv, ruta_parquet)
+    medir(tiempos, "carga_parquet", procesamiento.leer_activos, ruta_parquet, repeticiones=repeticiones)
+
+    col_nac = next(c for c in procesamiento.FECHA_NAC_POSIBLES if c in df_original.columns)
+    col_ing = next(c for c in procesamiento.FECHA_ING_POSIBLES if c in df_original.columns)
+    fechas_nac, _, _ = medir(tiempos, "fecha_nacimiento", procesamiento.parsear_fecha,
+                             df_original[col_nac], repeticiones=repeticiones)
+    medir(tiempos, "fecha_ingreso", procesamiento.parsear_fecha, df_original[col_ing], repeticiones=repeticiones)
+    medir(tiempos, "edad", procesamiento.calcular_edad, fechas_nac, pd.Timestamp(hoy), repeticiones=repeticiones)
+
+    df, _, _ = medir(tiempos, "procesamiento", procesamiento.procesar_activos, df_original, hoy)
+    del df_original
+    medir(tiempos, "compactar_tipos", procesamiento.compactar_tipos, df)
+
+    columnas_cubo = COLUMNAS_FILTROS + ["RANGO_ANTIGUEDAD", "MES_NAC", "periodo"]
+    indice = medir(tiempos, "indice_filtros", filtros.construir_indice, df, columnas_cubo)
+    filtros_aplicados = _filtros_ejemplo(indice)
+    filas = medir(tiempos, "filtrado", filas_filtradas, indice, filtros_aplicados, repeticiones=repeticiones)
+    cubo = medir(tiempos, "cubo", agregados.construir_cubo, indice, columnas_cubo)
+    cubo_filtrado = medir(tiempos, "filtrado_cubo", agregados.filtrar_cubo, cubo, indice, filtros_aplicados,
+                          repeticiones=repeticiones)
+
+    graficos = {"cubo": {}, "value_counts": {}}
+    df_filtrado = df if filas is None else df.take(filas)
+    for columna in COLUMNAS_GRAFICOS:
+        if columna not in df.columns:
+            continue
+        medir(graficos["cubo"], columna, agregados.contar, cubo_filtrado, indice, columna,
+              repeticiones=repeticiones)
+        # Referencia: conteo directo sobre las filas filtradas (lo que hacía el dashboard original)
+        medir(graficos["value_counts"], columna, lambda c: df_filtrado[c].value_counts(), columna,
+              repeticiones=repeticiones)
+
+    if consultas.disponible():
+        graficos["sql"] = {}
+        con = consultas.conectar(":memory:")
+        # DuckDB no distingue mayúsculas: de columnas como Mes_ingreso / MES_INGRESO
+        # queda la calculada por el procesamiento (la última)
+        ultima = {col.lower(): col for col in df.columns}
+        columnas_sql = [col for col in df.columns if ultima[col.lower()] == col]
+        medir(tiempos, "carga_sql", consultas.guardar, con, "activos_benchmark", df[columnas_sql], {})
+        indice_sql = consultas.construir_indice(con, "activos_benchmark", columnas_cubo)
+        condiciones = consultas.condiciones(indice_sql, filtros_aplicados)
+        medir(tiempos, "filtrado_sql", consultas.contar_filtros, con, "activos_benchmark", condiciones,
+              repeticiones=repeticiones)
+        for columna in COLUMNAS_GRAFICOS:
+            if columna in columnas_sql:
+                medir(graficos["sql"], columna, consultas.contar, con, "activos_benchmark", condiciones,
+                      columna, repeticiones=repeticiones)
+        con.close()
+
+    exportaciones = {}
+    for formato in FORMATOS_EXPORTACION:
+        medir(exportaciones, formato, exportacion.generar, df, formato, filas)
+
+    return {
+        "etapas": tiempos,
+        "graficos": graficos,
+        "graficos_total": {motor: round(sum(valores.values()), 6) for motor, valores in graficos.items()},
+        "exportacion": exportaciones,
+        "registros_filtrados": len(df) if filas is None else len(filas),
+        "memoria_df_mb": round(procesamiento.memoria_mb(df), 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide el pipeline del dashboard con datos sintéticos")
+    parser.add_argument("--filas", type=int, nargs="+", default=TAMANOS, help="Tamaños a medir")
+    parser.add_argument("--periodos", type=int, default=2, help="Periodos de cada export sintético")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--repeticiones", type=int, default=3,
+                        help="Repeticiones de las etapas rápidas (se guarda el mejor tiempo)")
+    parser.add_argument("--datos", default=DIRECTORIO_DATOS, help="Carpeta de los exports generados")
+    parser.add_argument("--salida", default="benchmark.json", help="Archivo JSON de resultados")
+    args = parser.parse_args(argv)
+
+    hoy = date.today()
+    informe = {
+        "commit": commit_actual(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "fecha_calculo": hoy.isoformat(),
+        "entorno": entorno(),
+        "resultados": [],
+    }
+    for filas in args.filas:
+        inicio = time.perf_counter()
+        ruta_csv = preparar_datos(filas, args.periodos, args.semilla, args.datos)
+        generacion = time.perf_counter() - inicio
+        resultado = medir_tamano(ruta_csv, hoy, args.repeticiones)
+        resultado.update({
+            "filas": filas,
+            "periodos": args.periodos,
+            "archivo_mb": round(os.path.getsize(ruta_csv) / 1e6, 1),
+            "generacion_s": round(generacion, 3),
+            "memoria_pico_mb": memoria_pico_mb(),
+        })
+        informe["resultados"].append(resultado)
+        etapas = resultado["etapas"]
+        print(f"✅ {filas:>10,} filas: carga {etapas['carga_csv']:.2f} s, "
+              f"procesamiento {etapas['procesamiento']:.2f} s, "
+              f"gráficos (cubo) {resultado['graficos_total']['cubo']:.3f} s")
+
+        # Se escribe después de cada tamaño para no perder lo medido si uno grande falla
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(informe, f, ensure_ascii=False, indent=2)
+    print(f"📄 Resultados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
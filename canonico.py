@@ -0,0 +1,132 @@
+"""
+Canonización de las dimensiones al ingerir un export.
+
+Los exports escriben un mismo valor de varias formas (PE / PERU, COMERCIAL /
+GERENCIA COMERCIAL, "26–35" / "26-35", espacios de más). El archivo de
+mapeo (canonizacion.json, versionado) indica el valor canónico de cada
+variante por columna. Se aplica sobre las categorías, no sobre las filas:
+cada columna se factoriza una vez, se traducen sus valores distintos y los
+códigos de las filas se remapean con una tabla de consulta.
+
+Las variantes se buscan por su clave (sin tildes, en mayúsculas y con
+espacios simples), así "Comercial" y "COMERCIAL" usan la misma entrada.
+En las columnas de "normalizar" los valores sin entrada quedan como su
+clave; en las demás solo se limpian los espacios.
+"""
+import json
+import os
+import sys
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+RUTA_MAPEO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "canonizacion.json")
+
+# Columnas que se canonizan siempre (además de las del archivo de mapeo)
+COLUMNAS_CANONICAS = [
+    'pais',
+    'UNIDAD DE NEGOCIO',
+    'RAZON SOCIAL / PLANILLA',
+    'gerencia',
+    'area',
+    'POSICION / PUESTO / CARGO',
+    'GENERO (F/M)',
+    'RANGO_EDAD',
+]
+
+
+def clave(texto):
+    """Texto sin tildes, en mayúsculas y con espacios simples"""
+    sin_tildes = "".join(
+        c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c)
+    )
+    return " ".join(sin_tildes.upper().split())
+
+
+def cargar_mapeo(ruta=RUTA_MAPEO):
+    """
+    Lee el archivo de mapeo.
+
+    Devuelve {"version", "normalizar": set de columnas, "columnas": {columna:
+    {clave de la variante: valor canónico}}}. Sin archivo, versión 0 y sin
+    mapeos (solo se limpian los espacios).
+    """
+    if not os.path.exists(ruta):
+        return {"version": 0, "normalizar": set(), "columnas": {}}
+    with open(ruta, encoding='utf-8') as f:
+        datos = json.load(f)
+    return {
+        "version": datos.get("version", 0),
+        "normalizar": set(datos.get("normalizar", [])),
+        "columnas": {
+            columna: {clave(variante): canonico for variante, canonico in variantes.items()}
+            for columna, variantes in datos.get("columnas", {}).items()
+        },
+    }
+
+
+def valor_canonico(valor, columna, mapeo):
+    """Valor canónico de un valor de la columna ('' = vacío)"""
+    texto = " ".join(str(valor).split())
+    variantes = mapeo["columnas"].get(columna, {})
+    if not variantes and columna not in mapeo["normalizar"]:
+        return texto
+    k = clave(texto)
+    if k in variantes:
+        return variantes[k]
+    return k if columna in mapeo["normalizar"] else texto
+
+
+def canonizar_serie(serie, columna, mapeo):
+    """
+    Columna canónica como categórica.
+
+    Devuelve (Categorical, {valor original: valor canónico} de los que cambiaron).
+    """
+    codigos, unicos = pd.factorize(serie, sort=False)
+    originales = [str(v) for v in unicos]
+    canonicos = [valor_canonico(v, columna, mapeo) for v in originales]
+    categorias = sorted({c for c in canonicos if c != ''})
+    posicion = {c: i for i, c in enumerate(categorias)}
+    # El último elemento atiende a los vacíos (código -1)
+    remapeo = np.array([posicion.get(c, -1) for c in canonicos] + [-1], dtype=np.int32)
+    cambios = {o: c for o, c in zip(originales, canonicos) if o != c}
+    return pd.Categorical.from_codes(remapeo[codigos], categories=categorias), cambios
+
+
+def canonizar(df, mapeo=None):
+    """
+    Canoniza las columnas de dimensión de df (modifica y devuelve df).
+
+    Devuelve (df, cambios) con {columna: {original: canónico}} para los metadatos.
+    """
+    mapeo = cargar_mapeo() if mapeo is None else mapeo
+    columnas = list(dict.fromkeys(COLUMNAS_CANONICAS + list(mapeo["columnas"])))
+    cambios = {}
+    for columna in columnas:
+        if columna in df.columns:
+            df[columna], cambios_columna = canonizar_serie(df[columna], columna, mapeo)
+            if cambios_columna:
+                cambios[columna] = cambios_columna
+    return df, cambios
+
+
+def main():
+    """Muestra las variantes que se unifican en un export: python canonico.py archivo.csv"""
+    if len(sys.argv) < 2:
+        print("Uso: python canonico.py archivo.csv")
+        return
+    mapeo = cargar_mapeo()
+    disponibles = pd.read_csv(sys.argv[1], nrows=0).columns
+    columnas = [c for c in dict.fromkeys(COLUMNAS_CANONICAS + list(mapeo["columnas"])) if c in disponibles]
+    df = pd.read_csv(sys.argv[1], usecols=columnas, dtype=str)
+    print(f"📖 Mapeo versión {mapeo['version']}")
+    for columna in columnas:
+        antes = df[columna].nunique()
+        canonica, cambios = canonizar_serie(df[columna], columna, mapeo)
+        print(f"  {columna}: {antes} → {len(canonica.categories)} valores ({len(cambios)} variantes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Dataset procesado compartido entre sesiones mediante Arrow mapeado en memoria.
+
+El dataset se procesa una vez y se publica en un archivo Arrow IPC sin
+comprimir. Cada lector abre el archivo con memory_map y obtiene un
+DataFrame cuyas columnas (ArrowDtype, salvo las categóricas) apuntan al archivo:
+no hay copias por sesión y el sistema operativo comparte esas páginas
+entre todos los procesos que lo lean. Los datos son de solo lectura.
+"""
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+import procesamiento
+
+DIRECTORIO_COMPARTIDO = "compartido"
+EXTENSION = ".arrow"
+CLAVE_INFO = b'info'
+
+# Publicaciones que se conservan (otras fechas de referencia, rangos de
+# periodos o días); las más antiguas se eliminan al publicar
+MAX_PUBLICACIONES = 6
+
+
+def ruta_publicacion(*partes, directorio=DIRECTORIO_COMPARTIDO):
+    """Ruta del archivo Arrow para una combinación de datos y parámetros"""
+    return os.path.join(directorio, f"activos_{procesamiento.firma_datos(*partes)}{EXTENSION}")
+
+
+def publicar(df, info, ruta, max_publicaciones=MAX_PUBLICACIONES):
+    """
+    Escribe df y su información en un archivo Arrow (escritura atómica).
+
+    En la carpeta se conservan las `max_publicaciones` más recientes (otras
+    sesiones o reportes.py pueden estar usando otra combinación); las más
+    antiguas se eliminan. Quien ya las tenga abiertas las sigue leyendo
+    hasta cerrarlas.
+    """
+    directorio = os.path.dirname(ruta) or "."
+    os.makedirs(directorio, exist_ok=True)
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    esquema = dict(tabla.schema.metadata or {})
+    esquema[CLAVE_INFO] = json.dumps(info, default=str).encode('utf-8')
+    tabla = tabla.replace_schema_metadata(esquema)
+
+    temporal = procesamiento.ruta_temporal(ruta)
+    with pa.OSFile(temporal, 'wb') as archivo:
+        with ipc.new_file(archivo, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+    os.replace(temporal, ruta)
+
+    anteriores = sorted(
+        (os.path.join(directorio, nombre) for nombre in os.listdir(directorio)
+         if nombre.endswith(EXTENSION) and os.path.join(directorio, nombre) != ruta),
+        key=os.path.getmtime, reverse=True
+    )
+    for anterior in anteriores[max(max_publicaciones - 1, 0):]:
+        try:
+            os.remove(anterior)
+        except OSError:
+            # En Windows no se puede borrar mientras otro proceso lo tenga mapeado
+            pass
+    return ruta
+
+
+def _tipo_pandas(tipo):
+    # Las categóricas (diccionarios) se convierten a Categorical de pandas: solo se
+    # copian los códigos, y pandas no sabe reconstruir ArrowDtype de diccionario
+    # al volver a leer un Parquet o Arrow exportado
+    if pa.types.is_dictionary(tipo):
+        return None
+    return pd.ArrowDtype(tipo)
+
+
+def abrir(ruta):
+    """
+    Abre un dataset publicado sin copiarlo.
+
+    Devuelve (df, info); las columnas de df son vistas sobre el archivo.
+    """
+    tabla = ipc.open_file(pa.memory_map(ruta)).read_all()
+    info = json.loads((tabla.schema.metadata or {}).get(CLAVE_INFO, b'{}'))
+    return tabla.to_pandas(types_mapper=_tipo_pandas), info
@@ -0,0 +1,316 @@
+"""
+Backend SQL embebido (DuckDB) para filtros y conteos.
+
+El dataset procesado se guarda una sola vez en un archivo DuckDB que
+comparten todas las sesiones. Los filtros del sidebar se traducen a un
+WHERE con parámetros y cada gráfico pide solo sus conteos (GROUP BY), sin
+tener el DataFrame completo en memoria por sesión. Los valores se comparan
+como texto sin espacios en los extremos, igual que en filtros.py.
+
+DuckDB es opcional: si no está instalado, el dashboard usa pandas.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+import filtros
+import procesamiento
+
+try:
+    import duckdb
+except ImportError:  # backend SQL opcional
+    duckdb = None
+
+RUTA_BASE = "activos.duckdb"
+TABLA_INFO = "_info_tablas"
+PREFIJO_TABLA = "activos_"
+SUFIJO_VISTA = "__acceso_"
+# Versiones del dataset que se conservan en la base (ver guardar)
+MAX_TABLAS = 6
+
+
+def disponible():
+    """Indica si se puede usar el backend SQL"""
+    return duckdb is not None
+
+
+def nombre_tabla(*partes):
+    """Nombre de tabla estable para una combinación de datos y parámetros"""
+    return f"{PREFIJO_TABLA}{procesamiento.firma_datos(*partes)}"
+
+
+def conectar(ruta=RUTA_BASE):
+    """Conexión a la base (crea el archivo si no existe)"""
+    con = duckdb.connect(ruta)
+    con.execute(f"CREATE TABLE IF NOT EXISTS {TABLA_INFO} (tabla VARCHAR PRIMARY KEY, info VARCHAR)")
+    return con
+
+
+def _id(nombre):
+    """Identificador SQL entre comillas"""
+    return '"' + str(nombre).replace('"', '""') + '"'
+
+
+def _texto(columna):
+    return f"trim(CAST({_id(columna)} AS VARCHAR))"
+
+
+def leer_info(con, tabla):
+    """Información guardada con la tabla (None si la tabla no existe)"""
+    fila = con.execute(f"SELECT info FROM {TABLA_INFO} WHERE tabla = ?", [tabla]).fetchone()
+    existe = con.execute(
+        "SELECT count(*) FROM information_schema.tables WHERE table_name = ?", [tabla]
+    ).fetchone()[0]
+    if fila is None or not existe:
+        return None
+    return json.loads(fila[0])
+
+
+def guardar(con, tabla, df, info, max_tablas=MAX_TABLAS):
+    """
+    Guarda df como tabla junto con su información (JSON).
+
+    Se conservan las `max_tablas` versiones más recientes del dataset (otras
+    sesiones pueden estar usando otra fecha de referencia o rango de
+    periodos); las más antiguas se eliminan con sus vistas. DuckDB no
+    distingue mayúsculas en los nombres de columna, así que df no puede
+    tener dos columnas que solo difieran en eso.
+    """
+    vistos = {}
+    for col in df.columns:
+        if str(col).lower() in vistos:
+            raise ValueError(f"Columnas '{vistos[str(col).lower()]}' y '{col}' coinciden en SQL")
+        vistos[str(col).lower()] = col
+    con.register("_df_guardar", df)
+    try:
+        con.execute(f"CREATE OR REPLACE TABLE {_id(tabla)} AS SELECT * FROM _df_guardar")
+    finally:
+        con.unregister("_df_guardar")
+    con.execute(f"INSERT OR REPLACE INTO {TABLA_INFO} VALUES (?, ?)", [tabla, json.dumps(info, default=str)])
+
+    anteriores = sorted(
+        ((json.loads(texto).get("creado", 0), nombre)
+         for nombre, texto in con.execute(f"SELECT tabla, info FROM {TABLA_INFO}").fetchall()
+         if nombre != tabla),
+        reverse=True
+    )
+    for _, nombre in anteriores[max(max_tablas - 1, 0):]:
+        eliminar(con, nombre)
+
+
+def eliminar(con, tabla):
+    """Elimina una tabla junto con sus vistas de acceso y su información"""
+    vistas = con.execute(
+        "SELECT table_name FROM information_schema.tables WHERE table_type = 'VIEW' AND starts_with(table_name, ?)",
+        [f"{tabla}{SUFIJO_VISTA}"]
+    ).fetchall()
+    for (vista,) in vistas:
+        con.execute(f"DROP VIEW IF EXISTS {_id(vista)}")
+    con.execute(f"DROP TABLE IF EXISTS {_id(tabla)}")
+    con.execute(f"DELETE FROM {TABLA_INFO} WHERE tabla = ?", [tabla])
+
+
+def _literal(valor):
+    """Texto como literal SQL (las vistas no admiten parámetros)"""
+    return "'" + str(valor).replace("'", "''") + "'"
+
+
+def crear_vista(con, tabla, acceso):
+    """
+    Vista de la tabla con solo las filas que permite el acceso (ver accesos.permiso).
+
+    La tabla se guarda ordenada por unidad y país, así DuckDB salta los
+    bloques de las demás unidades. Devuelve el nombre de la vista; una por
+    tabla y acceso, compartida por las sesiones con el mismo acceso.
+    """
+    disponibles = set(columnas(con, tabla))
+    partes = []
+    for columna, valores in acceso:
+        if columna not in disponibles or not valores:
+            partes.append("false")
+        else:
+            partes.append(f"{_id(columna)} IN ({', '.join(_literal(v) for v in valores)})")
+    vista = f"{tabla}{SUFIJO_VISTA}{procesamiento.firma_datos(acceso)}"
+    con.execute(
+        f"CREATE VIEW IF NOT EXISTS {_id(vista)} AS "
+        f"SELECT * FROM {_id(tabla)} WHERE {' AND '.join(partes) or 'true'}"
+    )
+    return vista
+
+
+def columnas(con, tabla):
+    """Columnas de la tabla en orden"""
+    return [fila[0] for fila in con.execute(f"DESCRIBE {_id(tabla)}").fetchall()]
+
+
+def total(con, tabla):
+    """Cantidad de registros de la tabla"""
+    return con.execute(f"SELECT count(*) FROM {_id(tabla)}").fetchone()[0]
+
+
+def construir_indice(con, tabla, columnas_indice):
+    """Opciones y conteos de cada columna filtrable (mismo formato que filtros.construir_indice)"""
+    disponibles = set(columnas(con, tabla))
+    indice = {}
+    for col in columnas_indice:
+        if col not in disponibles:
+            continue
+        filas = con.execute(
+            f"SELECT {_texto(col)} AS valor, count(*) FROM {_id(tabla)} "
+            f"WHERE valor IS NOT NULL AND valor <> '' GROUP BY valor"
+        ).fetchall()
+        conteo_por_valor = dict(filas)
+        opciones = sorted(conteo_por_valor, key=lambda x: str(x))
+        indice[col] = filtros.entrada_indice(opciones, [conteo_por_valor[o] for o in opciones])
+    return indice
+
+
+def condiciones(indice, filtros_aplicados):
+    """
+    Traduce los filtros a condiciones SQL: lista de (columna, sql, parámetros).
+
+    Igual que filtros.mascara_columna, las columnas con todas las opciones
+    seleccionadas (o sin selección) no generan condición.
+    """
+    resultado = []
+    for columna, valores in filtros_aplicados.items():
+        if columna not in indice or not valores:
+            continue
+        entrada = indice[columna]
+        seleccion = sorted({v for v in valores if v in entrada["posicion"]})
+        if len(seleccion) == len(entrada["opciones"]):
+            continue
+        if not seleccion:
+            resultado.append((columna, "FALSE", []))
+        else:
+            marcas = ", ".join("?" for _ in seleccion)
+            resultado.append((columna, f"{_texto(columna)} IN ({marcas})", seleccion))
+    return resultado
+
+
+def _where(condiciones_sql, extra=None):
+    partes = [sql for _, sql, _ in condiciones_sql] + ([extra] if extra else [])
+    parametros = [p for _, _, params in condiciones_sql for p in params]
+    if not partes:
+        return "", parametros
+    return "WHERE " + " AND ".join(f"({p})" for p in partes), parametros
+
+
+def contar_filtros(con, tabla, condiciones_sql):
+    """
+    Registros tras aplicar los filtros, en una sola consulta.
+
+    Devuelve (total filtrado, [(columna, registros tras ese filtro)]) como
+    filtros.seleccionar_filas (los filtros se acumulan en orden).
+    """
+    expresiones, parametros = [], []
+    acumuladas = []
+    for columna, sql, params in condiciones_sql:
+        acumuladas.append(f"({sql})")
+        parametros.extend(p for _, _, ps in condiciones_sql[:len(acumuladas)] for p in ps)
+        expresiones.append(f"count(*) FILTER (WHERE {' AND '.join(acumuladas)})")
+    fila = con.execute(
+        f"SELECT count(*){''.join(', ' + e for e in expresiones)} FROM {_id(tabla)}", parametros
+    ).fetchone()
+    conteos = [(columna, fila[i + 1]) for i, (columna, _, _) in enumerate(condiciones_sql)]
+    return (conteos[-1][1] if conteos else fila[0]), conteos
+
+
+def contar(con, tabla, condiciones_sql, columna):
+    """
+    Conteo por valor de una columna (equivalente a agregados.contar).
+
+    Devuelve una Serie ordenada de mayor a menor, sin vacíos.
+    """
+    where, parametros = _where(condiciones_sql, f"{_texto(columna)} <> ''")
+    filas = con.execute(
+        f"SELECT {_texto(columna)} AS valor, count(*) AS conteo FROM {_id(tabla)} {where} "
+        f"GROUP BY valor ORDER BY conteo DESC, valor", parametros
+    ).fetchall()
+    return pd.Series(
+        [conteo for _, conteo in filas],
+        index=pd.Index([valor for valor, _ in filas], name=columna),
+        name="count", dtype="int64"
+    )
+
+
+def consultar(con, tabla, condiciones_sql, columnas_sel=None, limite=None):
+    """Filas que cumplen los filtros (solo las columnas y cantidad pedidas)"""
+    lista = "*" if columnas_sel is None else ", ".join(_id(c) for c in columnas_sel)
+    where, parametros = _where(condiciones_sql)
+    sql = f"SELECT {lista} FROM {_id(tabla)} {where}"
+    if limite is not None:
+        sql += f" LIMIT {int(limite)}"
+    return con.execute(sql, parametros).df()
+
+
+def lotes(con, tabla, condiciones_sql, filas_por_lote):
+    """
+    Filas que cumplen los filtros por lotes, sin armar el resultado completo.
+
+    Devuelve (vacio, lotes): un DataFrame sin filas con las columnas y tipos
+    del resultado, y un generador de DataFrames de hasta `filas_por_lote`
+    filas (lotes de Arrow del cursor de DuckDB).
+    """
+    where, parametros = _where(condiciones_sql)
+    lector = con.execute(f"SELECT * FROM {_id(tabla)} {where}", parametros).fetch_record_batch(filas_por_lote)
+    return lector.schema.empty_table().to_pandas(), (lote.to_pandas() for lote in lector)
+
+
+def resumen_numerico(con, tabla, condiciones_sql, columna):
+    """Mínimo, máximo, promedio y mediana de una columna numérica"""
+    where, parametros = _where(condiciones_sql)
+    c = _id(columna)
+    fila = con.execute(
+        f"SELECT min({c}), max({c}), avg({c}), median({c}) FROM {_id(tabla)} {where}", parametros
+    ).fetchone()
+    return dict(zip(["min", "max", "mean", "median"], fila))
+
+
+def no_nulos(con, tabla):
+    """Cantidad de valores no nulos por columna"""
+    nombres = columnas(con, tabla)
+    fila = con.execute(
+        "SELECT " + ", ".join(f"count({_id(c)})" for c in nombres) + f" FROM {_id(tabla)}"
+    ).fetchone()
+    return pd.Series(fila, index=nombres, dtype=np.int64)
+
+
+def valores_ejemplo(con, tabla, columna, n=5):
+    """Algunos valores distintos no nulos de una columna"""
+    filas = con.execute(
+        f"SELECT DISTINCT {_id(columna)} FROM {_id(tabla)} WHERE {_id(columna)} IS NOT NULL LIMIT {int(n)}"
+    ).fetchall()
+    return [fila[0] for fila in filas]
+
+
+def hojas_jerarquia(con, tabla, condiciones_sql, niveles, columna_genero, columna_edad, sin_dato):
+    """
+    Tabla de hojas de jerarquia.hojas en una sola consulta (GROUP BY de los niveles).
+
+    Los niveles, el género o la edad que no estén en la tabla se omiten o
+    quedan en cero.
+    """
+    disponibles = set(columnas(con, tabla))
+    niveles = [nivel for nivel in niveles if nivel in disponibles]
+    seleccion = [
+        f"coalesce(nullif({_texto(nivel)}, ''), ?) AS {_id(nivel)}" for nivel in niveles
+    ]
+    parametros = [sin_dato] * len(niveles)
+    seleccion.append("count(*) AS headcount")
+    if columna_genero in disponibles:
+        genero = f"upper({_texto(columna_genero)})"
+        seleccion += [f"count(*) FILTER (WHERE {genero} = 'F') AS mujeres",
+                      f"count(*) FILTER (WHERE {genero} = 'M') AS hombres"]
+    else:
+        seleccion += ["0 AS mujeres", "0 AS hombres"]
+    if columna_edad in disponibles:
+        seleccion += [f"coalesce(sum({_id(columna_edad)}), 0) AS suma_edad", f"count({_id(columna_edad)}) AS con_edad"]
+    else:
+        seleccion += ["0 AS suma_edad", "0 AS con_edad"]
+    where, parametros_where = _where(condiciones_sql)
+    agrupar = f"GROUP BY {', '.join(str(i + 1) for i in range(len(niveles)))}" if niveles else ""
+    return con.execute(
+        f"SELECT {', '.join(seleccion)} FROM {_id(tabla)} {where} {agrupar}", parametros + parametros_where
+    ).df()
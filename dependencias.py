@@ -0,0 +1,62 @@
+"""
+Recálculo incremental de las etapas que dependen de los filtros.
+
+El dashboard es un grafo de etapas, cada una con una clave armada a partir
+de las claves de sus entradas:
+
+    datos → índice y cubo → máscara de cada filtro → selección → cubo filtrado
+          → conteo de cada gráfico → figura
+
+Datos, índice y cubo se comparten entre sesiones (st.cache_resource) y las
+figuras se memoizan por firma (st.cache_data). Las etapas intermedias
+dependen de los filtros de cada sesión y se guardan en un memo de la
+sesión: al cambiar el filtro de género se recalcula solo la máscara de
+género, la selección y los conteos; las máscaras de los demás filtros y
+todo lo anterior se reutilizan, y un rerun sin cambios (p. ej. cambiar de
+pestaña) no recalcula nada.
+"""
+from collections import Counter, OrderedDict
+
+# Entradas que se guardan por etapa (las máscaras y selecciones ocupan una
+# posición por fila, así que de ellas se guarda solo la última)
+MAX_ENTRADAS = 32
+MAX_ENTRADAS_FILAS = 1
+
+
+def nuevo_memo():
+    return {"etapas": {}, "recalculadas": Counter(), "reutilizadas": Counter()}
+
+
+def iniciar_rerun(memo):
+    """Reinicia los contadores de recálculos del rerun"""
+    memo["recalculadas"] = Counter()
+    memo["reutilizadas"] = Counter()
+
+
+def calcular(memo, etapa, clave, funcion, *args, max_entradas=MAX_ENTRADAS, **kwargs):
+    """
+    Resultado de `funcion(*args)` para la clave dada; solo se calcula si la
+    etapa no tiene esa clave guardada.
+
+    `clave` debe identificar todas las entradas de la etapa (incluidas las
+    claves de las etapas de las que depende). Los resultados se comparten:
+    no deben modificarse.
+    """
+    nombre = etapa[0] if isinstance(etapa, tuple) else etapa
+    entradas = memo["etapas"].setdefault(etapa, OrderedDict())
+    if clave in entradas:
+        entradas.move_to_end(clave)
+        memo["reutilizadas"][nombre] += 1
+        return entradas[clave]
+    resultado = funcion(*args, **kwargs)
+    entradas[clave] = resultado
+    while len(entradas) > max_entradas:
+        entradas.popitem(last=False)
+    memo["recalculadas"][nombre] += 1
+    return resultado
+
+
+def resumen(memo):
+    """{etapa: (recalculadas, reutilizadas)} del rerun"""
+    nombres = sorted(set(memo["recalculadas"]) | set(memo["reutilizadas"]))
+    return {nombre: (memo["recalculadas"][nombre], memo["reutilizadas"][nombre]) for nombre in nombres}
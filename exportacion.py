@@ -0,0 +1,198 @@
+"""
+Exportación de los datos filtrados para descarga.
+
+El archivo se genera solo cuando se pide (no en cada rerun) y se escribe
+por bloques de filas en un archivo temporal: nunca se arma una copia
+completa del DataFrame ni el texto CSV entero en memoria. Con DuckDB los
+bloques salen del resultado de la consulta (lotes de Arrow), sin pasar
+por un DataFrame completo. Las columnas sensibles se descartan una sola
+vez, al elegir las columnas que se recorren en cada bloque.
+
+st.download_button recibe el archivo terminado como bytes: Streamlit no
+admite enviarlo por partes, así que la memoria queda acotada por el
+tamaño del archivo generado (un bloque mientras se escribe).
+"""
+import gzip
+import io
+import itertools
+import os
+import tempfile
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import procesamiento
+
+try:
+    import openpyxl
+except ImportError:  # Excel es opcional
+    openpyxl = None
+
+FORMATO_CSV = "csv"
+FORMATO_CSV_GZ = "csv.gz"
+FORMATO_PARQUET = "parquet"
+FORMATO_EXCEL = "xlsx"
+
+# Tipo MIME de cada formato de descarga
+MIME_FORMATOS = {
+    FORMATO_CSV: "text/csv",
+    FORMATO_CSV_GZ: "application/gzip",
+    FORMATO_PARQUET: "application/vnd.apache.parquet",
+    FORMATO_EXCEL: "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+FILAS_POR_BLOQUE = 50_000
+
+# Límite de filas de una hoja de Excel (sin contar el encabezado)
+MAX_FILAS_EXCEL = 1_048_575
+
+
+def formatos_disponibles():
+    """Formatos que se pueden generar con las dependencias instaladas"""
+    formatos = [FORMATO_CSV, FORMATO_CSV_GZ, FORMATO_PARQUET]
+    if openpyxl is not None:
+        formatos.append(FORMATO_EXCEL)
+    return formatos
+
+
+def columnas_exportables(columnas):
+    """
+    Separa las columnas que se exportan de las sensibles.
+
+    Devuelve (columnas a exportar, columnas sensibles descartadas).
+    """
+    sensibles = [s.lower() for s in procesamiento.COLUMNAS_SENSIBLES]
+    exportar, eliminadas = [], []
+    for col in columnas:
+        if any(s in str(col).lower() for s in sensibles):
+            eliminadas.append(col)
+        else:
+            exportar.append(col)
+    return exportar, eliminadas
+
+
+def bloques(df, columnas, filas=None, filas_por_bloque=FILAS_POR_BLOQUE):
+    """
+    Recorre df por bloques de filas con solo las columnas indicadas.
+
+    `filas` (posiciones) limita el recorrido a esas filas sin armar antes
+    el DataFrame filtrado.
+    """
+    seleccion = df[columnas]
+    cantidad = len(df) if filas is None else len(filas)
+    for inicio in range(0, cantidad, filas_por_bloque):
+        if filas is None:
+            yield seleccion.iloc[inicio:inicio + filas_por_bloque]
+        else:
+            yield seleccion.take(filas[inicio:inicio + filas_por_bloque])
+
+
+def _bloques_csv(lista, vacio, texto):
+    primero = True
+    for bloque in lista:
+        bloque.to_csv(texto, index=False, header=primero)
+        primero = False
+    if primero:
+        # Sin filas: solo el encabezado
+        vacio.to_csv(texto, index=False)
+
+
+def _escribir_csv(lista, vacio, destino):
+    if isinstance(destino, (str, os.PathLike)):
+        with open(destino, 'w', encoding='utf-8', newline='') as texto:
+            _bloques_csv(lista, vacio, texto)
+        return
+    # Archivo binario (p. ej. BytesIO): se escribe el texto encima sin cerrarlo
+    texto = io.TextIOWrapper(destino, encoding='utf-8', newline='')
+    _bloques_csv(lista, vacio, texto)
+    texto.flush()
+    texto.detach()
+
+
+def _escribir_csv_gz(lista, vacio, destino):
+    with gzip.open(destino, 'wt', encoding='utf-8', newline='') as texto:
+        _bloques_csv(lista, vacio, texto)
+
+
+def _escribir_parquet(lista, vacio, destino):
+    # El esquema sale del primer bloque: una categórica sin filas no tiene tipo de valores
+    lista = iter(lista)
+    primero = next(lista, vacio)
+    esquema = pa.Schema.from_pandas(primero, preserve_index=False)
+    with pq.ParquetWriter(destino, esquema) as escritor:
+        for bloque in itertools.chain([primero], lista):
+            escritor.write_table(pa.Table.from_pandas(bloque, schema=esquema, preserve_index=False))
+
+
+def _filas_excel(bloque):
+    # openpyxl no acepta NaN/NaT ni escalares de numpy: se pasa el bloque a objetos de Python
+    objetos = bloque.astype(object)
+    return objetos.where(bloque.notna(), None).itertuples(index=False, name=None)
+
+
+def _escribir_excel(lista, vacio, destino):
+    if openpyxl is None:
+        raise ImportError("Se necesita openpyxl para exportar a Excel")
+    libro = openpyxl.Workbook(write_only=True)
+    hoja = libro.create_sheet("datos")
+    hoja.append([str(col) for col in vacio.columns])
+    escritas = 0
+    for bloque in lista:
+        escritas += len(bloque)
+        if escritas > MAX_FILAS_EXCEL:
+            raise ValueError(f"Excel admite hasta {MAX_FILAS_EXCEL} filas; usa CSV o Parquet")
+        for fila in _filas_excel(bloque):
+            hoja.append(fila)
+    libro.save(destino)
+
+
+ESCRITORES = {
+    FORMATO_CSV: _escribir_csv,
+    FORMATO_CSV_GZ: _escribir_csv_gz,
+    FORMATO_PARQUET: _escribir_parquet,
+    FORMATO_EXCEL: _escribir_excel,
+}
+
+
+def exportar(df, formato, destino, filas=None):
+    """
+    Escribe df en `destino` (ruta o archivo binario) sin columnas sensibles.
+
+    Si se indica `filas` (posiciones), solo se exportan esas filas.
+    Devuelve la lista de columnas sensibles descartadas.
+    """
+    columnas, eliminadas = columnas_exportables(df.columns)
+    if formato == FORMATO_EXCEL and (len(df) if filas is None else len(filas)) > MAX_FILAS_EXCEL:
+        raise ValueError(f"Excel admite hasta {MAX_FILAS_EXCEL} filas; usa CSV o Parquet")
+    ESCRITORES[formato](bloques(df, columnas, filas), df.iloc[:0][columnas], destino)
+    return eliminadas
+
+
+def exportar_lotes(lotes, vacio, formato, destino):
+    """
+    Como exportar, con los bloques ya armados (p. ej. lotes de una consulta).
+
+    `vacio` es un DataFrame sin filas con las columnas y tipos de los lotes
+    (encabezado y esquema aunque no haya filas).
+    """
+    columnas, eliminadas = columnas_exportables(vacio.columns)
+    ESCRITORES[formato]((lote[columnas] for lote in lotes), vacio[columnas], destino)
+    return eliminadas
+
+
+def _bytes_temporal(escribir):
+    # El archivo crece en disco; solo el resultado terminado se lee a memoria
+    with tempfile.TemporaryFile() as destino:
+        escribir(destino)
+        destino.seek(0)
+        return destino.read()
+
+
+def generar(df, formato, filas=None):
+    """Bytes del archivo exportado (para st.download_button)"""
+    return _bytes_temporal(lambda destino: exportar(df, formato, destino, filas))
+
+
+def generar_lotes(lotes, vacio, formato):
+    """Bytes del archivo exportado a partir de lotes (ver exportar_lotes)"""
+    return _bytes_temporal(lambda destino: exportar_lotes(lotes, vacio, formato, destino))
@@ -0,0 +1,176 @@
+"""
+Índice para los filtros del sidebar.
+
+Se construye una vez por carga de datos: cada columna filtrable se guarda
+como un código entero por fila (valor normalizado con str().strip()) junto
+con la lista ordenada de opciones. Una combinación de filtros se resuelve
+con una tabla de consulta por columna (OR dentro de la columna) y un AND
+entre columnas, sin volver a convertir textos en cada rerun.
+
+Una selección vacía equivale a "todas las opciones" (no filtra); así las
+columnas con muchas opciones (puestos) no necesitan enviar la lista
+completa al navegador. Para ellas se buscan opciones por prefijo o texto
+contenido sobre una lista ordenada precalculada.
+"""
+import bisect
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+
+def indexar_columna(serie):
+    """Devuelve (opciones ordenadas, código por fila); -1 marca vacíos"""
+    codigos_crudos, unicos = pd.factorize(serie, sort=False)
+    # Solo valores presentes: en columnas Arrow de diccionario factorize devuelve
+    # todo el diccionario, aunque algún valor no aparezca en las filas
+    presentes = np.zeros(len(unicos), dtype=bool)
+    presentes[codigos_crudos[codigos_crudos >= 0]] = True
+    textos = [str(v).strip() for v in unicos]
+    opciones = sorted({t for t, p in zip(textos, presentes) if p and t != ''}, key=lambda x: str(x))
+    posicion = {opcion: i for i, opcion in enumerate(opciones)}
+
+    # Valores crudos distintos que quedan iguales al normalizar comparten código;
+    # el último elemento atiende a los NaN (código crudo -1)
+    remapeo = np.array([posicion.get(t, -1) for t in textos] + [-1], dtype=np.int32)
+    return opciones, remapeo[codigos_crudos]
+
+
+def contar_valores(serie):
+    """Conteo por valor normalizado sin vacíos, de mayor a menor (sin convertir cada fila a texto)"""
+    opciones, codigos = indexar_columna(serie)
+    conteo = pd.Series(
+        np.bincount(codigos[codigos >= 0], minlength=len(opciones)), index=opciones, dtype=np.int64
+    )
+    return conteo[conteo > 0].sort_values(ascending=False, kind="stable")
+
+
+def construir_indice(df, columnas):
+    """Índice de todas las columnas filtrables que existan en df"""
+    indice = {}
+    for col in columnas:
+        if col in df.columns:
+            opciones, codigos = indexar_columna(df[col])
+            conteos = np.bincount(codigos[codigos >= 0], minlength=len(opciones))
+            indice[col] = entrada_indice(opciones, conteos, codigos)
+    return indice
+
+
+def entrada_indice(opciones, conteos, codigos=None):
+    """
+    Entrada del índice de una columna.
+
+    `codigos` (código por fila) es opcional: el backend SQL solo necesita
+    las opciones y sus conteos.
+    """
+    # Búsqueda sin distinguir mayúsculas: claves en minúsculas ordenadas
+    orden = sorted(range(len(opciones)), key=lambda i: opciones[i].lower())
+    return {
+        "opciones": opciones,
+        "posicion": {opcion: i for i, opcion in enumerate(opciones)},
+        "codigos": codigos,
+        "conteos": np.asarray(conteos, dtype=np.int64),
+        "claves": [opciones[i].lower() for i in orden],
+        "orden_claves": orden,
+    }
+
+
+def sugerencias(entrada, limite=50):
+    """Las `limite` opciones con más registros (mayor a menor)"""
+    conteos = entrada["conteos"]
+    orden = np.argsort(-conteos, kind="stable")[:limite]
+    return [entrada["opciones"][i] for i in orden if conteos[i] > 0]
+
+
+def buscar_opciones(entrada, texto, limite=50):
+    """
+    Opciones que coinciden con `texto` (sin distinguir mayúsculas).
+
+    Primero las que empiezan por el texto (búsqueda binaria en las claves
+    ordenadas) y después las que solo lo contienen. Sin texto, devuelve
+    las sugerencias por cantidad de registros.
+    """
+    texto = texto.strip().lower()
+    if not texto:
+        return sugerencias(entrada, limite)
+    claves, orden = entrada["claves"], entrada["orden_claves"]
+
+    inicio = bisect.bisect_left(claves, texto)
+    fin = bisect.bisect_left(claves, texto + "\U0010ffff")
+    encontradas = list(range(inicio, min(fin, inicio + limite)))
+    if len(encontradas) < limite:
+        for i, clave in enumerate(claves):
+            if (i < inicio or i >= fin) and texto in clave:
+                encontradas.append(i)
+                if len(encontradas) == limite:
+                    break
+    return [entrada["opciones"][orden[i]] for i in encontradas]
+
+
+def seleccion_columna(entrada, valores):
+    """
+    Posiciones elegidas de una columna, ordenadas (clave estable del filtro).
+
+    Devuelve None si la selección incluye todas las opciones (no filtra).
+    """
+    seleccion = tuple(sorted({entrada["posicion"][v] for v in valores if v in entrada["posicion"]}))
+    if len(seleccion) == len(entrada["opciones"]):
+        return None
+    return seleccion
+
+
+def mascara_columna(entrada, valores):
+    """
+    Máscara de las filas cuyo valor está en `valores`.
+
+    Devuelve None si la selección incluye todas las opciones (no filtra).
+    """
+    seleccion = seleccion_columna(entrada, valores)
+    if seleccion is None:
+        return None
+    # Tabla de consulta: una posición por opción más la de vacíos (-1, siempre False)
+    tabla = np.zeros(len(entrada["opciones"]) + 1, dtype=bool)
+    tabla[list(seleccion)] = True
+    return tabla[entrada["codigos"]]
+
+
+def seleccionar_filas(indice, filtros, obtener_mascara=None):
+    """
+    Combina los filtros en una sola máscara.
+
+    `obtener_mascara(columna, entrada, valores)` reemplaza a mascara_columna
+    (p. ej. para reutilizar máscaras guardadas); las máscaras no se modifican.
+    Devuelve (máscara o None si nada filtra, [(columna, registros tras el filtro)]).
+    """
+    mascara = None
+    conteos = []
+    for columna, valores in filtros.items():
+        if columna not in indice or not valores:
+            continue
+        if obtener_mascara is None:
+            mascara_col = mascara_columna(indice[columna], valores)
+        else:
+            mascara_col = obtener_mascara(columna, indice[columna], valores)
+        if mascara_col is None:
+            continue
+        mascara = mascara_col if mascara is None else mascara & mascara_col
+        conteos.append((columna, int(np.count_nonzero(mascara))))
+    return mascara, conteos
+
+
+def firma_filtros(indice, filtros):
+    """
+    Identificador estable de una combinación de filtros.
+
+    Solo cuentan las columnas que realmente filtran (no las que tienen todas
+    las opciones seleccionadas) y el orden de la selección no importa.
+    """
+    partes = []
+    for columna in sorted(filtros):
+        if columna not in indice or not filtros[columna]:
+            continue
+        seleccion = sorted({v for v in filtros[columna] if v in indice[columna]["posicion"]})
+        if len(seleccion) < len(indice[columna]["opciones"]):
+            partes.append([columna, seleccion])
+    return hashlib.sha1(json.dumps(partes, ensure_ascii=False).encode('utf-8')).hexdigest()
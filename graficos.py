@@ -0,0 +1,254 @@
+"""
+Dibujo de los gráficos de conteo del dashboard.
+
+Hay dos motores:
+- matplotlib: se dibuja con Figure (sin el estado global de pyplot) y se
+  devuelve el PNG; la figura se libera en cuanto se guarda.
+- Vega-Lite: se arma la especificación con los conteos agregados y el
+  navegador dibuja el gráfico (solo viajan los conteos).
+"""
+import io
+
+import matplotlib
+from matplotlib.figure import Figure
+
+MOTOR_MATPLOTLIB = "matplotlib"
+MOTOR_VEGA = "vega-lite"
+
+# Paleta de cada tipo de gráfico (igual en ambos motores)
+PALETAS = {
+    'bar': 'Set3',
+    'barh': 'Set2',
+    'pie': 'Pastel1',
+    'line': 'Set1',
+    'sunburst': 'tab20',
+}
+
+# Largo máximo de las etiquetas del sunburst y porción mínima para rotular un sector
+LARGO_ETIQUETA = 22
+PORCION_ETIQUETA = 0.04
+
+
+def _colores(nombre, cantidad):
+    return matplotlib.colormaps[nombre](range(cantidad))
+
+
+def figura_a_png(fig, dpi=100):
+    """Guarda la figura como PNG y libera su memoria"""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi)
+    fig.clear()
+    return buffer.getvalue()
+
+
+def figura_conteo(conteo, titulo, tipo='bar'):
+    """Figura de matplotlib para una Serie de conteos (índice = etiquetas)"""
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    etiquetas = conteo.index.astype(str)
+
+    if tipo == 'bar':
+        bars = ax.bar(etiquetas, conteo.values, color=_colores(PALETAS['bar'], len(conteo)))
+        ax.set_ylabel('Cantidad')
+
+        # Agregar valores en barras
+        for bar, valor in zip(bars, conteo.values):
+            height = bar.get_height()
+            ax.text(bar.get_x() + bar.get_width()/2, height + 0.5,
+                    str(valor), ha='center', va='bottom')
+
+        ax.tick_params(axis='x', labelrotation=45)
+        for etiqueta in ax.get_xticklabels():
+            etiqueta.set_horizontalalignment('right')
+
+    elif tipo == 'barh':
+        ax.barh(range(len(conteo)), conteo.values, color=_colores(PALETAS['barh'], len(conteo)))
+        ax.set_yticks(range(len(conteo)))
+        ax.set_yticklabels(etiquetas)
+        ax.set_xlabel('Cantidad')
+
+        # Agregar valores en barras
+        for i, valor in enumerate(conteo.values):
+            ax.text(valor + 0.5, i, str(valor), va='center')
+
+    elif tipo == 'line':
+        color = _colores(PALETAS['line'], 1)[0]
+        ax.plot(etiquetas, conteo.values, marker='o', color=color)
+        ax.set_ylabel('Cantidad')
+        ax.set_ylim(bottom=0)
+
+        # Agregar valores en los puntos
+        for etiqueta, valor in zip(etiquetas, conteo.values):
+            ax.annotate(str(valor), (etiqueta, valor), textcoords='offset points',
+                        xytext=(0, 6), ha='center')
+
+    elif tipo == 'pie':
+        ax.pie(conteo.values,
+               labels=etiquetas,
+               colors=_colores(PALETAS['pie'], len(conteo)),
+               autopct='%1.1f%%',
+               startangle=90)
+        ax.axis('equal')
+
+    ax.set_title(titulo)
+    fig.tight_layout()
+    return fig
+
+
+def figura_cumpleanos(cumple_mes, titulo):
+    """Barras de cumpleaños por mes (índice = nombre del mes)"""
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
+    bars = ax.bar(cumple_mes.index.astype(str), cumple_mes.values,
+                  color=_colores('Pastel2', len(cumple_mes)))
+    ax.set_title(titulo)
+    ax.set_xlabel('Mes')
+    ax.set_ylabel('Cantidad de Cumpleaños')
+    ax.tick_params(axis='x', labelrotation=45)
+    for etiqueta in ax.get_xticklabels():
+        etiqueta.set_horizontalalignment('right')
+
+    # Agregar valores
+    for bar, valor in zip(bars, cumple_mes.values):
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width()/2, height + 0.5,
+                str(valor), ha='center', va='bottom')
+
+    fig.tight_layout()
+    return fig
+
+
+def _etiqueta_sector(nombre, cantidad, total):
+    if not nombre or total == 0 or cantidad / total < PORCION_ETIQUETA:
+        return ""
+    nombre = str(nombre)
+    return nombre if len(nombre) <= LARGO_ETIQUETA else nombre[:LARGO_ETIQUETA - 1] + "…"
+
+
+def _ordenar_anillos(anillos):
+    """Filas del anillo interior y del exterior en el orden de sus padres"""
+    interior = anillos[anillos["anillo"] == 1].sort_values("orden", kind="stable")
+    exterior = anillos[anillos["anillo"] == 2].sort_values("orden", kind="stable")
+    return interior, exterior
+
+
+def figura_sunburst(anillos, titulo):
+    """Sunburst de dos anillos (hijos y nietos) a partir de jerarquia.anillos"""
+    fig = Figure(figsize=(9, 9))
+    ax = fig.subplots()
+    interior, exterior = _ordenar_anillos(anillos)
+    total = interior["headcount"].sum()
+    colores = _colores(PALETAS['sunburst'], len(interior))
+    color_padre = dict(zip(interior["padre"], colores))
+    borde = dict(width=0.35, edgecolor='white')
+
+    ax.pie(interior["headcount"], radius=0.65, colors=colores, wedgeprops=borde,
+           labels=[_etiqueta_sector(n, c, total) for n, c in zip(interior["nombre"], interior["headcount"])],
+           labeldistance=0.72, startangle=90, counterclock=False, textprops={'fontsize': 9, 'ha': 'center'})
+    # El anillo exterior usa el color del padre, más claro
+    colores_ext = [(*color_padre[p][:3], 0.55 if n else 0.2) for n, p in zip(exterior["nombre"], exterior["padre"])]
+    ax.pie(exterior["headcount"], radius=1.0, colors=colores_ext, wedgeprops=borde,
+           labels=[_etiqueta_sector(n, c, total) for n, c in zip(exterior["nombre"], exterior["headcount"])],
+           labeldistance=1.04, startangle=90, counterclock=False, textprops={'fontsize': 8})
+    ax.set_title(titulo)
+    ax.set_aspect('equal')
+    fig.tight_layout()
+    return fig
+
+
+def especificacion_sunburst(anillos, titulo):
+    """Especificación Vega-Lite del sunburst de dos anillos (jerarquia.anillos)"""
+    interior, exterior = _ordenar_anillos(anillos)
+    datos = []
+    for filas in (interior, exterior):
+        for posicion, fila in enumerate(filas.itertuples(index=False)):
+            datos.append({"anillo": int(fila.anillo), "nombre": str(fila.nombre), "padre": str(fila.padre),
+                          "headcount": int(fila.headcount), "posicion": posicion})
+
+    def capa(anillo, radio_interior, radio_exterior, opacidad):
+        return {
+            "transform": [{"filter": f"datum.anillo == {anillo}"}],
+            "mark": {"type": "arc", "innerRadius": radio_interior, "outerRadius": radio_exterior,
+                     "stroke": "white", "opacity": opacidad, "tooltip": True},
+            "encoding": {
+                "theta": {"field": "headcount", "type": "quantitative", "stack": True},
+                "order": {"field": "posicion", "type": "quantitative"},
+                "color": {"field": "padre", "type": "nominal", "sort": None, "legend": None,
+                          "scale": {"scheme": PALETAS['sunburst'].lower()}},
+                "tooltip": [{"field": "padre", "title": "Nivel"}, {"field": "nombre", "title": "Subnivel"},
+                            {"field": "headcount", "title": "Headcount"}],
+            },
+        }
+
+    return {
+        "title": titulo,
+        "data": {"values": datos},
+        "height": 420,
+        "layer": [capa(1, 40, 125, 1.0), capa(2, 130, 200, 0.6)],
+        "view": {"stroke": None},
+    }
+
+
+def especificacion_vega(conteo, titulo, tipo='bar', paleta=None):
+    """
+    Especificación Vega-Lite con los conteos (se respeta el orden de la Serie).
+
+    Los valores pasan sin truncar (promedios, porcentajes); el redondeo para
+    mostrar se hace antes de llamar, igual que con matplotlib.
+    """
+    datos = [{"valor": str(valor), "cantidad": float(cantidad)} for valor, cantidad in conteo.items()]
+    esquema = (paleta or PALETAS.get(tipo, 'Set3')).lower()
+    color = {"field": "valor", "type": "nominal", "legend": None, "sort": None,
+             "scale": {"scheme": esquema}}
+
+    if tipo == 'pie':
+        color["legend"] = {"title": None}
+        return {
+            "title": titulo,
+            "data": {"values": datos},
+            "mark": {"type": "arc", "tooltip": True},
+            "encoding": {
+                "theta": {"field": "cantidad", "type": "quantitative", "stack": True},
+                "color": color,
+                "order": {"field": "cantidad", "sort": "descending"},
+            },
+        }
+
+    if tipo == 'line':
+        return {
+            "title": titulo,
+            "data": {"values": datos},
+            "encoding": {
+                "x": {"field": "valor", "type": "ordinal", "sort": None, "title": None},
+                "y": {"field": "cantidad", "type": "quantitative", "title": "Cantidad"},
+            },
+            "layer": [
+                {"mark": {"type": "line", "point": True, "tooltip": True}},
+                {"mark": {"type": "text", "baseline": "bottom", "dy": -6},
+                 "encoding": {"text": {"field": "cantidad", "type": "quantitative"}}},
+            ],
+        }
+
+    if tipo == 'barh':
+        posicion = {
+            "y": {"field": "valor", "type": "nominal", "sort": None, "title": None},
+            "x": {"field": "cantidad", "type": "quantitative", "title": "Cantidad"},
+        }
+        texto = {"type": "text", "align": "left", "dx": 3}
+    else:
+        posicion = {
+            "x": {"field": "valor", "type": "nominal", "sort": None, "title": None,
+                  "axis": {"labelAngle": -45}},
+            "y": {"field": "cantidad", "type": "quantitative", "title": "Cantidad"},
+        }
+        texto = {"type": "text", "baseline": "bottom", "dy": -2}
+
+    return {
+        "title": titulo,
+        "data": {"values": datos},
+        "encoding": posicion,
+        "layer": [
+            {"mark": {"type": "bar", "tooltip": True}, "encoding": {"color": color}},
+            {"mark": texto, "encoding": {"text": {"field": "cantidad", "type": "quantitative"}}},
+        ],
+    }
@@ -0,0 +1,64 @@
+"""
+Ingesta de exports de activos al formato columnar (Parquet).
+
+Uso:
+    python ingesta.py activos_feb_24.csv [otros.csv ...] [--destino carpeta]
+    python ingesta.py activos_mar_24.csv --almacen [--destino snapshots]
+    python ingesta.py "exports/*.csv" --almacen [--procesos 4]
+
+Con --almacen cada periodo del export se agrega como partición del almacén
+de snapshots; los periodos que ya estaban no se vuelven a procesar. Varios
+exports (una carpeta o un patrón, p. ej. uno por país) se procesan en
+paralelo y se unen por periodo.
+"""
+import argparse
+import os
+import time
+
+import almacen
+import procesamiento
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convierte exports CSV de activos a Parquet")
+    parser.add_argument("archivos", nargs="+", help="CSV de activos a convertir")
+    parser.add_argument("--destino", help="Carpeta de salida (por defecto, junto al CSV)")
+    parser.add_argument("--almacen", action="store_true",
+                        help=f"Agregar al almacén por periodo (por defecto en '{almacen.DIRECTORIO_ALMACEN}')")
+    parser.add_argument("--reemplazar", action="store_true",
+                        help="Con --almacen, reescribir también los periodos existentes")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count(),
+                        help="Con --almacen, exports procesados en paralelo")
+    args = parser.parse_args(argv)
+
+    if args.almacen:
+        directorio = args.destino or almacen.DIRECTORIO_ALMACEN
+        rutas = [ruta for patron in args.archivos for ruta in almacen.expandir_exports(patron)]
+        inicio = time.perf_counter()
+        informe = almacen.ingresar_lote(rutas, directorio, reemplazar=args.reemplazar, procesos=args.procesos)
+        for ruta_csv, resultado in informe.items():
+            if resultado["error"]:
+                print(f"⚠️ {ruta_csv} omitido: {resultado['error']}")
+                continue
+            print(f"✅ {ruta_csv}: {resultado['filas']} registros ({resultado['segundos']:.2f} s)")
+            for periodo, filas, estado in resultado["periodos"]:
+                print(f"   • {periodo or '—'}: {filas} registros ({estado})")
+        print(f"📦 {len(rutas)} exports → {directorio} ({time.perf_counter() - inicio:.2f} s)")
+        return
+
+    if args.destino:
+        os.makedirs(args.destino, exist_ok=True)
+
+    for ruta_csv in args.archivos:
+        inicio = time.perf_counter()
+        destino = procesamiento.convertir_a_columnar(
+            ruta_csv, procesamiento.ruta_columnar(ruta_csv, args.destino)
+        )
+        duracion = time.perf_counter() - inicio
+        tam_csv = os.path.getsize(ruta_csv) / 1e6
+        tam_parquet = os.path.getsize(destino) / 1e6
+        print(f"✅ {ruta_csv} → {destino} ({tam_csv:.1f} MB → {tam_parquet:.1f} MB, {duracion:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Árbol de headcount UNIDAD DE NEGOCIO → gerencia → área → puesto.
+
+Primero se arma la tabla de hojas: una fila por combinación de los cuatro
+niveles con sus sumas. En memoria sale del cubo de la estructura, que se
+arma una vez por dataset (niveles × dimensiones de los filtros, como el
+cubo de los gráficos): cada combinación de filtros solo suma sus celdas.
+En SQL es un GROUP BY. Después se acumula nivel por nivel sobre esa
+tabla, que es mucho más chica que los datos. Cada nodo guarda headcount, mujeres, hombres y
+edad promedio, y los hijos de cada nodo quedan en una lista ordenada de
+mayor a menor: abrir un nodo es una consulta de O(hijos).
+
+Los nodos se identifican por su ruta: () es la raíz, ("CARIBE",) una
+unidad, ("CARIBE", "GERENCIA COMERCIAL") una gerencia, etc.
+"""
+import numpy as np
+import pandas as pd
+
+import agregados
+import filtros
+
+NIVELES = ["UNIDAD DE NEGOCIO", "gerencia", "area", "POSICION / PUESTO / CARGO"]
+COLUMNA_GENERO = "GENERO (F/M)"
+COLUMNA_EDAD = "EDAD"
+SIN_DATO = "(sin dato)"
+OTROS = "Otros"
+RAIZ = ()
+
+METRICAS = ["headcount", "mujeres", "hombres", "suma_edad", "con_edad"]
+
+
+def _etiquetas(opciones, codigos):
+    """Categórica con la opción de cada código; vacíos (-1) = SIN_DATO"""
+    categorias = opciones + ([SIN_DATO] if SIN_DATO not in opciones else [])
+    codigos = np.where(codigos < 0, categorias.index(SIN_DATO), codigos)
+    return pd.Categorical.from_codes(codigos, categories=categorias)
+
+
+def _metricas(df):
+    """Métricas de cada fila (headcount, mujeres, hombres, suma y cantidad de edades)"""
+    total = len(df)
+    datos = {"headcount": np.ones(total, dtype=np.int64)}
+
+    if COLUMNA_GENERO in df.columns:
+        opciones, codigos = filtros.indexar_columna(df[COLUMNA_GENERO])
+        for nombre, letra in [("mujeres", "F"), ("hombres", "M")]:
+            tabla = np.array([o.upper() == letra for o in opciones] + [False])
+            datos[nombre] = tabla[codigos].astype(np.int64)
+    else:
+        datos["mujeres"] = datos["hombres"] = np.zeros(total, dtype=np.int64)
+
+    if COLUMNA_EDAD in df.columns:
+        edad = pd.to_numeric(df[COLUMNA_EDAD], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        validas = ~np.isnan(edad)
+        datos["suma_edad"] = np.where(validas, edad, 0.0)
+        datos["con_edad"] = validas.astype(np.int64)
+    else:
+        datos["suma_edad"] = np.zeros(total)
+        datos["con_edad"] = np.zeros(total, dtype=np.int64)
+    return datos
+
+
+def cubo_estructura(df, indice, dimensiones, niveles=NIVELES):
+    """
+    Sumas por combinación de niveles y dimensiones de filtro (un groupby sobre las filas).
+
+    Las columnas del cubo son códigos del índice de filtros (los niveles que
+    no están en el índice se indexan aquí), así los filtros se aplican a las
+    celdas con agregados.filtrar_cubo. Devuelve {"niveles", "opciones":
+    {nivel: opciones}, "celdas"}.
+    """
+    niveles = [nivel for nivel in niveles if nivel in df.columns]
+    opciones, datos = {}, {}
+    for nivel in niveles:
+        if nivel in indice:
+            opciones[nivel], datos[nivel] = indice[nivel]["opciones"], indice[nivel]["codigos"]
+        else:
+            opciones[nivel], datos[nivel] = filtros.indexar_columna(df[nivel])
+    for dimension in dimensiones:
+        if dimension in indice and dimension not in datos:
+            datos[dimension] = indice[dimension]["codigos"]
+    columnas = list(datos)
+    datos.update(_metricas(df))
+    tabla = pd.DataFrame(datos)
+    celdas = tabla[METRICAS].sum().to_frame().T if not columnas else (
+        tabla.groupby(columnas, sort=False)[METRICAS].sum().reset_index()
+    )
+    return {"niveles": niveles, "opciones": opciones, "celdas": celdas}
+
+
+def hojas(cubo, indice, filtros_aplicados):
+    """Tabla de hojas (niveles con sus nombres) de las celdas del cubo que cumplen los filtros"""
+    celdas = agregados.filtrar_cubo(cubo["celdas"], indice, filtros_aplicados)
+    niveles = cubo["niveles"]
+    if not niveles:
+        return celdas[METRICAS].sum().to_frame().T
+    datos = {nivel: _etiquetas(cubo["opciones"][nivel], celdas[nivel].to_numpy()) for nivel in niveles}
+    datos.update({metrica: celdas[metrica].to_numpy() for metrica in METRICAS})
+    return pd.DataFrame(datos).groupby(niveles, sort=False, observed=True)[METRICAS].sum().reset_index()
+
+
+def _nodo(valores):
+    headcount, mujeres, hombres, suma_edad, con_edad = valores
+    return {
+        "headcount": int(headcount),
+        "mujeres": int(mujeres),
+        "hombres": int(hombres),
+        "edad_promedio": float(suma_edad / con_edad) if con_edad else None,
+    }
+
+
+def construir_arbol(tabla_hojas, niveles=NIVELES):
+    """
+    Acumula la tabla de hojas en todos los niveles.
+
+    Devuelve {"niveles", "nodos": {ruta: métricas}, "hijos": {ruta: [rutas hijas]}}.
+    """
+    niveles = [nivel for nivel in niveles if nivel in tabla_hojas.columns]
+    nodos = {RAIZ: _nodo(tabla_hojas[METRICAS].sum().to_numpy())}
+    hijos = {}
+    for profundidad in range(1, len(niveles) + 1):
+        grupo = tabla_hojas.groupby(niveles[:profundidad], sort=False, observed=True)[METRICAS].sum()
+        grupo = grupo.sort_values("headcount", ascending=False, kind="stable")
+        for ruta, valores in zip(grupo.index, grupo.to_numpy()):
+            ruta = tuple(str(v) for v in ruta) if isinstance(ruta, tuple) else (str(ruta),)
+            nodos[ruta] = _nodo(valores)
+            hijos.setdefault(ruta[:-1], []).append(ruta)
+    return {"niveles": niveles, "nodos": nodos, "hijos": hijos}
+
+
+def hijos(arbol, ruta=RAIZ):
+    """Rutas hijas de un nodo, de mayor a menor headcount"""
+    return arbol["hijos"].get(tuple(ruta), [])
+
+
+def tabla_hijos(arbol, ruta=RAIZ):
+    """Hijos de un nodo con sus métricas (para la tabla navegable)"""
+    padre = arbol["nodos"][tuple(ruta)]["headcount"] or 1
+    filas = []
+    for hijo in hijos(arbol, ruta):
+        nodo = arbol["nodos"][hijo]
+        filas.append({
+            "nombre": hijo[-1],
+            "headcount": nodo["headcount"],
+            "% del total": round(nodo["headcount"] * 100 / padre, 1),
+            "% mujeres": round(nodo["mujeres"] * 100 / nodo["headcount"], 1) if nodo["headcount"] else None,
+            "edad promedio": None if nodo["edad_promedio"] is None else round(nodo["edad_promedio"], 1),
+            "subniveles": len(hijos(arbol, hijo)),
+        })
+    return pd.DataFrame(filas, columns=["nombre", "headcount", "% del total", "% mujeres",
+                                        "edad promedio", "subniveles"])
+
+
+def anillos(arbol, ruta=RAIZ, max_hijos=12, max_nietos=8):
+    """
+    Datos del sunburst de un nodo: anillo 1 = hijos, anillo 2 = nietos.
+
+    Los hijos y nietos que no entran se agrupan en "Otros". Devuelve un
+    DataFrame con anillo, nombre, padre, headcount y orden (las filas del
+    anillo 2 siguen el orden de sus padres, así los sectores quedan alineados).
+    """
+    filas = []
+    lista = hijos(arbol, ruta)
+    visibles, resto = lista[:max_hijos], lista[max_hijos:]
+    for i, hijo in enumerate(visibles):
+        filas.append({"anillo": 1, "nombre": hijo[-1], "padre": hijo[-1],
+                      "headcount": arbol["nodos"][hijo]["headcount"], "orden": i})
+        nietos = hijos(arbol, hijo)
+        if not nietos:
+            # Sin subniveles: el sector se repite en el anillo exterior para no dejar huecos
+            filas.append({"anillo": 2, "nombre": "", "padre": hijo[-1],
+                          "headcount": arbol["nodos"][hijo]["headcount"], "orden": i})
+            continue
+        for nieto in nietos[:max_nietos]:
+            filas.append({"anillo": 2, "nombre": nieto[-1], "padre": hijo[-1],
+                          "headcount": arbol["nodos"][nieto]["headcount"], "orden": i})
+        if len(nietos) > max_nietos:
+            filas.append({"anillo": 2, "nombre": OTROS, "padre": hijo[-1],
+                          "headcount": sum(arbol["nodos"][n]["headcount"] for n in nietos[max_nietos:]),
+                          "orden": i})
+    if resto:
+        otros = sum(arbol["nodos"][h]["headcount"] for h in resto)
+        for anillo in (1, 2):
+            filas.append({"anillo": anillo, "nombre": OTROS if anillo == 1 else "", "padre": OTROS,
+                          "headcount": otros, "orden": len(visibles)})
+    return pd.DataFrame(filas, columns=["anillo", "nombre", "padre", "headcount", "orden"])
@@ -0,0 +1,94 @@
+"""
+Movimientos de personal entre periodos consecutivos.
+
+Las personas se enlazan por la clave anónima ID_EMPLEADO (ver
+procesamiento.clave_empleado). Cada par de periodos consecutivos se
+resuelve con un solo merge externo sobre la clave: un rango de N periodos
+cuesta N-1 merges y todas las comparaciones son vectorizadas.
+"""
+import numpy as np
+import pandas as pd
+
+from procesamiento import COLUMNA_CLAVE
+
+COLUMNA_PERIODO = "periodo"
+COLUMNA_TIPO = "tipo"
+
+INGRESO = "Ingreso"
+SALIDA = "Salida"
+
+# Cambios que se detectan en quienes siguen: columna -> tipo de movimiento
+CAMBIOS = {
+    "UNIDAD DE NEGOCIO": "Cambio de unidad",
+    "gerencia": "Cambio de gerencia",
+    "area": "Traslado de área",
+    "POSICION / PUESTO / CARGO": "Cambio de puesto",
+}
+
+TIPOS_MOVIMIENTO = [INGRESO, SALIDA, *CAMBIOS.values()]
+
+
+def _por_persona(df, columnas):
+    """Una fila por clave (se descartan claves vacías y repetidas)"""
+    personas = df.loc[df[COLUMNA_CLAVE].notna(), [COLUMNA_CLAVE, *columnas]]
+    return personas.drop_duplicates(COLUMNA_CLAVE)
+
+
+def _textos(serie):
+    # Las categóricas de cada periodo tienen categorías distintas: se comparan como texto
+    return serie.astype("string").str.strip().fillna("").to_numpy()
+
+
+def diferencias(anterior, actual, columnas=None):
+    """
+    Movimientos entre dos snapshots.
+
+    Devuelve un DataFrame con una fila por movimiento: la clave, el tipo y
+    los valores anterior/actual de cada columna comparada.
+    """
+    columnas = [col for col in (columnas or CAMBIOS) if col in anterior.columns and col in actual.columns]
+    union = _por_persona(anterior, columnas).merge(
+        _por_persona(actual, columnas),
+        on=COLUMNA_CLAVE, how="outer", suffixes=("_anterior", "_actual"), indicator=True
+    )
+    lado = union.pop("_merge").to_numpy()
+
+    partes = [
+        union[lado == "right_only"].assign(**{COLUMNA_TIPO: INGRESO}),
+        union[lado == "left_only"].assign(**{COLUMNA_TIPO: SALIDA}),
+    ]
+    siguen = union[lado == "both"]
+    for col in columnas:
+        cambio = _textos(siguen[f"{col}_anterior"]) != _textos(siguen[f"{col}_actual"])
+        partes.append(siguen[cambio].assign(**{COLUMNA_TIPO: CAMBIOS.get(col, f"Cambio de {col}")}))
+    return pd.concat(partes, ignore_index=True)
+
+
+def movimientos_periodos(df, columnas=None):
+    """
+    Movimientos de cada periodo respecto al anterior disponible.
+
+    Devuelve los movimientos de todos los pares con la columna `periodo`
+    (el periodo de llegada); vacío si hay menos de dos periodos o no hay clave.
+    """
+    if COLUMNA_CLAVE not in df.columns or COLUMNA_PERIODO not in df.columns:
+        return pd.DataFrame(columns=[COLUMNA_PERIODO, COLUMNA_TIPO])
+    periodos = df[COLUMNA_PERIODO].astype(str)
+    grupos = {periodo: df[(periodos == periodo).to_numpy()] for periodo in sorted(periodos.unique())}
+    nombres = list(grupos)
+    partes = [
+        diferencias(grupos[previo], grupos[periodo], columnas).assign(**{COLUMNA_PERIODO: periodo})
+        for previo, periodo in zip(nombres, nombres[1:])
+    ]
+    if not partes:
+        return pd.DataFrame(columns=[COLUMNA_PERIODO, COLUMNA_TIPO])
+    return pd.concat(partes, ignore_index=True)
+
+
+def resumen(movimientos):
+    """Cantidad de movimientos por periodo (filas) y tipo (columnas)"""
+    if movimientos.empty:
+        return pd.DataFrame(columns=TIPOS_MOVIMIENTO)
+    tabla = pd.crosstab(movimientos[COLUMNA_PERIODO], movimientos[COLUMNA_TIPO])
+    orden = [tipo for tipo in TIPOS_MOVIMIENTO if tipo in tabla.columns]
+    return tabla.reindex(columns=orden + [c for c in tabla.columns if c not in orden]).astype(np.int64)
@@ -0,0 +1,192 @@
+"""
+Medición por etapas de cada rerun del dashboard.
+
+El dashboard abre un cronómetro al empezar y lo cierra al final de cada
+sección numerada (1 carga, 2 procesamiento, 3-4 filtros, 5-6 gráficos,
+7 datos); cada etapa dura desde la marca anterior. Por etapa se guardan
+el tiempo, los registros de entrada y salida, la memoria residente y el
+pico de memoria del proceso. Con ACTIVOS_PERFIL=1 cada rerun se agrega
+como una línea JSON al log (perfil_dashboard.jsonl junto a este módulo u
+otra ruta en ACTIVOS_PERFIL_LOG), del que se sacan las latencias p50/p95
+por etapa. Al pasar de MAX_MB_LOG el log se rota (queda el anterior como
+.1) y el panel lee solo las últimas líneas.
+
+La memoria es del proceso completo: con varias sesiones en el mismo
+servidor incluye lo que hagan las demás.
+
+Uso:
+    python perfil.py [perfil_dashboard.jsonl]
+"""
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # no existe en Windows
+    resource = None
+
+LOG_PERFIL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perfil_dashboard.jsonl")
+# El registro de reruns es opcional: escribe en disco en cada rerun
+VARIABLE_PERFIL = "ACTIVOS_PERFIL"
+VARIABLE_LOG = "ACTIVOS_PERFIL_LOG"
+VARIABLE_ADMIN = "ACTIVOS_ADMIN"
+MAX_MB_LOG = 10
+PERCENTILES = (0.5, 0.95)
+
+_bloqueo_log = threading.Lock()
+
+
+def ruta_log():
+    """Ruta del log: ACTIVOS_PERFIL_LOG o perfil_dashboard.jsonl junto al módulo"""
+    return os.environ.get(VARIABLE_LOG) or LOG_PERFIL
+
+
+def registro_activo():
+    """Indica si los reruns se registran en el log (ACTIVOS_PERFIL=1)"""
+    return os.environ.get(VARIABLE_PERFIL) == "1"
+
+
+def modo_admin(administrador=False):
+    """Panel de perfil visible con ACTIVOS_ADMIN=1 o para administradores (ver accesos.py)"""
+    return administrador or os.environ.get(VARIABLE_ADMIN) == "1"
+
+
+def memoria_actual_mb():
+    """Memoria residente del proceso (None si no se puede leer)"""
+    try:
+        with open("/proc/self/statm") as f:
+            paginas = int(f.read().split()[1])
+        return round(paginas * os.sysconf("SC_PAGE_SIZE") / 1e6, 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def memoria_pico_mb():
+    """Memoria residente máxima del proceso (None si no se puede medir)"""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB; macOS, bytes
+    return round(pico / (1e6 if sys.platform == "darwin" else 1e3), 1)
+
+
+def iniciar(**contexto):
+    """Cronómetro de un rerun; `contexto` se guarda en el log (sesión, motor...)"""
+    ahora = time.perf_counter()
+    return {
+        "contexto": contexto,
+        "etapas": [],
+        "inicio": ahora,
+        "ultima": ahora,
+        "pico": memoria_pico_mb(),
+    }
+
+
+def cerrar_etapa(cronometro, nombre, filas_entrada=None, filas_salida=None):
+    """Registra la etapa que termina ahora (desde la marca anterior)"""
+    ahora = time.perf_counter()
+    pico = memoria_pico_mb()
+    cronometro["etapas"].append({
+        "etapa": nombre,
+        "segundos": round(ahora - cronometro["ultima"], 6),
+        "filas_entrada": filas_entrada,
+        "filas_salida": filas_salida,
+        "memoria_mb": memoria_actual_mb(),
+        "pico_mb": pico,
+        # Cuánto subió el pico del proceso durante la etapa
+        "aumento_pico_mb": None if pico is None or cronometro["pico"] is None
+        else round(pico - cronometro["pico"], 1),
+    })
+    cronometro["ultima"] = ahora
+    cronometro["pico"] = pico
+
+
+def tabla_etapas(cronometro):
+    """Etapas del rerun como DataFrame (para el panel)"""
+    return pd.DataFrame(cronometro["etapas"]).set_index("etapa") if cronometro["etapas"] else pd.DataFrame()
+
+
+def registrar(cronometro, ruta=None):
+    """Agrega el rerun al log como una línea JSON (sin `ruta`, solo si el registro está activo)"""
+    if ruta is None:
+        if not registro_activo():
+            return
+        ruta = ruta_log()
+    linea = json.dumps({
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        **cronometro["contexto"],
+        "total_segundos": round(time.perf_counter() - cronometro["inicio"], 6),
+        "etapas": cronometro["etapas"],
+    }, ensure_ascii=False, default=str)
+    with _bloqueo_log:
+        if os.path.exists(ruta) and os.path.getsize(ruta) > MAX_MB_LOG * 1e6:
+            os.replace(ruta, f"{ruta}.1")
+        with open(ruta, 'a', encoding='utf-8') as f:
+            f.write(linea + "\n")
+
+
+def _ultimas_lineas(ruta, n, tam_bloque=1 << 16):
+    """Últimas n líneas del archivo, leyendo bloques desde el final"""
+    with open(ruta, 'rb') as f:
+        fin = f.seek(0, os.SEEK_END)
+        datos = b""
+        while fin > 0 and datos.count(b"\n") <= n:
+            inicio = max(fin - tam_bloque, 0)
+            f.seek(inicio)
+            datos = f.read(fin - inicio) + datos
+            fin = inicio
+    return datos.decode('utf-8', errors='replace').splitlines()[-n:]
+
+
+def leer_log(ruta=None, ultimas=None):
+    """Una fila por etapa de cada rerun registrado (las `ultimas` líneas si se indica)"""
+    ruta = ruta_log() if ruta is None else ruta
+    if not os.path.exists(ruta):
+        return pd.DataFrame()
+    if ultimas is None:
+        with open(ruta, encoding='utf-8') as f:
+            lineas = f.readlines()
+    else:
+        lineas = _ultimas_lineas(ruta, ultimas)
+    filas = []
+    for linea in lineas:
+        try:
+            rerun = json.loads(linea)
+        except json.JSONDecodeError:
+            continue
+        contexto = {k: v for k, v in rerun.items() if k != "etapas"}
+        filas.extend({**contexto, **etapa} for etapa in rerun.get("etapas", []))
+    return pd.DataFrame(filas)
+
+
+def resumen_log(ruta=None, ultimas=None):
+    """Latencia por etapa: reruns, p50, p95 y máximo (segundos)"""
+    registros = leer_log(ruta, ultimas)
+    if registros.empty:
+        return pd.DataFrame(columns=["reruns", "p50", "p95", "max"])
+    por_etapa = registros.groupby("etapa", sort=False)["segundos"]
+    resumen = por_etapa.quantile(list(PERCENTILES)).unstack()
+    resumen.columns = [f"p{int(p * 100)}" for p in PERCENTILES]
+    resumen.insert(0, "reruns", por_etapa.size())
+    resumen["max"] = por_etapa.max()
+    return resumen
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    ruta = argv[0] if argv else ruta_log()
+    resumen = resumen_log(ruta)
+    if resumen.empty:
+        print(f"ℹ️ No hay reruns registrados en '{ruta}'")
+        return
+    print(resumen.round(4).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,639 @@
+"""
+Carga y procesamiento de los datos de activos.
+
+Este módulo no depende de Streamlit para que pueda usarse tanto desde
+Dashboard.py como desde scripts de línea de comandos.
+"""
+import hashlib
+import json
+import os
+import secrets
+import tempfile
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import canonico
+
+# Posibles nombres de columnas sensibles (se eliminan al cargar)
+COLUMNAS_SENSIBLES = [
+    'DOCUMENTO IDENTIDAD / CEDULA / RUT',
+    'DOCUMENTO IDENTIDAD',
+    'CEDULA',
+    'RUT',
+    'DNI',
+    'IDENTIFICACION'
+]
+
+# Posibles nombres de la fecha de nacimiento
+FECHA_NAC_POSIBLES = [
+    'FECHA DE NACIMIENTO (DD/MM/YYYY)',
+    'FECHA_NACIMIENTO',
+    'FECHA NACIMIENTO',
+    'NACIMIENTO',
+    'FECHA_NAC'
+]
+
+# Posibles nombres de la fecha de ingreso
+FECHA_ING_POSIBLES = [
+    'FECHA DE INGRESO (DD/MM/YYYY)',
+    'FECHA_INGRESO',
+    'FECHA INGRESO',
+    'INGRESO',
+    'FECHA_ING'
+]
+
+MESES_ES = {
+    1:"Enero", 2:"Febrero", 3:"Marzo", 4:"Abril", 5:"Mayo", 6:"Junio",
+    7:"Julio", 8:"Agosto", 9:"Septiembre", 10:"Octubre", 11:"Noviembre", 12:"Diciembre"
+}
+
+# Tipos explícitos del export de activos (evita la inferencia de pandas).
+# Las fechas se leen como texto y se convierten en procesar_activos.
+DTYPES_ACTIVOS = {
+    'periodo': 'str',
+    'UNIDAD DE NEGOCIO': 'str',
+    'pais': 'str',
+    'RAZON SOCIAL / PLANILLA': 'str',
+    'gerencia': 'str',
+    'area': 'str',
+    'POSICION / PUESTO / CARGO': 'str',
+    'DOCUMENTO IDENTIDAD / CEDULA / RUT': 'str',
+    'FECHA DE NACIMIENTO (DD/MM/YYYY)': 'str',
+    'GENERO (F/M)': 'str',
+    'FECHA DE INGRESO (DD/MM/YYYY)': 'str',
+    'EDAD': 'float64',
+    'MES_CUMPLE': 'float64',
+    'RANGO_EDAD': 'str',
+    'AÑO': 'float64',
+    'MES_NUM': 'float64',
+    'MES': 'str',
+    'AÑO_NAC': 'Int64',
+    'Mes_ingreso': 'str',
+    'Mes': 'Int64',
+    'Mes_nombre': 'str',
+    'antiguedad_anios': 'float64',
+    'riesgo_rotacion': 'float64',
+}
+
+
+# Dimensiones que se guardan como categóricas canónicas en el formato columnar
+# (ver canonico.py y canonizacion.json)
+COLUMNAS_CATEGORICAS = canonico.COLUMNAS_CANONICAS
+
+# Formatos de fecha reconocidos (se prueban sobre una muestra de cada columna)
+FORMATOS_FECHA = {
+    "AAAA-MM-DD": "%Y-%m-%d",
+    "AAAA-MM-DD hh:mm:ss": "%Y-%m-%d %H:%M:%S",
+    "DD/MM/AAAA": "%d/%m/%Y",
+    "DD-MM-AAAA": "%d-%m-%Y",
+    "AAAA/MM/DD": "%Y/%m/%d",
+    "DD/MM/AA": "%d/%m/%y",
+}
+FORMATO_EXCEL = "Serial de Excel"
+FORMATOS_CANDIDATOS = list(FORMATOS_FECHA.values()) + [FORMATO_EXCEL]
+FORMATO_DATETIME = "datetime"
+TAMANO_MUESTRA_FECHAS = 500
+
+# Rangos de edad y antigüedad (en años)
+BINS_EDAD = [18, 25, 35, 45, 55, 65, 100]
+ETIQUETAS_EDAD = ["18-25", "26-35", "36-45", "46-55", "56-65", "65+"]
+BINS_ANTIGUEDAD = [0, 1, 3, 5, 10, 100]
+ETIQUETAS_ANTIGUEDAD = ["<1", "1-3", "3-5", "5-10", "10+"]
+
+# Fechas de referencia para calcular edad y antigüedad
+REFERENCIA_HOY = "hoy"
+REFERENCIA_PERIODO = "periodo"
+
+# Clave de los metadatos propios dentro del esquema Parquet
+CLAVE_METADATOS = b'activos'
+
+# Versión del formato del snapshot; al cambiarla se regeneran los existentes
+VERSION_SNAPSHOT = 7
+
+# Clave anónima de cada persona (hash con sal del documento de identidad).
+# Permite seguir a una persona entre periodos sin guardar el documento.
+COLUMNA_CLAVE = "ID_EMPLEADO"
+VARIABLE_SAL = "ACTIVOS_SAL"
+RUTA_SAL = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".sal_activos")
+# Ubicación anterior (relativa a la carpeta de trabajo): se adopta si existe
+RUTA_SAL_ANTERIOR = ".sal_activos"
+
+# Columnas propias del almacén que no se muestran en las vistas: la clave
+# anónima (solo para movimientos y tasas) y el archivo de origen de cada fila
+COLUMNAS_INTERNAS = [COLUMNA_CLAVE, "origen"]
+
+# Columnas que usa el dashboard; las derivadas del export (EDAD, MES, Mes_nombre...)
+# se recalculan en el procesamiento, así que no se leen
+COLUMNAS_DASHBOARD = (
+    "periodo",
+    "origen",
+    "UNIDAD DE NEGOCIO",
+    "pais",
+    "RAZON SOCIAL / PLANILLA",
+    "gerencia",
+    "area",
+    "POSICION / PUESTO / CARGO",
+    *FECHA_NAC_POSIBLES,
+    "GENERO (F/M)",
+    *FECHA_ING_POSIBLES,
+    "antiguedad_anios",
+    "riesgo_rotacion",
+)
+
+
+def firma_datos(*partes):
+    """Identificador estable (16 hex) de una combinación de datos y parámetros"""
+    return hashlib.sha1(json.dumps(partes, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+def huella_archivo(ruta):
+    """Devuelve (ruta absoluta, mtime, tamaño) para detectar cambios baratos"""
+    info = os.stat(ruta)
+    return os.path.abspath(ruta), info.st_mtime_ns, info.st_size
+
+
+def hash_archivo(ruta, tam_bloque=1 << 20):
+    """Calcula el hash SHA-1 del contenido del archivo"""
+    h = hashlib.sha1()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(tam_bloque), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def es_columnar(ruta):
+    """Indica si la ruta apunta a un snapshot Parquet"""
+    return str(ruta).lower().endswith('.parquet')
+
+
+def ruta_columnar(ruta_csv, directorio=None):
+    """Ruta del snapshot Parquet que corresponde a un CSV"""
+    base = os.path.splitext(os.path.basename(ruta_csv))[0] + '.parquet'
+    return os.path.join(directorio or os.path.dirname(ruta_csv), base)
+
+
+def leer_columnas(ruta):
+    """Nombres de columnas del archivo sin leer los datos"""
+    if es_columnar(ruta):
+        return pq.read_schema(ruta).names
+    return list(pd.read_csv(ruta, nrows=0).columns)
+
+
+def leer_metadatos(ruta):
+    """Metadatos guardados en la ingesta (vacío si es CSV o no hay)"""
+    if not es_columnar(ruta):
+        return {}
+    metadatos = pq.read_schema(ruta).metadata or {}
+    if CLAVE_METADATOS not in metadatos:
+        return {}
+    return json.loads(metadatos[CLAVE_METADATOS])
+
+
+def leer_activos(ruta, columnas=None):
+    """
+    Lee los activos desde Parquet o CSV con tipos explícitos.
+
+    Si se indica `columnas`, solo se leen las que existan en el archivo.
+    """
+    disponibles = leer_columnas(ruta)
+    if columnas is not None:
+        columnas = [col for col in columnas if col in disponibles]
+    if es_columnar(ruta):
+        return pd.read_parquet(ruta, columns=columnas)
+    dtypes = {col: tipo for col, tipo in DTYPES_ACTIVOS.items() if col in disponibles}
+    return pd.read_csv(ruta, dtype=dtypes, usecols=columnas)
+
+
+def leer_muestra(ruta, n=10):
+    """Primeras n filas para mostrar (sin columnas internas), sin leer el archivo completo"""
+    if es_columnar(ruta):
+        archivo = pq.ParquetFile(ruta)
+        lote = next(archivo.iter_batches(batch_size=n), None)
+        if lote is None:
+            return eliminar_columnas_internas(archivo.schema_arrow.empty_table().to_pandas())
+        return eliminar_columnas_internas(lote.to_pandas())
+    disponibles = leer_columnas(ruta)
+    dtypes = {col: tipo for col, tipo in DTYPES_ACTIVOS.items() if col in disponibles}
+    return eliminar_columnas_internas(pd.read_csv(ruta, dtype=dtypes, nrows=n))
+
+
+def preparar_snapshot(df_original):
+    """
+    Deja un DataFrame de activos listo para guardarse en Parquet.
+
+    Reemplaza el documento de identidad por la clave anónima ID_EMPLEADO,
+    elimina las columnas sensibles, convierte las fechas a datetime y las
+    dimensiones principales a categóricas canónicas. Devuelve (df, metadatos).
+    """
+    df, eliminadas = eliminar_columnas_sensibles(agregar_clave_empleado(df_original))
+
+    fechas = {}
+    for posibles in (FECHA_NAC_POSIBLES, FECHA_ING_POSIBLES):
+        for nombre_col in posibles:
+            if nombre_col in df.columns:
+                df[nombre_col], formato, sin_convertir = parsear_fecha(df[nombre_col])
+                fechas[nombre_col] = [formato, sin_convertir]
+                break
+
+    # Dimensiones canónicas: las variantes de un valor se unifican una vez aquí
+    mapeo = canonico.cargar_mapeo()
+    df, cambios = canonico.canonizar(df, mapeo)
+
+    metadatos = {
+        'version': VERSION_SNAPSHOT,
+        'version_canonizacion': mapeo['version'],
+        'columnas_originales': list(df_original.columns),
+        'columnas_eliminadas': eliminadas,
+        'fechas': fechas,
+        'canonizacion': cambios,
+    }
+    return df, metadatos
+
+
+def resumen_snapshot(df):
+    """
+    Resumen de un snapshot para los indicadores que se muestran antes de la carga.
+
+    Guarda headcount, personas por género y, de las fechas de nacimiento, la
+    cantidad, la suma de los años y la cantidad por mes-día (MMDD): con eso
+    se obtiene la edad promedio exacta a cualquier fecha (ver calcular_edad).
+    """
+    resumen = {"headcount": len(df), "genero": {}, "nacimientos": 0, "suma_anios_nac": 0, "mes_dia_nac": {}}
+    if "GENERO (F/M)" in df.columns:
+        resumen["genero"] = {
+            str(valor): int(n) for valor, n in df["GENERO (F/M)"].value_counts().items() if n
+        }
+    columna_nac = next((col for col in FECHA_NAC_POSIBLES if col in df.columns), None)
+    if columna_nac is not None and pd.api.types.is_datetime64_any_dtype(df[columna_nac]):
+        fechas = df[columna_nac].dropna()
+        resumen["nacimientos"] = len(fechas)
+        resumen["suma_anios_nac"] = int(fechas.dt.year.sum())
+        mes_dia = (fechas.dt.month * 100 + fechas.dt.day).value_counts()
+        resumen["mes_dia_nac"] = {str(md): int(n) for md, n in mes_dia.items()}
+    return resumen
+
+
+def snapshot_vigente(metadatos):
+    """Indica si un snapshot es del formato y del mapeo de canonización actuales"""
+    return (metadatos.get('version') == VERSION_SNAPSHOT
+            and metadatos.get('version_canonizacion') == canonico.cargar_mapeo()['version'])
+
+
+def ruta_temporal(ruta_destino):
+    """
+    Archivo temporal nuevo junto a ruta_destino, para escribirlo y luego reemplazar.
+
+    El nombre es único aunque escriban a la vez varios hilos (las sesiones
+    del dashboard) o procesos.
+    """
+    descriptor, temporal = tempfile.mkstemp(
+        prefix=f"{os.path.basename(ruta_destino)}.", suffix=".tmp", dir=os.path.dirname(ruta_destino) or "."
+    )
+    os.close(descriptor)
+    return temporal
+
+
+def escribir_snapshot(df, metadatos, ruta_destino, grupos=None):
+    """
+    Guarda df en Parquet con los metadatos propios (escritura atómica).
+
+    `grupos` son rangos (inicio, fin) de filas que se escriben como row groups
+    propios: al leer con filtros se saltan los grupos que no coinciden.
+    """
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    esquema = dict(tabla.schema.metadata or {})
+    esquema[CLAVE_METADATOS] = json.dumps(metadatos).encode('utf-8')
+    tabla = tabla.replace_schema_metadata(esquema)
+
+    # Escribir a un temporal y reemplazar para no dejar archivos a medias
+    temporal = ruta_temporal(ruta_destino)
+    if grupos:
+        with pq.ParquetWriter(temporal, tabla.schema) as escritor:
+            for inicio, fin in grupos:
+                escritor.write_table(tabla.slice(inicio, fin - inicio))
+    else:
+        pq.write_table(tabla, temporal)
+    os.replace(temporal, ruta_destino)
+    return ruta_destino
+
+
+def convertir_a_columnar(ruta_csv, ruta_destino=None):
+    """
+    Convierte un CSV de activos en un snapshot Parquet tipado.
+
+    Elimina las columnas sensibles, guarda las fechas como datetime y las
+    dimensiones principales como categóricas. Devuelve la ruta generada.
+    """
+    ruta_destino = ruta_destino or ruta_columnar(ruta_csv)
+    df, metadatos = preparar_snapshot(leer_activos(ruta_csv))
+    metadatos['origen'] = os.path.basename(ruta_csv)
+    return escribir_snapshot(df, metadatos, ruta_destino)
+
+
+def obtener_sal(ruta=RUTA_SAL):
+    """
+    Sal secreta para la clave de empleado (16 caracteres).
+
+    Se toma de la variable de entorno ACTIVOS_SAL o del archivo `ruta`; si no
+    existe ninguno, se genera y se guarda en el archivo. La sal no debe
+    cambiar entre ingestas o las claves de distintos periodos no coincidirán:
+    por eso, si solo existe el archivo en la carpeta de trabajo (ubicación
+    anterior), se copia a `ruta` en vez de generar una nueva.
+    """
+    sal = os.environ.get(VARIABLE_SAL)
+    if sal is None and os.path.exists(ruta):
+        with open(ruta, encoding='utf-8') as f:
+            sal = f.read().strip()
+    if sal is None:
+        if os.path.exists(RUTA_SAL_ANTERIOR):
+            with open(RUTA_SAL_ANTERIOR, encoding='utf-8') as f:
+                sal = f.read().strip()
+        else:
+            sal = secrets.token_hex(8)
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write(sal)
+    # hash_pandas_object necesita una clave de exactamente 16 bytes
+    return hashlib.sha256(sal.encode('utf-8')).hexdigest()[:16]
+
+
+def clave_empleado(documentos, sal):
+    """
+    Clave anónima por fila a partir del documento de identidad.
+
+    El documento se normaliza (solo letras y números, en mayúsculas) y se
+    aplica un hash con clave (SipHash) vectorizado. Vacíos quedan como <NA>.
+    """
+    normalizados = documentos.astype("string").str.replace(r"[^0-9A-Za-z]", "", regex=True).str.upper()
+    vacios = normalizados.isna() | (normalizados == "")
+    claves = pd.util.hash_pandas_object(normalizados.fillna(""), index=False, hash_key=sal)
+    return pd.Series(
+        pd.arrays.IntegerArray(claves.to_numpy(), vacios.to_numpy()),
+        index=documentos.index, name=COLUMNA_CLAVE
+    )
+
+
+def agregar_clave_empleado(df, sal=None):
+    """Agrega ID_EMPLEADO desde la primera columna sensible presente (antes de eliminarlas)"""
+    for col in COLUMNAS_SENSIBLES:
+        if col in df.columns:
+            return df.assign(**{COLUMNA_CLAVE: clave_empleado(df[col], sal or obtener_sal())})
+    return df
+
+
+def eliminar_columnas_sensibles(df):
+    """Elimina las columnas sensibles y devuelve (df, columnas_eliminadas)"""
+    eliminadas = [col for col in COLUMNAS_SENSIBLES if col in df.columns]
+    if eliminadas:
+        df = df.drop(columns=eliminadas)
+    return df, eliminadas
+
+
+def eliminar_columnas_internas(df):
+    """Quita las columnas internas del almacén (clave anónima y origen) antes de mostrar df"""
+    internas = [col for col in COLUMNAS_INTERNAS if col in df.columns]
+    return df.drop(columns=internas) if internas else df
+
+
+def _convertir_con_formato(valores, formato):
+    """Convierte texto a datetime con un formato fijo (o seriales de Excel)"""
+    if formato == FORMATO_EXCEL:
+        numeros = pd.to_numeric(valores, errors='coerce')
+        # Seriales razonables: 1900-01-01 .. 2173-10-14
+        numeros = numeros.where((numeros >= 1) & (numeros < 100000))
+        return pd.to_datetime(numeros, unit='D', origin='1899-12-30', errors='coerce')
+    return pd.to_datetime(valores, format=formato, errors='coerce')
+
+
+def detectar_formato_fecha(valores, tamano_muestra=TAMANO_MUESTRA_FECHAS):
+    """
+    Prueba los formatos conocidos sobre una muestra de los valores.
+
+    Devuelve la lista de formatos que reconocen algún valor, del que más
+    reconoce al que menos.
+    """
+    muestra = valores
+    if len(valores) > tamano_muestra:
+        # Muestra repartida a lo largo de la columna (determinista y sin copiar todo)
+        posiciones = np.linspace(0, len(valores) - 1, tamano_muestra).astype(int)
+        muestra = valores.iloc[posiciones]
+    muestra = muestra.astype(str).str.strip()
+    if muestra.empty:
+        return []
+
+    aciertos = {
+        formato: _convertir_con_formato(muestra, formato).notna().mean()
+        for formato in FORMATOS_CANDIDATOS
+    }
+    return [f for f in sorted(FORMATOS_CANDIDATOS, key=lambda f: -aciertos[f]) if aciertos[f] > 0]
+
+
+def nombre_formato(formato):
+    """Nombre legible de un formato de fecha"""
+    for nombre, patron in FORMATOS_FECHA.items():
+        if patron == formato:
+            return nombre
+    return formato
+
+
+def parsear_fecha(serie):
+    """
+    Convierte una columna de fechas a datetime con formato explícito.
+
+    El formato se detecta una vez por columna sobre una muestra y se aplica a
+    toda la columna en una sola pasada. Solo los valores que no encajan se
+    reintentan con los demás formatos detectados (archivos con formatos
+    mezclados). Devuelve (fechas, formato, cantidad_sin_convertir).
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie, FORMATO_DATETIME, 0
+
+    validos = serie.dropna()
+    formatos = detectar_formato_fecha(validos)
+    if not formatos:
+        fechas = pd.Series(pd.NaT, index=serie.index, dtype='datetime64[ns]')
+        return fechas, None, int((validos.astype(str).str.strip() != '').sum())
+
+    fechas = _convertir_con_formato(serie, formatos[0])
+
+    # Reintentar solo los valores que fallaron (espacios, otros formatos),
+    # primero con los formatos detectados y después con el resto
+    pendientes = serie[fechas.isna() & serie.notna()]
+    if not pendientes.empty:
+        pendientes = pendientes.astype(str).str.strip()
+        pendientes = pendientes[pendientes != '']
+        resto = [f for f in FORMATOS_CANDIDATOS if f not in formatos]
+        for formato in formatos + resto:
+            if pendientes.empty:
+                break
+            convertidas = _convertir_con_formato(pendientes, formato)
+            ok = convertidas.notna()
+            fechas.loc[convertidas.index[ok]] = convertidas[ok].astype(fechas.dtype)
+            pendientes = pendientes[~ok]
+
+    return fechas, nombre_formato(formatos[0]), len(pendientes)
+
+
+def procesar_fecha_flexible(df, posibles_nombres, nombre_salida, columnas_procesadas):
+    """Intenta procesar fechas con diferentes nombres posibles"""
+    for nombre_col in posibles_nombres:
+        if nombre_col in df.columns:
+            try:
+                df[nombre_salida], formato, sin_convertir = parsear_fecha(df[nombre_col])
+
+                # Verificar si se convirtieron algunas fechas
+                if df[nombre_salida].notna().any():
+                    columnas_procesadas.append((nombre_col, nombre_salida, formato, sin_convertir))
+                    return True
+            except:
+                continue
+    return False
+
+
+def obtener_fecha_referencia(df, referencia=REFERENCIA_HOY, hoy=None):
+    """
+    Fecha a la que se calculan edad y antigüedad.
+
+    `referencia` puede ser "hoy", "periodo" (el periodo del snapshot de cada
+    fila) o una fecha fija. Devuelve un Timestamp o una Serie de Timestamps.
+    """
+    hoy = pd.Timestamp(hoy or date.today())
+    if referencia == REFERENCIA_PERIODO:
+        if "periodo" not in df.columns:
+            return hoy
+        periodo, _, _ = parsear_fecha(df["periodo"])
+        return periodo.fillna(hoy)
+    if referencia in (None, REFERENCIA_HOY):
+        return hoy
+    return pd.Timestamp(referencia)
+
+
+def _partes_fecha(fechas):
+    """(año, mes, día) de un Timestamp o de una Serie datetime"""
+    if isinstance(fechas, pd.Series):
+        return fechas.dt.year, fechas.dt.month, fechas.dt.day
+    return fechas.year, fechas.month, fechas.day
+
+
+def calcular_edad(fechas_nac, referencia):
+    """Edad cumplida a la fecha de referencia, con aritmética sobre toda la columna"""
+    anio_ref, mes_ref, dia_ref = _partes_fecha(referencia)
+    anio, mes, dia = _partes_fecha(fechas_nac)
+    # Resta 1 si todavía no cumplió años en el año de referencia
+    aun_no_cumple = (mes_ref < mes) | ((mes_ref == mes) & (dia_ref < dia))
+    edad = anio_ref - anio - aun_no_cumple.astype("int64")
+    if edad.notna().all():
+        return edad.astype("int64")
+    return edad.astype("float64")
+
+
+def calcular_antiguedad(fechas_ingreso, referencia):
+    """Antigüedad exacta en años (días / 365.25, con 2 decimales)"""
+    return ((referencia - fechas_ingreso).dt.days / 365.25).round(2)
+
+
+def clasificar_edad(edad):
+    """Rango etario de cada edad"""
+    return pd.cut(
+        edad,
+        bins=BINS_EDAD,
+        labels=ETIQUETAS_EDAD,
+        right=True,
+        include_lowest=True
+    )
+
+
+def clasificar_antiguedad(antiguedad):
+    """Rango de antigüedad de cada valor en años"""
+    return pd.cut(
+        antiguedad,
+        bins=BINS_ANTIGUEDAD,
+        labels=ETIQUETAS_ANTIGUEDAD,
+        right=False
+    )
+
+
+def compactar_tipos(df, umbral_categorias=0.5):
+    """
+    Reduce la memoria del dataframe.
+
+    Las columnas de texto con pocos valores distintos (menos de
+    `umbral_categorias` por fila) pasan a categóricas y los enteros se
+    reducen al tipo más chico que los contiene. Modifica y devuelve `df`.
+    """
+    for col in df.columns:
+        serie = df[col]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie):
+            if serie.nunique() <= umbral_categorias * len(serie):
+                df[col] = serie.astype('category')
+        elif pd.api.types.is_integer_dtype(serie):
+            df[col] = pd.to_numeric(serie, downcast='integer')
+        elif pd.api.types.is_float_dtype(serie):
+            # Enteros guardados como float por tener vacíos (p. ej. AÑO)
+            validos = serie.dropna()
+            if not validos.empty and (validos % 1 == 0).all():
+                df[col] = pd.to_numeric(serie.astype('Int64'), downcast='integer')
+    return df
+
+
+def memoria_mb(df):
+    """Memoria del dataframe en MB (incluye el contenido de los textos)"""
+    return df.memory_usage(deep=True).sum() / 1e6
+
+
+def procesar_activos(df, hoy=None, referencia=REFERENCIA_HOY):
+    """
+    Aplica el procesamiento de la sección 2 del dashboard.
+
+    Edad y antigüedad se calculan a la fecha indicada por `referencia` (ver
+    obtener_fecha_referencia). Devuelve (df_processed, columnas_procesadas,
+    mensajes), donde mensajes es una lista de (nivel, texto) para el sidebar.
+    """
+    mensajes = []
+    columnas_procesadas = []
+
+    df_processed, _ = eliminar_columnas_sensibles(df)
+    fecha_ref = obtener_fecha_referencia(df_processed, referencia, hoy)
+
+    fecha_nac_procesada = procesar_fecha_flexible(
+        df_processed, FECHA_NAC_POSIBLES, "FECHA_NAC", columnas_procesadas
+    )
+    fecha_ing_procesada = procesar_fecha_flexible(
+        df_processed, FECHA_ING_POSIBLES, "FECHA_INGRESO", columnas_procesadas
+    )
+
+    # Calcular edad si tenemos fecha de nacimiento
+    if fecha_nac_procesada:
+        try:
+            df_processed["EDAD"] = calcular_edad(df_processed["FECHA_NAC"], fecha_ref)
+            df_processed["MES_NAC"] = df_processed["FECHA_NAC"].dt.month
+
+            # Clasificación por grupos etarios (solo si hay edades válidas)
+            if df_processed["EDAD"].notna().any():
+                df_processed["RANGO_EDAD"] = clasificar_edad(df_processed["EDAD"])
+                mensajes.append(("success", "✅ Edad y rangos calculados"))
+        except Exception as e:
+            mensajes.append(("warning", f"⚠️ Error calculando edad: {str(e)}"))
+
+    # Procesar año y mes de ingreso
+    if fecha_ing_procesada:
+        try:
+            df_processed["AÑO_INGRESO"] = df_processed["FECHA_INGRESO"].dt.year
+            df_processed["MES_NUM"] = df_processed["FECHA_INGRESO"].dt.month
+            df_processed["MES_INGRESO"] = pd.Categorical(
+                df_processed["MES_NUM"].map(MESES_ES),
+                categories=list(MESES_ES.values()),
+                ordered=True
+            )
+            df_processed["antiguedad_anios"] = calcular_antiguedad(df_processed["FECHA_INGRESO"], fecha_ref)
+            df_processed["RANGO_ANTIGUEDAD"] = clasificar_antiguedad(df_processed["antiguedad_anios"])
+            mensajes.append(("success", "✅ Fechas de ingreso y antigüedad procesadas"))
+        except Exception as e:
+            mensajes.append(("warning", f"⚠️ Error procesando fechas de ingreso: {str(e)}"))
+
+    return df_processed, columnas_procesadas, mensajes
@@ -0,0 +1,299 @@
+"""
+Reportes estáticos (HTML/PDF) por unidad de negocio, país y gerencia.
+
+Los periodos del almacén se procesan una sola vez, igual que en el
+dashboard (almacen.procesar_periodos), y se publican en el archivo Arrow
+compartido (compartido.py); si el dashboard ya lo publicó con los mismos
+parámetros, se reutiliza. Cada proceso del pool abre ese archivo mapeado en
+memoria, así que los datos no se copian por proceso, y dibuja los gráficos
+del dashboard para cada corte.
+
+Uso:
+    python reportes.py [--desde 2024-01-01] [--hasta 2024-02-01] [--formato html pdf]
+"""
+import argparse
+import base64
+import html
+import os
+import re
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+
+import almacen
+import compartido
+import filtros
+import graficos
+import procesamiento
+
+DIRECTORIO_REPORTES = "reportes"
+COLUMNAS_CORTE = ["UNIDAD DE NEGOCIO", "pais", "gerencia"]
+FORMATO_HTML = "html"
+FORMATO_PDF = "pdf"
+TOTAL = "Total"
+
+# Mismos gráficos que las pestañas del dashboard: (columna, título, tipo, top_n)
+GRAFICOS_REPORTE = [
+    ("GENERO (F/M)", "Distribución por Género", 'pie', 10),
+    ("RANGO_EDAD", "Distribución por Rango de Edad", 'bar', 10),
+    ("UNIDAD DE NEGOCIO", "Distribución por Unidad de Negocio", 'bar', 15),
+    ("POSICION / PUESTO / CARGO", "Top 10 Puestos", 'barh', 10),
+    ("AÑO_INGRESO", "Ingresos por Año", 'bar', 10),
+    ("MES_INGRESO", "Ingresos por Mes", 'bar', 10),
+    ("RANGO_ANTIGUEDAD", "Distribución por Antigüedad (años)", 'bar', 10),
+    ("periodo", "Headcount por Periodo", 'line', None),
+]
+
+# Dataset de cada proceso del pool (se abre una vez en _iniciar_proceso) y
+# el índice de las columnas de corte, que se arma la primera vez que se usa
+_datos = None
+_indices = {}
+
+
+def nombre_archivo(texto, usados=None):
+    """
+    Nombre de archivo seguro para un valor (sin tildes ni símbolos).
+
+    Valores distintos pueden dar el mismo nombre ("Perú" y "PERU"): con
+    `usados` (conjunto de nombres ya tomados en la carpeta) se agrega un
+    sufijo _2, _3... y el nombre elegido se suma al conjunto.
+    """
+    texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode()
+    base = re.sub(r"[^A-Za-z0-9]+", "_", texto).strip("_").lower() or "vacio"
+    if usados is None:
+        return base
+    nombre, sufijo = base, 2
+    while nombre in usados:
+        nombre, sufijo = f"{base}_{sufijo}", sufijo + 1
+    usados.add(nombre)
+    return nombre
+
+
+def contar(serie):
+    """Conteo por valor sin vacíos, de mayor a menor (como agregados.contar)"""
+    return filtros.contar_valores(serie)
+
+
+def indicadores(df):
+    """KPIs del corte: headcount, % mujeres, edad y antigüedad promedio"""
+    resultado = {"Headcount": f"{len(df):,}"}
+    if "GENERO (F/M)" in df.columns and len(df):
+        genero = filtros.contar_valores(df["GENERO (F/M)"])
+        mujeres = sum(n for valor, n in genero.items() if valor.upper() == 'F')
+        resultado["% Mujeres"] = f"{mujeres * 100 / max(genero.sum(), 1):.1f} %"
+    for columna, nombre in [("EDAD", "Edad promedio"), ("antiguedad_anios", "Antigüedad promedio (años)")]:
+        if columna in df.columns and df[columna].notna().any():
+            resultado[nombre] = f"{pd.to_numeric(df[columna], errors='coerce').mean():.1f}"
+    return resultado
+
+
+def figuras_corte(df):
+    """[(título, Figure)] con los gráficos del corte"""
+    figuras = []
+    for columna, titulo, tipo, top_n in GRAFICOS_REPORTE:
+        if columna not in df.columns:
+            continue
+        conteo_total = contar(df[columna])
+        if columna == "periodo":
+            conteo_total = conteo_total.sort_index()
+            if len(conteo_total) < 2:
+                continue
+        if conteo_total.empty:
+            continue
+        conteo = conteo_total if top_n is None else conteo_total.head(top_n)
+        titulo_completo = f"{titulo} (Total: {conteo_total.sum()})"
+        figuras.append((titulo_completo, graficos.figura_conteo(conteo, titulo_completo, tipo)))
+    if "MES_NAC" in df.columns:
+        cumple_mes = contar(df["MES_NAC"])
+        if not cumple_mes.empty:
+            cumple_mes = cumple_mes.set_axis(cumple_mes.index.astype(float).astype(int)).sort_index()
+            cumple_mes.index = [procesamiento.MESES_ES.get(m, f"Mes {m}") for m in cumple_mes.index]
+            titulo = f"Cumpleaños por Mes (Total: {cumple_mes.sum()})"
+            figuras.append((titulo, graficos.figura_cumpleanos(cumple_mes, titulo)))
+    return figuras
+
+
+def _html(titulo, subtitulo, kpis, imagenes):
+    tarjetas = "".join(
+        f"<div class='kpi'><span>{html.escape(k)}</span><b>{html.escape(v)}</b></div>" for k, v in kpis.items()
+    )
+    graficos_html = "".join(
+        f"<figure><img alt='{html.escape(t)}' src='data:image/png;base64,{base64.b64encode(png).decode()}'></figure>"
+        for t, png in imagenes
+    )
+    return f"""<!DOCTYPE html>
+<html lang="es"><head><meta charset="utf-8"><title>{html.escape(titulo)}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; color: #222; }}
+.kpis {{ display: flex; gap: 1em; flex-wrap: wrap; margin: 1em 0; }}
+.kpi {{ border: 1px solid #ddd; border-radius: 6px; padding: .6em 1em; }}
+.kpi span {{ display: block; font-size: .8em; color: #666; }}
+.graficos {{ display: grid; grid-template-columns: repeat(auto-fill, minmax(480px, 1fr)); gap: 1em; }}
+figure {{ margin: 0; }} img {{ width: 100%; }}
+</style></head><body>
+<h1>📊 {html.escape(titulo)}</h1><p>{html.escape(subtitulo)}</p>
+<div class="kpis">{tarjetas}</div>
+<div class="graficos">{graficos_html}</div>
+<p><small>🔒 Reporte sin información sensible (documentos de identidad excluidos).</small></p>
+</body></html>
+"""
+
+
+def _portada_pdf(titulo, subtitulo, kpis):
+    fig = Figure(figsize=(10, 6))
+    fig.text(0.05, 0.85, titulo, fontsize=20, weight='bold')
+    fig.text(0.05, 0.78, subtitulo, fontsize=11, color='#555555')
+    for i, (nombre, valor) in enumerate(kpis.items()):
+        fig.text(0.05, 0.62 - i * 0.08, f"{nombre}: {valor}", fontsize=14)
+    return fig
+
+
+def _iniciar_proceso(ruta_datos):
+    """Abre el dataset compartido una vez por proceso (sin copiarlo)"""
+    global _datos
+    _datos, _ = compartido.abrir(ruta_datos)
+    _indices.clear()
+
+
+def filas_corte(df, columna, valor):
+    """Posiciones de las filas con ese valor (mismos valores normalizados que los filtros)"""
+    if columna not in _indices:
+        _indices.update(filtros.construir_indice(df, [columna]))
+    entrada = _indices[columna]
+    return np.flatnonzero(entrada["codigos"] == entrada["posicion"][valor])
+
+
+def generar_reporte(columna, valor, destino, formatos, subtitulo):
+    """Escribe el reporte de un corte (columna = None para el total); devuelve (rutas, registros)"""
+    df = _datos
+    if columna is not None:
+        df = df.take(filas_corte(df, columna, valor))
+    titulo = f"Activos — {TOTAL}" if columna is None else f"Activos — {columna}: {valor}"
+    kpis = indicadores(df)
+    figuras = figuras_corte(df)
+
+    os.makedirs(os.path.dirname(destino) or ".", exist_ok=True)
+    rutas = []
+    if FORMATO_PDF in formatos:
+        ruta = f"{destino}.pdf"
+        with PdfPages(ruta) as pdf:
+            pdf.savefig(_portada_pdf(titulo, subtitulo, kpis))
+            for _, fig in figuras:
+                pdf.savefig(fig)
+        rutas.append(ruta)
+    if FORMATO_HTML in formatos:
+        ruta = f"{destino}.html"
+        imagenes = [(t, graficos.figura_a_png(fig)) for t, fig in figuras]
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write(_html(titulo, subtitulo, kpis, imagenes))
+        rutas.append(ruta)
+    for _, fig in figuras:
+        fig.clear()
+    return rutas, len(df)
+
+
+def cortes(df, columnas=COLUMNAS_CORTE):
+    """[(columna, valor, registros)] de mayor a menor (None = reporte total)"""
+    resultado = [(None, TOTAL, len(df))]
+    for columna, entrada in filtros.construir_indice(df, columnas).items():
+        resultado.extend(
+            (columna, valor, int(n)) for valor, n in zip(entrada["opciones"], entrada["conteos"]) if n > 0
+        )
+    return sorted(resultado, key=lambda c: -c[2])
+
+
+def preparar_datos(directorio=almacen.DIRECTORIO_ALMACEN, desde=None, hasta=None,
+                   referencia=procesamiento.REFERENCIA_HOY, hoy=None):
+    """
+    Procesa los periodos (o reutiliza lo publicado por el dashboard).
+
+    Devuelve (ruta del archivo Arrow, periodos incluidos).
+    """
+    hoy = hoy or date.today()
+    rutas = tuple(
+        procesamiento.huella_archivo(ruta)[0] for ruta in almacen.rutas_periodos(directorio, desde, hasta)
+    )
+    if not rutas:
+        raise FileNotFoundError(f"No hay periodos en '{directorio}' (ingiere un export con ingesta.py --almacen)")
+    hashes = tuple(procesamiento.hash_archivo(ruta) for ruta in rutas)
+    columnas = procesamiento.COLUMNAS_DASHBOARD
+    ruta = compartido.ruta_publicacion(rutas, hashes, hoy, columnas, referencia)
+    if not os.path.exists(ruta):
+        df, info = almacen.procesar_periodos(rutas, hoy, columnas, referencia)
+        compartido.publicar(df, info, ruta)
+    periodos = [os.path.basename(os.path.dirname(r))[len(almacen.PREFIJO_PARTICION):] for r in rutas]
+    return ruta, periodos
+
+
+def _indice_html(filas, subtitulo):
+    enlaces = "".join(
+        f"<tr><td>{html.escape(columna or '')}</td><td><a href='{html.escape(archivo)}'>{html.escape(str(valor))}</a>"
+        f"</td><td>{registros:,}</td></tr>"
+        for columna, valor, registros, archivo in filas
+    )
+    return f"""<!DOCTYPE html>
+<html lang="es"><head><meta charset="utf-8"><title>Reportes de activos</title>
+<style>body {{ font-family: sans-serif; margin: 2em; }} td, th {{ padding: .2em 1em; text-align: left; }}</style>
+</head><body><h1>📊 Reportes de activos</h1><p>{html.escape(subtitulo)}</p>
+<table><tr><th>Corte</th><th>Valor</th><th>Headcount</th></tr>{enlaces}</table></body></html>
+"""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera reportes estáticos por unidad, país y gerencia")
+    parser.add_argument("--almacen", default=almacen.DIRECTORIO_ALMACEN, help="Carpeta del almacén de snapshots")
+    parser.add_argument("--desde", help="Primer periodo (AAAA-MM-DD)")
+    parser.add_argument("--hasta", help="Último periodo (AAAA-MM-DD)")
+    parser.add_argument("--referencia", choices=[procesamiento.REFERENCIA_HOY, procesamiento.REFERENCIA_PERIODO],
+                        default=procesamiento.REFERENCIA_HOY, help="Fecha de cálculo de edad y antigüedad")
+    parser.add_argument("--cortes", nargs="+", default=COLUMNAS_CORTE, help="Columnas por las que se corta")
+    parser.add_argument("--formato", nargs="+", choices=[FORMATO_HTML, FORMATO_PDF],
+                        default=[FORMATO_HTML, FORMATO_PDF])
+    parser.add_argument("--salida", default=DIRECTORIO_REPORTES, help="Carpeta de los reportes")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count(), help="Procesos en paralelo")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    ruta_datos, periodos = preparar_datos(args.almacen, args.desde, args.hasta, args.referencia)
+    df, _ = compartido.abrir(ruta_datos)
+    lista = cortes(df, args.cortes)
+    del df
+    subtitulo = (f"Periodos {periodos[0]} a {periodos[-1]} · generado el "
+                 f"{datetime.now().strftime('%Y-%m-%d %H:%M')}")
+    print(f"📦 Datos listos en {time.perf_counter() - inicio:.1f} s: {len(lista)} reportes")
+
+    filas_indice = []
+    with ProcessPoolExecutor(args.procesos, initializer=_iniciar_proceso, initargs=(ruta_datos,)) as pool:
+        # Los cortes más grandes primero para repartir mejor la carga
+        tareas = {}
+        # Nombres tomados por carpeta (en la raíz está el índice)
+        usados = {"": {"index"}}
+        for columna, valor, registros in lista:
+            carpeta = nombre_archivo(columna) if columna else ""
+            destino = os.path.join(args.salida, carpeta, nombre_archivo(valor, usados.setdefault(carpeta, set())))
+            tarea = pool.submit(generar_reporte, columna, valor, destino, args.formato, subtitulo)
+            tareas[tarea] = (columna, valor, registros, destino)
+        for tarea in as_completed(tareas):
+            columna, valor, registros, destino = tareas[tarea]
+            try:
+                rutas, _ = tarea.result()
+            except Exception as e:
+                print(f"⚠️ {columna or TOTAL} = {valor}: {e}")
+                continue
+            archivo = os.path.relpath(rutas[-1], args.salida)
+            filas_indice.append((columna, valor, registros, archivo))
+
+    filas_indice.sort(key=lambda f: (f[0] is not None, f[0] or "", -f[2]))
+    with open(os.path.join(args.salida, "index.html"), 'w', encoding='utf-8') as f:
+        f.write(_indice_html(filas_indice, subtitulo))
+    print(f"✅ {len(filas_indice)} reportes en {args.salida}/ ({time.perf_counter() - inicio:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Puntaje de riesgo de rotación, vectorizado y con modelos intercambiables.
+
+Cada modelo es una función que recibe las características de todas las
+personas (arrays de numpy) y devuelve un puntaje entre 0 y 1 por persona,
+en una sola pasada. Los modelos tienen versión: al cambiar un modelo se
+sube su versión y los puntajes en caché dejan de usarse.
+
+Las características se calculan a una fecha elegida (no a la del export),
+así que se puede volver a puntuar "como si fuera" otra fecha.
+
+Modelos incluidos:
+- export: 1 / (antigüedad + 1), la fórmula de la columna riesgo_rotacion.
+- multifactor: logística con antigüedad, edad y el efecto del área y del
+  puesto, estimado con las salidas observadas entre snapshots (ver
+  tasas_salida). Los pesos de antigüedad y edad son iniciales, no ajustados.
+"""
+import numpy as np
+import pandas as pd
+
+import filtros
+import movimientos
+import procesamiento
+
+COLUMNA_RIESGO = "riesgo_rotacion"
+COLUMNA_FECHA_INGRESO = "FECHA_INGRESO"
+COLUMNA_FECHA_NAC = "FECHA_NAC"
+COLUMNAS_EFECTO = ["area", "POSICION / PUESTO / CARGO"]
+COLUMNAS_MODELO = [COLUMNA_FECHA_INGRESO, COLUMNA_FECHA_NAC, *COLUMNAS_EFECTO]
+
+# Personas "ficticias" con la tasa global que se suman a cada grupo: los
+# grupos chicos quedan cerca de la tasa global en vez de en 0 o 1
+SUAVIZADO_TASAS = 20
+
+# Etiqueta del grupo de las personas sin valor en la columna de agrupación
+SIN_DATO = "Sin dato"
+
+# Pesos iniciales del modelo multifactor
+INTERCEPTO = -1.5
+PESO_ANTIGUEDAD = -0.6   # por log(1 + años)
+PESO_EDAD = -0.25        # por cada 10 años sobre 35
+EDAD_CENTRO = 35
+
+
+def _anios(fechas, fecha):
+    """Años (días / 365.25) entre cada fecha y `fecha`; NaN si falta"""
+    valores = pd.Series(fechas).to_numpy(dtype="datetime64[ns]", na_value=np.datetime64("NaT"))
+    return (np.datetime64(pd.Timestamp(fecha), 'ns') - valores) / np.timedelta64(1, 'D') / 365.25
+
+
+def caracteristicas(df, fecha, tasas=None):
+    """
+    Características de cada fila a la fecha indicada (arrays alineados con df).
+
+    `tasas` es el resultado de tasas_salida; sin él, área y puesto no aportan.
+    """
+    resultado = {}
+    if COLUMNA_FECHA_INGRESO in df.columns:
+        resultado["antiguedad"] = np.clip(_anios(df[COLUMNA_FECHA_INGRESO], fecha), 0, None)
+    elif "antiguedad_anios" in df.columns:
+        resultado["antiguedad"] = pd.to_numeric(df["antiguedad_anios"], errors="coerce").to_numpy(float)
+    else:
+        resultado["antiguedad"] = np.full(len(df), np.nan)
+
+    if COLUMNA_FECHA_NAC in df.columns:
+        nacimiento = pd.Series(df[COLUMNA_FECHA_NAC].to_numpy(dtype="datetime64[ns]", na_value=np.datetime64("NaT")))
+        resultado["edad"] = procesamiento.calcular_edad(nacimiento, pd.Timestamp(fecha)).to_numpy(float)
+    elif "EDAD" in df.columns:
+        resultado["edad"] = pd.to_numeric(df["EDAD"], errors="coerce").to_numpy(float)
+    else:
+        resultado["edad"] = np.full(len(df), np.nan)
+
+    for columna in COLUMNAS_EFECTO:
+        efecto = np.zeros(len(df))
+        if tasas and columna in tasas and columna in df.columns:
+            tasa_valor, tasa_global = tasas[columna]
+            opciones, codigos = filtros.indexar_columna(df[columna])
+            # Efecto en escala logit de la tasa de cada valor respecto a la global; -1 (vacío) = 0
+            por_opcion = np.log(tasa_valor.reindex(opciones).fillna(tasa_global).to_numpy() / tasa_global)
+            efecto = np.append(por_opcion, 0.0)[codigos]
+        resultado[f"efecto_{columna}"] = efecto
+    return resultado
+
+
+def _modelo_export(c):
+    return 1 / (c["antiguedad"] + 1)
+
+
+def _modelo_multifactor(c):
+    edad = np.nan_to_num(c["edad"], nan=EDAD_CENTRO)
+    antiguedad = np.nan_to_num(c["antiguedad"], nan=0.0)
+    z = (INTERCEPTO
+         + PESO_ANTIGUEDAD * np.log1p(antiguedad)
+         + PESO_EDAD * (edad - EDAD_CENTRO) / 10
+         + sum(c[f"efecto_{columna}"] for columna in COLUMNAS_EFECTO))
+    return 1 / (1 + np.exp(-z))
+
+
+MODELOS = {
+    "export": {
+        "version": 1,
+        "descripcion": "1 / (antigüedad + 1), igual que la columna del export",
+        "funcion": _modelo_export,
+    },
+    "multifactor": {
+        "version": 1,
+        "descripcion": "Antigüedad, edad y salidas históricas del área y del puesto",
+        "funcion": _modelo_multifactor,
+    },
+}
+
+
+def registrar_modelo(nombre, funcion, version, descripcion=""):
+    """Agrega (o reemplaza) un modelo: funcion(características) -> array de puntajes"""
+    MODELOS[nombre] = {"version": version, "descripcion": descripcion, "funcion": funcion}
+
+
+def puntuar(df, modelo, fecha, tasas=None):
+    """Puntaje de cada fila de df (float32; NaN si faltan datos)"""
+    c = caracteristicas(df, fecha, tasas)
+    return np.asarray(MODELOS[modelo]["funcion"](c), dtype=np.float32)
+
+
+def tasas_salida(historial, columnas=COLUMNAS_EFECTO, suavizado=SUAVIZADO_TASAS):
+    """
+    Tasa de salida por valor de cada columna: salidas / personas al inicio.
+
+    `historial` son los snapshots con periodo, ID_EMPLEADO y las columnas.
+    Devuelve {columna: (Serie de tasas por valor, tasa global)}; vacío si
+    no hay al menos dos periodos o ninguna salida.
+    """
+    columnas = [col for col in columnas if col in historial.columns]
+    movs = movimientos.movimientos_periodos(historial, columnas)
+    if movs.empty:
+        return {}
+    salidas = movs[movs[movimientos.COLUMNA_TIPO] == movimientos.SALIDA]
+    periodos = historial[movimientos.COLUMNA_PERIODO].astype(str)
+    # Expuestos: quienes estaban en algún periodo que tiene uno siguiente
+    expuestos = historial[(periodos != periodos.max()).to_numpy()]
+    if salidas.empty or expuestos.empty:
+        return {}
+
+    resultado = {}
+    tasa_global = len(salidas) / len(expuestos)
+    for columna in columnas:
+        n_salidas = filtros.contar_valores(salidas[f"{columna}_anterior"])
+        n_expuestos = filtros.contar_valores(expuestos[columna])
+        n_salidas = n_salidas.reindex(n_expuestos.index, fill_value=0)
+        tasa = (n_salidas + suavizado * tasa_global) / (n_expuestos + suavizado)
+        resultado[columna] = (tasa.astype(float), tasa_global)
+    return resultado
+
+
+def distribucion(puntajes, intervalos=10):
+    """Cantidad de personas por tramo de puntaje (0–0.1, 0.1–0.2, ...)"""
+    validos = puntajes[~np.isnan(puntajes)]
+    bordes = np.linspace(0, 1, intervalos + 1)
+    conteo, _ = np.histogram(np.clip(validos, 0, 1), bins=bordes)
+    etiquetas = [f"{a:.1f}–{b:.1f}" for a, b in zip(bordes[:-1], bordes[1:])]
+    return pd.Series(conteo, index=etiquetas, name="count", dtype=np.int64)
+
+
+def promedio_por_grupo(puntajes, grupos):
+    """Riesgo promedio por valor de `grupos` (de mayor a menor); los vacíos van en SIN_DATO"""
+    grupos = pd.Series(np.asarray(grupos, dtype=object))
+    grupos = grupos.where(grupos.notna() & (grupos.astype(str).str.strip() != ''), SIN_DATO)
+    serie = pd.Series(puntajes, index=pd.Index(grupos.astype(str)))
+    return serie.groupby(level=0).mean().dropna().sort_values(ascending=False)
+
+
+def top_riesgo(puntajes, n=20):
+    """Posiciones de las n personas con mayor riesgo (de mayor a menor), sin ordenar todo"""
+    validos = np.flatnonzero(~np.isnan(puntajes))
+    if len(validos) > n:
+        validos = validos[np.argpartition(-puntajes[validos], n - 1)[:n]]
+    return validos[np.argsort(-puntajes[validos], kind="stable")]
@@ -0,0 +1,86 @@
+"""
+Cargas en un hilo de fondo, compartidas por todas las sesiones del proceso.
+
+La carga en frío (leer snapshots, procesar fechas y edades, publicar el
+dataset) corre en un hilo aparte identificado por una clave. El script no
+la espera: muestra los indicadores principales (y los datos anteriores de
+la sesión, si los hay), consulta el avance con `estado` y se vuelve a
+ejecutar cuando la tarea termina. Si el usuario interactúa y el script se
+vuelve a ejecutar, la carga no se reinicia: el nuevo rerun (o cualquier
+otra sesión) encuentra la misma tarea.
+"""
+import threading
+import time
+
+_tareas = {}
+_bloqueo = threading.Lock()
+
+# Tareas terminadas que se recuerdan (las en curso no se descartan nunca)
+MAX_TAREAS = 32
+
+
+def iniciar(clave, funcion, *args, vigente=None, **kwargs):
+    """
+    Tarea de la clave; si no existe, falló o su resultado ya no está, se lanza en un hilo.
+
+    `funcion` recibe además `avance`: una función que se llama con el nombre
+    de cada etapa al empezarla. `vigente()` indica si el resultado de una
+    tarea terminada sigue disponible (p. ej. el archivo publicado existe).
+    """
+    with _bloqueo:
+        tarea = _tareas.get(clave)
+        relanzar = (
+            tarea is None
+            or tarea["error"] is not None
+            or (tarea["terminada"].is_set() and vigente is not None and not vigente())
+        )
+        if relanzar:
+            tarea = {
+                "clave": clave,
+                "etapas": [],
+                "inicio": time.perf_counter(),
+                "segundos": None,
+                "resultado": None,
+                "error": None,
+                "terminada": threading.Event(),
+            }
+            hilo = threading.Thread(
+                target=_ejecutar, args=(tarea, funcion, args, kwargs), name=f"carga-{clave}", daemon=True
+            )
+            _tareas.pop(clave, None)
+            _tareas[clave] = tarea
+            _descartar_terminadas()
+            hilo.start()
+    return tarea
+
+
+def _descartar_terminadas():
+    # Las más antiguas primero (el diccionario conserva el orden de inserción)
+    terminadas = [clave for clave, tarea in _tareas.items() if tarea["terminada"].is_set()]
+    for clave in terminadas[:max(len(_tareas) - MAX_TAREAS, 0)]:
+        del _tareas[clave]
+
+
+def _ejecutar(tarea, funcion, args, kwargs):
+    def avance(etapa):
+        tarea["etapas"].append((etapa, time.perf_counter() - tarea["inicio"]))
+
+    try:
+        tarea["resultado"] = funcion(*args, avance=avance, **kwargs)
+    except Exception as e:
+        tarea["error"] = e
+    finally:
+        tarea["segundos"] = time.perf_counter() - tarea["inicio"]
+        tarea["terminada"].set()
+
+
+def estado(tarea):
+    """
+    Avance de la tarea sin esperarla: (etapas, segundos, error).
+
+    `etapas` es una lista de (nombre, segundos desde el inicio); `segundos`
+    es el total (None mientras no termina) y `error` la excepción si falló.
+    """
+    if not tarea["terminada"].is_set():
+        return list(tarea["etapas"]), None, None
+    return list(tarea["etapas"]), tarea["segundos"], tarea["error"]
@@ -0,0 +1,267 @@
+"""
+Generador de exports de activos sintéticos (mismo esquema que activos_feb_24.csv).
+
+La estructura organizacional (unidad, país, razón social, gerencia, área y
+puestos por área) se toma con sus frecuencias de un CSV real si existe; la
+cantidad de puestos crece con el tamaño del export. Cada periodo conserva a
+la mayoría de las personas del anterior, con salidas, ingresos, traslados
+y cambios de puesto, para que los movimientos entre periodos sean realistas.
+
+Uso:
+    python sintetico.py 100000 --periodos 3 --salida activos_100k.csv
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import procesamiento
+
+PLANTILLA = "activos_feb_24.csv"
+
+COLUMNAS_ORGANIZACION = ["UNIDAD DE NEGOCIO", "pais", "RAZON SOCIAL / PLANILLA", "gerencia", "area"]
+COLUMNA_PUESTO = "POSICION / PUESTO / CARGO"
+
+# Orden de columnas del export real
+COLUMNAS_EXPORT = [
+    "periodo", "UNIDAD DE NEGOCIO", "pais", "RAZON SOCIAL / PLANILLA", "gerencia", "area",
+    "POSICION / PUESTO / CARGO", "DOCUMENTO IDENTIDAD / CEDULA / RUT",
+    "FECHA DE NACIMIENTO (DD/MM/YYYY)", "GENERO (F/M)", "FECHA DE INGRESO (DD/MM/YYYY)",
+    "EDAD", "MES_CUMPLE", "RANGO_EDAD", "AÑO", "MES_NUM", "MES", "AÑO_NAC", "Mes_ingreso",
+    "Mes", "Mes_nombre", "antiguedad_anios", "riesgo_rotacion",
+]
+
+# Rangos de edad del export (con guion largo, como en el original)
+ETIQUETAS_EDAD_EXPORT = ["18–25", "26–35", "36–45", "46–55", "56–65", "65+"]
+
+# Tasas mensuales de movimiento
+TASA_SALIDA = 0.02
+TASA_INGRESO = 0.02
+TASA_TRASLADO = 0.01
+TASA_CAMBIO_PUESTO = 0.01
+
+FILAS_POR_BLOQUE = 500_000
+
+# Documentos únicos: i -> (i * multiplicador) mod primo, desplazado a 8 dígitos
+_PRIMO_DOCUMENTOS = 89_999_993
+_MULTIPLICADOR_DOCUMENTOS = 2_654_435_761
+
+
+def _estructura_base():
+    """Estructura mínima si no hay CSV de plantilla"""
+    filas = []
+    for u, (unidad, pais) in enumerate([("PERU-CHILE", "PERU"), ("BRASIL", "BR"), ("CARIBE", "Rep. Dom.")]):
+        for g, gerencia in enumerate(["GERENCIA COMERCIAL", "GERENCIA DE OPERACIONES", "GERENCIA DE ADMINISTRACION"]):
+            for a in range(8):
+                filas.append((unidad, pais, f"{unidad} SA", gerencia, f"AREA {g + 1}-{a + 1}"))
+    organizacion = pd.DataFrame(filas, columns=COLUMNAS_ORGANIZACION)
+    organizacion["peso"] = 1.0
+    puestos = pd.DataFrame({
+        "area": np.repeat(organizacion["area"].unique(), 4),
+        COLUMNA_PUESTO: [f"{cargo} {i}" for i in range(len(organizacion["area"].unique()))
+                         for cargo in ("ASISTENTE", "ANALISTA", "SUPERVISOR", "JEFE")],
+        "peso": 1.0,
+    })
+    return organizacion, puestos
+
+
+def cargar_estructura(plantilla=PLANTILLA):
+    """
+    Combinaciones organizacionales y puestos por área con sus frecuencias.
+
+    Devuelve (organizacion, puestos): DataFrames con una columna "peso".
+    """
+    if not plantilla or not os.path.exists(plantilla):
+        return _estructura_base()
+    df = pd.read_csv(plantilla, usecols=COLUMNAS_ORGANIZACION + [COLUMNA_PUESTO], dtype=str).fillna("")
+    organizacion = df.groupby(COLUMNAS_ORGANIZACION, sort=False).size().rename("peso").reset_index()
+    puestos = df.groupby(["area", COLUMNA_PUESTO], sort=False).size().rename("peso").reset_index()
+    return organizacion, puestos
+
+
+def ampliar_puestos(puestos, filas, filas_plantilla):
+    """Agrega variantes de puestos para que su cantidad crezca con √(filas)"""
+    extra = int(len(puestos) * (max(filas / max(filas_plantilla, 1), 1) ** 0.5 - 1))
+    if extra <= 0:
+        return puestos
+    rng = np.random.default_rng(len(puestos) + extra)
+    base = puestos.sample(extra, replace=True, weights="peso", random_state=rng).reset_index(drop=True)
+    niveles = np.array(["I", "II", "III", "SENIOR", "JUNIOR", "LIDER"])
+    base[COLUMNA_PUESTO] = (
+        base[COLUMNA_PUESTO] + " " + niveles[np.arange(extra) % len(niveles)]
+        + " " + (np.arange(extra) // len(niveles) + 1).astype(str)
+    )
+    return pd.concat([puestos, base], ignore_index=True)
+
+
+def _documentos(indices):
+    return ((indices.astype(np.int64) + 1) * _MULTIPLICADOR_DOCUMENTOS) % _PRIMO_DOCUMENTOS + 10_000_000
+
+
+def _fechas(rng, inicio, fin, cantidad):
+    """Fechas uniformes entre inicio y fin (datetime64[D])"""
+    inicio, fin = np.datetime64(inicio, 'D'), np.datetime64(fin, 'D')
+    return inicio + rng.integers(0, (fin - inicio).astype(int) + 1, cantidad).astype('timedelta64[D]')
+
+
+def _asignar_organizacion(rng, organizacion, puestos_por_area, cantidad):
+    """Índices de organización y puesto para `cantidad` personas"""
+    pesos = organizacion["peso"].to_numpy(float)
+    org = rng.choice(len(organizacion), cantidad, p=pesos / pesos.sum())
+    return org, _asignar_puestos(rng, organizacion["area"].to_numpy()[org], puestos_por_area)
+
+
+def _asignar_puestos(rng, areas, puestos_por_area):
+    """Índice de puesto para cada persona, entre los puestos de su área"""
+    puesto = np.empty(len(areas), dtype=np.int64)
+    for area in np.unique(areas):
+        filas = np.flatnonzero(areas == area)
+        candidatos, probs = puestos_por_area.get(area, puestos_por_area[None])
+        puesto[filas] = rng.choice(candidatos, len(filas), p=probs)
+    return puesto
+
+
+def _indice_puestos(puestos):
+    """{área: (índices de puestos, probabilidades)}; None = todos"""
+    pesos = puestos["peso"].to_numpy(float)
+    resultado = {None: (np.arange(len(puestos)), pesos / pesos.sum())}
+    for area, grupo in puestos.groupby("area", sort=False).groups.items():
+        indices = np.asarray(grupo)
+        resultado[area] = (indices, pesos[indices] / pesos[indices].sum())
+    return resultado
+
+
+def _export_periodo(periodo, personas, organizacion, puestos, fecha_corte):
+    """DataFrame del export de un periodo con todas las columnas derivadas"""
+    org = organizacion.iloc[personas["org"]].reset_index(drop=True)
+    nacimiento = pd.to_datetime(personas["nacimiento"])
+    ingreso = pd.to_datetime(personas["ingreso"])
+    corte = pd.Timestamp(fecha_corte)
+
+    edad = procesamiento.calcular_edad(pd.Series(nacimiento), corte).to_numpy(float)
+    antiguedad = ((corte - ingreso).days / 365.25).to_numpy().round(2)
+    mes_ingreso = ingreso.month.to_numpy()
+    meses = np.array([""] + list(procesamiento.MESES_ES.values()), dtype=object)
+
+    df = pd.DataFrame({
+        "periodo": periodo,
+        "UNIDAD DE NEGOCIO": org["UNIDAD DE NEGOCIO"],
+        "pais": org["pais"],
+        "RAZON SOCIAL / PLANILLA": org["RAZON SOCIAL / PLANILLA"],
+        "gerencia": org["gerencia"],
+        "area": org["area"],
+        "POSICION / PUESTO / CARGO": puestos[COLUMNA_PUESTO].to_numpy()[personas["puesto"]],
+        "DOCUMENTO IDENTIDAD / CEDULA / RUT": _documentos(personas["id"]),
+        "FECHA DE NACIMIENTO (DD/MM/YYYY)": nacimiento.strftime("%Y-%m-%d"),
+        "GENERO (F/M)": personas["genero"],
+        "FECHA DE INGRESO (DD/MM/YYYY)": ingreso.strftime("%Y-%m-%d"),
+        "EDAD": edad,
+        "MES_CUMPLE": nacimiento.month.to_numpy(float),
+        "RANGO_EDAD": pd.cut(edad, bins=procesamiento.BINS_EDAD, labels=ETIQUETAS_EDAD_EXPORT),
+        "AÑO": ingreso.year.to_numpy(float),
+        "MES_NUM": mes_ingreso.astype(float),
+        "MES": meses[mes_ingreso],
+        "AÑO_NAC": nacimiento.year.to_numpy(),
+        "Mes_ingreso": np.char.lower(meses[mes_ingreso].astype(str)),
+        "Mes": mes_ingreso,
+        "Mes_nombre": np.char.lower(meses[mes_ingreso].astype(str)),
+        "antiguedad_anios": antiguedad,
+        "riesgo_rotacion": 1 / (antiguedad + 1),
+    })
+    return df[COLUMNAS_EXPORT]
+
+
+def generar(filas, ruta_salida, periodos=2, semilla=0, plantilla=PLANTILLA, fecha_corte=None):
+    """
+    Escribe un export sintético de unas `filas` filas repartidas en `periodos`.
+
+    Devuelve la ruta escrita.
+    """
+    rng = np.random.default_rng(semilla)
+    fecha_corte = fecha_corte or pd.Timestamp.today().normalize()
+    organizacion, puestos = cargar_estructura(plantilla)
+    filas_plantilla = int(organizacion["peso"].sum())
+    puestos = ampliar_puestos(puestos, filas, filas_plantilla)
+    puestos_por_area = _indice_puestos(puestos)
+
+    por_periodo = max(filas // periodos, 1)
+    inicio_periodos = pd.Timestamp(fecha_corte).to_period("M").to_timestamp() - pd.DateOffset(months=periodos - 1)
+    fechas_periodo = pd.date_range(inicio_periodos, periods=periodos, freq="MS")
+
+    # Población inicial
+    org, puesto = _asignar_organizacion(rng, organizacion, puestos_por_area, por_periodo)
+    nacimiento = _fechas(rng, "1960-01-01", "2005-12-31", por_periodo)
+    minimo_ingreso = np.maximum(nacimiento + np.timedelta64(18 * 365, 'D'), np.datetime64("2000-01-01"))
+    dias_posibles = (np.datetime64(fechas_periodo[0].date(), 'D') - minimo_ingreso).astype(int).clip(min=1)
+    personas = {
+        "id": np.arange(por_periodo),
+        "org": org,
+        "puesto": puesto,
+        "nacimiento": nacimiento,
+        "ingreso": minimo_ingreso + (rng.random(por_periodo) * dias_posibles).astype('timedelta64[D]'),
+        "genero": rng.choice(np.array(["F", "M"]), por_periodo, p=[0.42, 0.58]),
+    }
+    siguiente_id = por_periodo
+
+    temporal = f"{ruta_salida}.{os.getpid()}.tmp"
+    primero = True
+    for n, fecha in enumerate(fechas_periodo):
+        if n > 0:
+            cantidad = len(personas["id"])
+            # Salidas
+            quedan = rng.random(cantidad) >= TASA_SALIDA
+            personas = {k: v[quedan] for k, v in personas.items()}
+            cantidad = len(personas["id"])
+            # Traslados (cambian de organización y de puesto) y cambios de puesto
+            traslado = np.flatnonzero(rng.random(cantidad) < TASA_TRASLADO)
+            org_nueva, puesto_nuevo = _asignar_organizacion(rng, organizacion, puestos_por_area, len(traslado))
+            personas["org"][traslado], personas["puesto"][traslado] = org_nueva, puesto_nuevo
+            cambio = np.flatnonzero(rng.random(cantidad) < TASA_CAMBIO_PUESTO)
+            areas_cambio = organizacion["area"].to_numpy()[personas["org"][cambio]]
+            personas["puesto"][cambio] = _asignar_puestos(rng, areas_cambio, puestos_por_area)
+            # Ingresos del mes
+            nuevos = max(por_periodo - cantidad, int(por_periodo * TASA_INGRESO))
+            org, puesto = _asignar_organizacion(rng, organizacion, puestos_por_area, nuevos)
+            fin_mes = (fecha + pd.offsets.MonthEnd(0)).date()
+            agregados = {
+                "id": np.arange(siguiente_id, siguiente_id + nuevos),
+                "org": org,
+                "puesto": puesto,
+                "nacimiento": _fechas(rng, "1975-01-01", "2005-12-31", nuevos),
+                "ingreso": _fechas(rng, fecha.date(), fin_mes, nuevos),
+                "genero": rng.choice(np.array(["F", "M"]), nuevos, p=[0.42, 0.58]),
+            }
+            siguiente_id += nuevos
+            personas = {k: np.concatenate([personas[k], agregados[k]]) for k in personas}
+
+        periodo = fecha.strftime("%Y-%m-%d")
+        for inicio in range(0, len(personas["id"]), FILAS_POR_BLOQUE):
+            bloque = {k: v[inicio:inicio + FILAS_POR_BLOQUE] for k, v in personas.items()}
+            _export_periodo(periodo, bloque, organizacion, puestos, fecha_corte).to_csv(
+                temporal, mode='w' if primero else 'a', header=primero, index=False
+            )
+            primero = False
+
+    os.replace(temporal, ruta_salida)
+    return ruta_salida
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera exports de activos sintéticos")
+    parser.add_argument("filas", type=int, help="Cantidad aproximada de filas")
+    parser.add_argument("--periodos", type=int, default=2, help="Cantidad de periodos mensuales")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--plantilla", default=PLANTILLA, help="CSV real del que se toma la estructura")
+    parser.add_argument("--salida", help="Ruta del CSV (por defecto activos_sinteticos_<filas>.csv)")
+    args = parser.parse_args(argv)
+
+    salida = args.salida or f"activos_sinteticos_{args.filas}.csv"
+    inicio = time.perf_counter()
+    generar(args.filas, salida, args.periodos, args.semilla, args.plantilla)
+    print(f"✅ {salida} ({os.path.getsize(salida) / 1e6:.1f} MB, {time.perf_counter() - inicio:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()